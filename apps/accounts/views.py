@@ -77,6 +77,7 @@ def doctor_dashboard(request):
     """داشبورد پزشک"""
     from apps.doctors.models import Doctor
     from apps.appointments.models import Appointment
+    from apps.appointments.services import AppointmentStatsService
     
     user = request.user
     today = timezone.now().date()
@@ -111,14 +112,13 @@ def doctor_dashboard(request):
         ).select_related('patient').order_by('time')
         
         context['today_appointments'] = today_appointments
-        context['today_appointments_count'] = today_appointments.count()
         
-        # آمار امروز
-        context['visited_count'] = today_appointments.filter(status='visited').count()
-        context['waiting_count'] = today_appointments.filter(
-            status__in=['confirmed', 'pending']
-        ).count()
-        context['queue_count'] = today_appointments.filter(status='arrived').count()
+        # آمار امروز (بدون نوبت‌های لغوشده)
+        today_stats = AppointmentStatsService.get(doctor.id, today)
+        context['today_appointments_count'] = today_stats['total'] - today_stats['cancelled']
+        context['visited_count'] = today_stats['visited']
+        context['waiting_count'] = today_stats['confirmed'] + today_stats['pending']
+        context['queue_count'] = today_stats['arrived']
         
         # بیمار فعلی (در حال ویزیت)
         current = today_appointments.filter(status='in_progress').first()
@@ -150,15 +150,11 @@ def doctor_dashboard(request):
         
         # آمار هفته
         week_start = today - timedelta(days=today.weekday())
-        week_appointments = Appointment.objects.filter(
-            doctor=doctor,
-            date__gte=week_start,
-            date__lte=today
-        )
+        week_stats = AppointmentStatsService.get(doctor.id, week_start, today)
         
-        context['week_total'] = week_appointments.exclude(status='cancelled').count()
-        context['week_visited'] = week_appointments.filter(status='visited').count()
-        context['week_cancelled'] = week_appointments.filter(status='cancelled').count()
+        context['week_total'] = week_stats['total'] - week_stats['cancelled']
+        context['week_visited'] = week_stats['visited']
+        context['week_cancelled'] = week_stats['cancelled']
     
     return render(request, 'dashboard/doctor.html', context)
 
@@ -166,6 +162,7 @@ def doctor_dashboard(request):
 def secretary_dashboard(request):
     """داشبورد منشی"""
     from apps.appointments.models import Appointment
+    from apps.appointments.services import AppointmentStatsService
     
     today = timezone.now().date()
     
@@ -173,9 +170,7 @@ def secretary_dashboard(request):
         'today_appointments': Appointment.objects.filter(
             date=today
         ).select_related('patient', 'doctor', 'doctor__user').order_by('time')[:20],
-        'pending_count': Appointment.objects.filter(
-            date=today, status='pending'
-        ).count(),
+        'pending_count': AppointmentStatsService.get(None, today)['pending'],
     }
     
     return render(request, 'dashboard/secretary.html', context)
@@ -4,8 +4,12 @@
 """
 
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Appointment, AppointmentHistory, TimeSlot
+from .models import (
+    Appointment, AppointmentHistory, NextAvailableSlot, SlotHold, TimeSlot, WaitlistEntry
+)
+from .services import AvailabilityCache, NextSlotService
 
 
 class AppointmentHistoryInline(admin.TabularInline):
@@ -39,8 +43,9 @@ class AppointmentAdmin(admin.ModelAdmin):
     )
     ordering = ('-date', 'time')
     date_hierarchy = 'date'
+    # وضعیت فقط از طریق اکشن‌ها (QueueService.transition) تغییر می‌کند تا شمارنده‌ها و صف همگام بمانند
     readonly_fields = (
-        'created_at', 'updated_at', 'arrived_at', 'visit_started_at',
+        'status', 'created_at', 'updated_at', 'arrived_at', 'visit_started_at',
         'visited_at', 'cancelled_at'
     )
     raw_id_fields = ('patient', 'doctor', 'clinic', 'created_by', 'cancelled_by', 'tariff')
@@ -130,16 +135,31 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     actions = ['confirm_appointments', 'cancel_appointments', 'mark_as_visited']
     
+    def _transition(self, request, queryset, new_status, **fields):
+        """
+        تغییر وضعیت نوبت‌ها یکی‌یکی از مسیر QueueService.transition
+        تا شمارنده‌های صف، تایم‌ها، کش‌ها، گزارش‌ها و لیست انتظار همگام بمانند
+        """
+        # import داخلی برای جلوگیری از وابستگی چرخشی
+        from apps.queue.services import QueueService
+
+        count = 0
+        for appointment in queryset:
+            QueueService.transition(appointment, new_status, user=request.user, **fields)
+            count += 1
+        return count
+    
     @admin.action(description='تأیید نوبت‌های انتخاب شده')
     def confirm_appointments(self, request, queryset):
-        count = queryset.filter(status='pending').update(status='confirmed')
+        count = self._transition(request, queryset.filter(status='pending'), 'confirmed')
         self.message_user(request, f'{count} نوبت تأیید شد.')
     
     @admin.action(description='لغو نوبت‌های انتخاب شده')
     def cancel_appointments(self, request, queryset):
-        from django.utils import timezone
-        count = queryset.exclude(status__in=['cancelled', 'visited']).update(
-            status='cancelled',
+        count = self._transition(
+            request,
+            queryset.exclude(status__in=['cancelled', 'visited']),
+            'cancelled',
             cancelled_at=timezone.now(),
             cancelled_by=request.user
         )
@@ -147,9 +167,10 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     @admin.action(description='علامت‌گذاری به عنوان ویزیت شده')
     def mark_as_visited(self, request, queryset):
-        from django.utils import timezone
-        count = queryset.filter(status__in=['confirmed', 'arrived', 'in_progress']).update(
-            status='visited',
+        count = self._transition(
+            request,
+            queryset.filter(status__in=['confirmed', 'arrived', 'in_progress']),
+            'visited',
             visited_at=timezone.now()
         )
         self.message_user(request, f'{count} نوبت ویزیت شد.')
@@ -185,3 +206,58 @@ class TimeSlotAdmin(admin.ModelAdmin):
     ordering = ('-date', 'time')
     date_hierarchy = 'date'
     raw_id_fields = ('doctor', 'clinic')
+    actions = ['block_slots', 'unblock_slots']
+    
+    def _sync_days(self, days):
+        """باطل کردن کش و به‌روزرسانی نزدیک‌ترین تایم آزاد پس از تغییر مسدودی"""
+        for doctor_id, clinic_id, date in days:
+            AvailabilityCache.invalidate_date(doctor_id, clinic_id, date)
+        for doctor_id, clinic_id in {(doctor_id, clinic_id) for doctor_id, clinic_id, _ in days}:
+            NextSlotService.refresh(doctor_id, clinic_id)
+    
+    @admin.action(description='مسدود کردن تایم‌های انتخاب شده')
+    def block_slots(self, request, queryset):
+        days = set(queryset.values_list('doctor_id', 'clinic_id', 'date'))
+        count = queryset.update(is_blocked=True)
+        self._sync_days(days)
+        self.message_user(request, f'{count} تایم مسدود شد.')
+    
+    @admin.action(description='آزاد کردن تایم‌های انتخاب شده')
+    def unblock_slots(self, request, queryset):
+        days = set(queryset.values_list('doctor_id', 'clinic_id', 'date'))
+        count = queryset.update(is_blocked=False, block_reason=None)
+        self._sync_days(days)
+        self.message_user(request, f'{count} تایم آزاد شد.')
+
+
+@admin.register(NextAvailableSlot)
+class NextAvailableSlotAdmin(admin.ModelAdmin):
+    """پنل ادمین نزدیک‌ترین تایم‌های آزاد"""
+    
+    list_display = ('doctor', 'clinic', 'date', 'time', 'updated_at')
+    list_filter = ('clinic',)
+    search_fields = ('doctor__user__first_name', 'doctor__user__last_name', 'clinic__name')
+    ordering = ('date', 'time')
+    raw_id_fields = ('doctor', 'clinic')
+
+
+@admin.register(SlotHold)
+class SlotHoldAdmin(admin.ModelAdmin):
+    """پنل ادمین نگه‌داشت‌های موقت تایم"""
+    
+    list_display = ('doctor', 'clinic', 'patient', 'date', 'time', 'expires_at')
+    list_filter = ('clinic', 'date')
+    search_fields = ('doctor__user__first_name', 'doctor__user__last_name', 'patient__phone')
+    ordering = ('expires_at',)
+    raw_id_fields = ('doctor', 'clinic', 'patient')
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    """پنل ادمین لیست انتظار"""
+    
+    list_display = ('patient', 'doctor', 'clinic', 'date', 'status', 'offered_time', 'offer_expires_at', 'created_at')
+    list_filter = ('status', 'clinic', 'date')
+    search_fields = ('doctor__user__first_name', 'doctor__user__last_name', 'patient__phone')
+    ordering = ('date', 'created_at')
+    raw_id_fields = ('doctor', 'clinic', 'patient')
@@ -9,3 +9,6 @@ class AppointmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.appointments'
     verbose_name = 'مدیریت نوبت‌ها'
+
+    def ready(self):
+        from . import signals  # noqa: F401
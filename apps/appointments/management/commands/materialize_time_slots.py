@@ -0,0 +1,64 @@
+"""
+دستور مدیریتی ساخت تایم‌های قابل رزرو - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+تایم‌های افق رزرو هر پزشک (از امروز تا max_advance_days) را در جدول
+TimeSlot می‌سازد یا با برنامه کاری فعلی همگام می‌کند. اجرای روزانه باعث
+می‌شود روز تازه‌ای که وارد افق رزرو می‌شود از قبل ساخته شده باشد.
+نگه‌داشت‌های موقت منقضی (SlotHold) هم در همین اجرا پاک می‌شوند.
+
+استفاده:
+    python manage.py materialize_time_slots
+    python manage.py materialize_time_slots --doctor 3 --clinic 1
+    python manage.py materialize_time_slots --days 60
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.appointments.services import AvailabilityCache, SlotHoldService, TimeSlotService
+from apps.doctors.models import DoctorClinic
+
+
+class Command(BaseCommand):
+    help = 'ساخت/همگام‌سازی تایم‌های قابل رزرو (TimeSlot) در افق رزرو پزشکان'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, help='شناسه پزشک')
+        parser.add_argument('--clinic', type=int, help='شناسه مرکز')
+        parser.add_argument('--days', type=int, help='طول افق (پیش‌فرض max_advance_days هر پزشک)')
+
+    def handle(self, *args, **options):
+        doctor_clinics = DoctorClinic.objects.filter(
+            is_active=True,
+            doctor__is_active=True,
+            clinic__is_active=True
+        ).select_related('doctor', 'clinic')
+        if options['doctor']:
+            doctor_clinics = doctor_clinics.filter(doctor_id=options['doctor'])
+        if options['clinic']:
+            doctor_clinics = doctor_clinics.filter(clinic_id=options['clinic'])
+
+        today = timezone.now().date()
+        totals = {'created': 0, 'deleted': 0, 'updated': 0}
+        count = 0
+        for doctor_clinic in doctor_clinics:
+            end = None
+            if options['days']:
+                end = today + timedelta(days=max(options['days'], 1) - 1)
+            result = TimeSlotService.materialize(doctor_clinic.doctor, doctor_clinic.clinic, today, end)
+            if any(result.values()):
+                AvailabilityCache.invalidate(doctor_clinic.doctor_id, doctor_clinic.clinic_id)
+            for key in totals:
+                totals[key] += result[key]
+            count += 1
+
+        purged = SlotHoldService.purge_expired()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} پزشک/مرکز همگام شد: {totals['created']} تایم جدید، "
+            f"{totals['deleted']} حذف، {totals['updated']} بروزرسانی، "
+            f"{purged} نگه‌داشت منقضی پاک شد."
+        ))
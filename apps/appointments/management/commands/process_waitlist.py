@@ -0,0 +1,24 @@
+"""
+دستور مدیریتی انتقال پیشنهادهای منقضی لیست انتظار - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+تایم‌های آزادشده بلافاصله پس از لغو نوبت به لیست انتظار پیشنهاد می‌شوند؛
+این دستور فقط پیشنهادهایی را که در مهلت WAITLIST_OFFER_SECONDS رزرو
+نشده‌اند منقضی و همان تایم را به نفر بعدی پیشنهاد می‌کند. برای اجرای
+دقیقه‌ای با cron است.
+
+استفاده:
+    python manage.py process_waitlist
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.appointments.services import WaitlistService
+
+
+class Command(BaseCommand):
+    help = 'منقضی کردن پیشنهادهای بی‌پاسخ لیست انتظار و پیشنهاد به نفر بعدی'
+
+    def handle(self, *args, **options):
+        count = WaitlistService.expire_offers()
+        self.stdout.write(self.style.SUCCESS(f'{count} پیشنهاد منقضی به نفر بعدی منتقل شد.'))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_merge_20260206_0751'),
+        ('clinics', '0002_clinic_clinic_type_clinic_is_public_clinic_owner_and_more'),
+        ('appointments', '0002_appointment_insurance_type_appointment_service_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NextAvailableSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('time', models.TimeField(verbose_name='ساعت')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+                ('clinic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='next_slots', to='clinics.clinic', verbose_name='مرکز')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='next_slots', to='doctors.doctor', verbose_name='پزشک')),
+            ],
+            options={
+                'verbose_name': 'نزدیک\u200cترین تایم آزاد',
+                'verbose_name_plural': 'نزدیک\u200cترین تایم\u200cهای آزاد',
+                'db_table': 'appointments_next_available_slot',
+                'ordering': ['date', 'time'],
+                'indexes': [models.Index(fields=['date', 'time'], name='appointment_date_e2ee03_idx')],
+                'unique_together': {('doctor', 'clinic')},
+            },
+        ),
+    ]
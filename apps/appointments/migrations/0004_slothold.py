@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_merge_20260206_0751'),
+        ('clinics', '0002_clinic_clinic_type_clinic_is_public_clinic_owner_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0003_nextavailableslot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('time', models.TimeField(verbose_name='ساعت')),
+                ('expires_at', models.DateTimeField(verbose_name='زمان انقضا')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('clinic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='clinics.clinic', verbose_name='مرکز')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='doctors.doctor', verbose_name='پزشک')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to=settings.AUTH_USER_MODEL, verbose_name='بیمار')),
+            ],
+            options={
+                'verbose_name': 'نگه\u200cداشت تایم',
+                'verbose_name_plural': 'نگه\u200cداشت تایم\u200cها',
+                'db_table': 'appointments_slot_hold',
+                'ordering': ['expires_at'],
+                'indexes': [models.Index(fields=['expires_at'], name='appointment_expires_bbc0e3_idx')],
+                'unique_together': {('doctor', 'date', 'time')},
+            },
+        ),
+    ]
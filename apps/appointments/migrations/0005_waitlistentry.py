@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('doctors', '0004_merge_20260206_0751'),
+        ('clinics', '0002_clinic_clinic_type_clinic_is_public_clinic_owner_and_more'),
+        ('appointments', '0004_slothold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('status', models.CharField(choices=[('waiting', 'در انتظار'), ('offered', 'پیشنهاد شده'), ('booked', 'رزرو شده'), ('expired', 'منقضی شده'), ('cancelled', 'انصراف')], default='waiting', max_length=20, verbose_name='وضعیت')),
+                ('offered_time', models.TimeField(blank=True, null=True, verbose_name='ساعت پیشنهادی')),
+                ('offer_expires_at', models.DateTimeField(blank=True, null=True, verbose_name='مهلت پیشنهاد')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('clinic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='clinics.clinic', verbose_name='مرکز')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='doctors.doctor', verbose_name='پزشک')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL, verbose_name='بیمار')),
+            ],
+            options={
+                'verbose_name': 'لیست انتظار',
+                'verbose_name_plural': 'لیست\u200cهای انتظار',
+                'db_table': 'appointments_waitlist_entry',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['doctor', 'clinic', 'date', 'status', 'created_at'], name='appointment_doctor__7a9d75_idx'), models.Index(fields=['status', 'offer_expires_at'], name='appointment_status_56fa98_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['waiting', 'offered'])), fields=('patient', 'doctor', 'clinic', 'date'), name='unique_active_waitlist_entry'),
+        ),
+    ]
@@ -416,3 +416,188 @@ class TimeSlot(models.Model):
     
     def __str__(self):
         return f"{self.doctor} - {self.date} {self.time}"
+
+
+class NextAvailableSlot(models.Model):
+    """
+    نزدیک‌ترین تایم آزاد هر پزشک در هر مرکز (برای جستجوی اولین نوبت خالی)
+    """
+    
+    doctor = models.ForeignKey(
+        'doctors.Doctor',
+        on_delete=models.CASCADE,
+        related_name='next_slots',
+        verbose_name='پزشک'
+    )
+    clinic = models.ForeignKey(
+        'clinics.Clinic',
+        on_delete=models.CASCADE,
+        related_name='next_slots',
+        verbose_name='مرکز'
+    )
+    date = models.DateField(
+        verbose_name='تاریخ'
+    )
+    time = models.TimeField(
+        verbose_name='ساعت'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='آخرین بروزرسانی'
+    )
+    
+    class Meta:
+        db_table = 'appointments_next_available_slot'
+        verbose_name = 'نزدیک‌ترین تایم آزاد'
+        verbose_name_plural = 'نزدیک‌ترین تایم‌های آزاد'
+        ordering = ['date', 'time']
+        unique_together = ['doctor', 'clinic']
+        indexes = [
+            models.Index(fields=['date', 'time']),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor} - {self.date} {self.time}"
+
+
+class SlotHold(models.Model):
+    """
+    نگه‌داشتن موقت یک تایم برای بیمار در حین تکمیل رزرو/پرداخت
+    """
+    
+    doctor = models.ForeignKey(
+        'doctors.Doctor',
+        on_delete=models.CASCADE,
+        related_name='slot_holds',
+        verbose_name='پزشک'
+    )
+    clinic = models.ForeignKey(
+        'clinics.Clinic',
+        on_delete=models.CASCADE,
+        related_name='slot_holds',
+        verbose_name='مرکز'
+    )
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='slot_holds',
+        verbose_name='بیمار'
+    )
+    date = models.DateField(
+        verbose_name='تاریخ'
+    )
+    time = models.TimeField(
+        verbose_name='ساعت'
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='زمان انقضا'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='تاریخ ایجاد'
+    )
+    
+    class Meta:
+        db_table = 'appointments_slot_hold'
+        verbose_name = 'نگه‌داشت تایم'
+        verbose_name_plural = 'نگه‌داشت تایم‌ها'
+        ordering = ['expires_at']
+        # هم‌راستا با محدودیت unique_appointment_slot نوبت‌ها
+        unique_together = ['doctor', 'date', 'time']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor} - {self.date} {self.time} ({self.patient})"
+    
+    def is_expired(self):
+        """آیا زمان نگه‌داشت گذشته است"""
+        return self.expires_at <= timezone.now()
+
+
+class WaitlistEntry(models.Model):
+    """
+    لیست انتظار بیمار برای روز پر یک پزشک در یک مرکز
+    """
+    
+    STATUS_CHOICES = [
+        ('waiting', 'در انتظار'),
+        ('offered', 'پیشنهاد شده'),
+        ('booked', 'رزرو شده'),
+        ('expired', 'منقضی شده'),
+        ('cancelled', 'انصراف'),
+    ]
+    
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='بیمار'
+    )
+    doctor = models.ForeignKey(
+        'doctors.Doctor',
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='پزشک'
+    )
+    clinic = models.ForeignKey(
+        'clinics.Clinic',
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries',
+        verbose_name='مرکز'
+    )
+    date = models.DateField(
+        verbose_name='تاریخ'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='waiting',
+        verbose_name='وضعیت'
+    )
+    
+    # پیشنهاد تایم آزادشده
+    offered_time = models.TimeField(
+        blank=True,
+        null=True,
+        verbose_name='ساعت پیشنهادی'
+    )
+    offer_expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='مهلت پیشنهاد'
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='تاریخ ایجاد'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='تاریخ بروزرسانی'
+    )
+    
+    class Meta:
+        db_table = 'appointments_waitlist_entry'
+        verbose_name = 'لیست انتظار'
+        verbose_name_plural = 'لیست‌های انتظار'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['doctor', 'clinic', 'date', 'status', 'created_at']),
+            models.Index(fields=['status', 'offer_expires_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['patient', 'doctor', 'clinic', 'date'],
+                condition=models.Q(status__in=['waiting', 'offered']),
+                name='unique_active_waitlist_entry'
+            )
+        ]
+    
+    def __str__(self):
+        return f"{self.patient} - {self.doctor} - {self.date} ({self.get_status_display()})"
+    
+    def is_active(self):
+        """آیا بیمار هنوز در لیست انتظار است"""
+        return self.status in ['waiting', 'offered']
@@ -0,0 +1,16 @@
+"""
+سرویس‌های اپلیکیشن نوبت‌دهی - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from .availability_cache import AvailabilityCache
+from .booking_service import BookingService
+from .capacity_service import CapacityCalendarService
+from .hold_service import SlotHoldService
+from .next_slot_service import NextSlotService
+from .slot_service import TimeSlotService
+from .stats_service import AppointmentStatsService
+from .waitlist_service import WaitlistService
+
+__all__ = ['AppointmentStatsService', 'AvailabilityCache', 'BookingService', 'CapacityCalendarService', 'NextSlotService',
+           'SlotHoldService', 'TimeSlotService', 'WaitlistService']
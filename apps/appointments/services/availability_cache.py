@@ -0,0 +1,180 @@
+"""
+کش تایم‌ها و تقویم رزرو - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+لیست تایم‌های هر (پزشک، مرکز، تاریخ) و تقویم روزهای کاری در کش مشترک
+نگهداری می‌شوند. کلید هر داده شامل شماره نسل‌های مربوط است و باطل کردن
+فقط نسل همان دامنه را افزایش می‌دهد:
+
+    - نسل پزشک/مرکز: برنامه کاری، تنظیمات مرکز و مدت ویزیت (همه داده‌ها)
+    - نسل روز: نوبت‌ها، تعطیلی و مسدودی تایم‌های همان روز (لیست تایم‌ها)
+    - نسل تقویم: هر تغییری که ظرفیت یا تایم‌های روزها را عوض کند (تقویم
+      و خلاصه تایم‌های بازه)
+
+پر کردن دوباره کش تک‌پرواز است: با خالی شدن یک کلید فقط یک درخواست
+محاسبه را انجام می‌دهد و بقیه تا آماده شدن نتیجه منتظر می‌مانند.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.doctors.models import DoctorClinic
+from .capacity_service import CapacityCalendarService
+from .slot_service import TimeSlotService
+
+
+class AvailabilityCache:
+    """
+    کش تایم‌ها و تقویم رزرو با باطل‌سازی نسلی و پر کردن تک‌پرواز
+    """
+
+    TIMEOUT = getattr(settings, 'BOOKING_CACHE_TIMEOUT', 600)
+
+    # حداکثر مدت نگه داشتن قفل محاسبه (ثانیه)
+    LOCK_TIMEOUT = getattr(settings, 'BOOKING_CACHE_LOCK_SECONDS', 10)
+
+    # فاصله بررسی کش توسط درخواست‌های منتظر (ثانیه)
+    POLL_INTERVAL = 0.05
+
+    @staticmethod
+    def _generation_key(doctor_id, clinic_id, scope=None):
+        key = f'booking:gen:{doctor_id}:{clinic_id}'
+        return f'{key}:{scope}' if scope else key
+
+    @staticmethod
+    def _generations(*keys):
+        """شماره نسل‌ها با یک رفت‌وبرگشت (کلید گم‌شده مقدار تازه می‌گیرد)"""
+        values = cache.get_many(keys)
+        for key in keys:
+            if key not in values:
+                cache.add(key, int(time.time() * 1000), None)
+                values[key] = cache.get(key)
+        return ':'.join(str(values[key]) for key in keys)
+
+    @staticmethod
+    def _bump(key):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+    @staticmethod
+    def get_or_compute(key, compute):
+        """
+        خواندن از کش یا محاسبه تک‌پرواز
+
+        فقط درخواستی که قفل را بگیرد compute را اجرا می‌کند؛ بقیه تا
+        LOCK_TIMEOUT منتظر نتیجه می‌مانند و پس از آن خودشان محاسبه می‌کنند.
+        """
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, AvailabilityCache.LOCK_TIMEOUT):
+            try:
+                value = compute()
+                cache.set(key, value, AvailabilityCache.TIMEOUT)
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        deadline = time.monotonic() + AvailabilityCache.LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(AvailabilityCache.POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            if cache.get(lock_key) is None:
+                break
+        return compute()
+
+    @staticmethod
+    def get_slots(doctor, clinic, date):
+        """
+        تایم‌های یک روز (خروجی TimeSlotService.get_slots) از کش
+
+        فقط سطرهای خام کش می‌شوند و گذشته بودن تایم‌ها هنگام خواندن
+        محاسبه می‌شود.
+        """
+        generations = AvailabilityCache._generations(
+            AvailabilityCache._generation_key(doctor.id, clinic.id),
+            AvailabilityCache._generation_key(doctor.id, clinic.id, str(date)),
+        )
+        rows = AvailabilityCache.get_or_compute(
+            f'booking:slots:{doctor.id}:{clinic.id}:{date}:{generations}',
+            lambda: TimeSlotService.get_rows(doctor, clinic, date),
+        )
+        return TimeSlotService.get_slots(doctor, clinic, date, rows=rows)
+
+    @staticmethod
+    def _calendar_key(doctor, clinic, name):
+        generations = AvailabilityCache._generations(
+            AvailabilityCache._generation_key(doctor.id, clinic.id),
+            AvailabilityCache._generation_key(doctor.id, clinic.id, 'calendar'),
+        )
+        return f'booking:{name}:{doctor.id}:{clinic.id}:{timezone.now().date().isoformat()}:{generations}'
+
+    @staticmethod
+    def get_working_dates(doctor, clinic, max_days=None):
+        """روزهای قابل رزرو (خروجی CapacityCalendarService.get_working_dates) از کش"""
+        return AvailabilityCache.get_or_compute(
+            AvailabilityCache._calendar_key(doctor, clinic, f'dates:{max_days}'),
+            lambda: CapacityCalendarService.get_working_dates(doctor, clinic, max_days),
+        )
+
+    @staticmethod
+    def get_month(doctor, clinic, year, month):
+        """تقویم ماه شمسی (خروجی CapacityCalendarService.get_month) از کش"""
+        return AvailabilityCache.get_or_compute(
+            AvailabilityCache._calendar_key(doctor, clinic, f'month:{year}-{month}'),
+            lambda: CapacityCalendarService.get_month(doctor, clinic, year, month),
+        )
+
+    @staticmethod
+    def get_range(doctor, clinic, start, end, held=()):
+        """
+        خلاصه فشرده تقویم و تایم‌های آزاد بازه (TimeSlotService.encode_range)
+
+        وضعیت روزها و سطرهای تایم کش می‌شوند؛ گذشته بودن و نگه‌داشت تایم‌ها
+        هنگام خواندن اعمال می‌شوند.
+        """
+        def compute():
+            days = [
+                {key: day[key] for key in ('date', 'day_name', 'status', 'remaining')}
+                for day in CapacityCalendarService.get_calendar(doctor, clinic, start, end)
+            ]
+            rows = TimeSlotService.get_range_rows(
+                doctor, clinic, start, end,
+                dates=[day['date'] for day in days if day['status'] in ('available', 'full')]
+            )
+            return {'days': days, 'rows': rows}
+
+        data = AvailabilityCache.get_or_compute(
+            AvailabilityCache._calendar_key(doctor, clinic, f'range:{start}:{end}'),
+            compute,
+        )
+        return TimeSlotService.encode_range(data['days'], data['rows'], held)
+
+    @staticmethod
+    def invalidate(doctor_id, clinic_id):
+        """باطل کردن همه داده‌های پزشک در مرکز"""
+        AvailabilityCache._bump(AvailabilityCache._generation_key(doctor_id, clinic_id))
+
+    @staticmethod
+    def invalidate_date(doctor_id, clinic_id, date):
+        """باطل کردن تایم‌های یک روز و تقویم پزشک در مرکز"""
+        AvailabilityCache._bump(AvailabilityCache._generation_key(doctor_id, clinic_id, str(date)))
+        AvailabilityCache._bump(AvailabilityCache._generation_key(doctor_id, clinic_id, 'calendar'))
+
+    @staticmethod
+    def invalidate_doctor(doctor_id, date=None):
+        """باطل کردن داده‌های پزشک در همه مراکزش (یا فقط یک روز)"""
+        for clinic_id in DoctorClinic.objects.filter(doctor_id=doctor_id).values_list('clinic_id', flat=True):
+            if date is None:
+                AvailabilityCache.invalidate(doctor_id, clinic_id)
+            else:
+                AvailabilityCache.invalidate_date(doctor_id, clinic_id, date)
@@ -0,0 +1,213 @@
+"""
+سرویس ثبت نوبت - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+همه شرط‌های رزرو (فعالیت پزشک در مرکز، تعطیلی، برنامه کاری، مسدودی،
+رزرو یا نگه‌داشت بودن تایم، ظرفیت روز و نوبت تکراری بیمار) با یک کوئری
+و زیرکوئری‌های Exists/Subquery خوانده می‌شوند. بررسی داخل تراکنش رزرو
+و پس از قفل سطر پزشک انجام می‌شود: تایم نوبت برای پزشک (در همه مراکز)
+یکتاست، پس رزروهای هم‌زمان همان پزشک حتی در مراکز مختلف نتیجه یکدیگر را
+می‌بینند (MySQL محدودیت شرطی unique_appointment_slot را اعمال نمی‌کند).
+دلیل‌های رد به‌صورت کد برگردانده می‌شوند.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, IntegerField, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.doctors.models import Doctor, DoctorClinic, DoctorHoliday, WorkSchedule
+from ..models import Appointment, SlotHold, TimeSlot
+from .capacity_service import CapacityCalendarService
+
+
+class BookingService:
+    """
+    سرویس بررسی و ثبت نوبت
+    """
+
+    # کد دلیل رد → پیام (به ترتیب اولویت نمایش)
+    REASONS = {
+        'clinic_inactive': 'پزشک در این مرکز فعالیت ندارد',
+        'past_date': 'امکان رزرو برای تاریخ گذشته وجود ندارد',
+        'holiday': 'پزشک در این تاریخ تعطیل است',
+        'no_schedule': 'پزشک در این روز در این مرکز برنامه‌ای ندارد',
+        'slot_blocked': 'این زمان برای رزرو در دسترس نیست. لطفاً زمان دیگری انتخاب کنید.',
+        'slot_taken': 'این زمان قبلاً رزرو شده است. لطفاً زمان دیگری انتخاب کنید.',
+        'slot_held': 'این زمان موقتاً توسط بیمار دیگری در حال رزرو است. لطفاً زمان دیگری انتخاب کنید.',
+        'day_full': 'ظرفیت نوبت این روز تکمیل شده است',
+        'patient_duplicate': 'شما قبلاً در این تاریخ نزد این پزشک نوبت دارید',
+    }
+
+    # قوانین رزرو آنلاین بیمار (همه شرط‌ها)
+    ONLINE_RULES = tuple(REASONS)
+
+    # قوانین ثبت نوبت توسط پزشک یا منشی (فقط تداخل زمان)
+    STAFF_RULES = ('slot_taken',)
+
+    @staticmethod
+    def preflight(doctor, clinic_id, date, time, patient=None):
+        """
+        خواندن همه شرط‌های رزرو با یک کوئری
+
+        Args:
+            doctor (Doctor): پزشک
+            clinic_id (int|None): شناسه مرکز
+            date, time: تاریخ و ساعت نوبت
+            patient (User|None): بیمار (برای بررسی نوبت تکراری)
+
+        Returns:
+            dict: واقعیت‌های رزرو به همراه 'reasons' (لیست کدهای رد)
+        """
+        booked = Appointment.objects.filter(
+            doctor_id=doctor.id,
+            clinic_id=clinic_id,
+            date=date,
+            status__in=CapacityCalendarService.BOOKED_STATUSES
+        )
+        doctor_clinic = DoctorClinic.objects.filter(doctor_id=doctor.id, clinic_id=clinic_id)
+        schedules = WorkSchedule.objects.filter(
+            doctor_id=doctor.id,
+            clinic_id=clinic_id,
+            day_of_week=CapacityCalendarService.get_day_of_week(date),
+            is_active=True
+        ).order_by('start_time')
+
+        # نگه‌داشت منقضی‌نشده بیمار دیگر روی همین تایم
+        holds = SlotHold.objects.filter(
+            doctor_id=doctor.id,
+            date=date,
+            time=time,
+            expires_at__gt=timezone.now()
+        )
+
+        if patient is not None:
+            patient_booked = Exists(Appointment.objects.filter(
+                patient_id=patient.id,
+                doctor_id=doctor.id,
+                date=date,
+                status__in=['pending', 'confirmed']
+            ))
+            holds = holds.exclude(patient_id=patient.id)
+        else:
+            patient_booked = Value(False)
+
+        facts = Doctor.objects.filter(pk=doctor.id).annotate(
+            clinic_active=Exists(doctor_clinic.filter(is_active=True, clinic__is_active=True)),
+            custom_visit_fee=Subquery(doctor_clinic.values('custom_visit_fee')[:1]),
+            is_holiday=Exists(DoctorHoliday.objects.filter(
+                doctor_id=doctor.id,
+                date=date
+            ).filter(
+                Q(clinic_id=clinic_id) | Q(clinic__isnull=True)
+            )),
+            has_schedule=Exists(schedules),
+            schedule_max=Subquery(schedules.values('max_appointments')[:1]),
+            slot_blocked=Exists(TimeSlot.objects.filter(
+                doctor_id=doctor.id,
+                clinic_id=clinic_id,
+                date=date,
+                time=time,
+                is_blocked=True
+            )),
+            # همان شرط محدودیت unique_appointment_slot
+            slot_taken=Exists(Appointment.objects.filter(
+                doctor_id=doctor.id,
+                date=date,
+                time=time
+            ).exclude(status='cancelled')),
+            slot_held=Exists(holds),
+            booked_count=Coalesce(
+                Subquery(
+                    booked.order_by().values('doctor_id').annotate(count=Count('id')).values('count'),
+                    output_field=IntegerField()
+                ),
+                Value(0)
+            ),
+            patient_booked=patient_booked,
+        ).values(
+            'clinic_active', 'custom_visit_fee', 'is_holiday', 'has_schedule', 'schedule_max',
+            'slot_blocked', 'slot_taken', 'slot_held', 'booked_count', 'patient_booked',
+        ).get()
+
+        facts['max_appointments'] = facts['schedule_max'] or doctor.max_daily_appointments
+        facts['visit_fee'] = facts['custom_visit_fee'] or doctor.visit_fee or 0
+
+        checks = {
+            'clinic_inactive': not facts['clinic_active'],
+            'past_date': date < timezone.now().date(),
+            'holiday': facts['is_holiday'],
+            'no_schedule': not facts['has_schedule'],
+            'slot_blocked': facts['slot_blocked'],
+            'slot_taken': facts['slot_taken'],
+            'slot_held': facts['slot_held'],
+            'day_full': facts['booked_count'] >= facts['max_appointments'],
+            'patient_duplicate': bool(facts['patient_booked']),
+        }
+        facts['reasons'] = [code for code in BookingService.REASONS if checks[code]]
+        return facts
+
+    @staticmethod
+    def get_message(reasons):
+        """پیام اولین دلیل رد"""
+        return BookingService.REASONS[reasons[0]] if reasons else None
+
+    @staticmethod
+    def book(doctor, clinic_id, date, time, patient, rules=ONLINE_RULES, with_fee=False, **fields):
+        """
+        بررسی شرط‌ها و ثبت نوبت در یک تراکنش
+
+        ابتدا سطر پزشک قفل و شماره صف تخصیص می‌یابد، سپس شرط‌ها بررسی و در
+        صورت رد تراکنش برگردانده می‌شود.
+
+        Args:
+            rules (tuple): کدهای دلیل رد که باید اعمال شوند
+            with_fee (bool): ثبت هزینه ویزیت مرکز در payment_amount
+            **fields: فیلدهای دیگر نوبت (status، booking_source و ...)
+
+        Returns:
+            dict: {'appointment': Appointment|None, 'reasons': [...],
+            'message': str|None, 'facts': dict}
+        """
+        # import داخلی برای جلوگیری از وابستگی چرخشی
+        from apps.queue.services import QueueService
+        from .waitlist_service import WaitlistService
+
+        appointment = None
+        try:
+            with transaction.atomic():
+                # قفل سطح پزشک: بررسی slot_taken برای همه مراکز پزشک پشت سر هم انجام شود
+                list(Doctor.objects.select_for_update().filter(pk=doctor.id).values_list('pk'))
+                queue_number = QueueService.allocate_queue_number(doctor.id, clinic_id, date)
+                facts = BookingService.preflight(doctor, clinic_id, date, time, patient)
+                reasons = [code for code in facts['reasons'] if code in rules]
+                if reasons:
+                    transaction.set_rollback(True)
+                else:
+                    if with_fee:
+                        fields['payment_amount'] = facts['visit_fee']
+                    appointment = Appointment.objects.create(
+                        patient=patient,
+                        doctor=doctor,
+                        clinic_id=clinic_id,
+                        date=date,
+                        time=time,
+                        queue_number=queue_number,
+                        **fields
+                    )
+                    QueueService.register_booking(appointment)
+                    # تبدیل نگه‌داشت بیمار به نوبت و خروج از لیست انتظار همان روز
+                    SlotHold.objects.filter(doctor_id=doctor.id, patient_id=patient.id, date=date).delete()
+                    WaitlistService.mark_booked(appointment)
+        except IntegrityError:
+            # همین زمان هم‌زمان توسط درخواست دیگری رزرو شد
+            appointment = None
+            facts = {}
+            reasons = ['slot_taken']
+
+        return {
+            'appointment': appointment,
+            'reasons': reasons,
+            'message': BookingService.get_message(reasons),
+            'facts': facts,
+        }
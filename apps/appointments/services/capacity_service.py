@@ -0,0 +1,168 @@
+"""
+سرویس تقویم ظرفیت نوبت‌دهی - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+ظرفیت همه روزهای یک بازه با سه کوئری ثابت محاسبه می‌شود:
+برنامه کاری پزشک در مرکز، تعطیلات بازه و تعداد نوبت‌های رزروشده به تفکیک
+تاریخ (یک GROUP BY). ترکیب آن‌ها در حافظه انجام می‌شود.
+"""
+
+from datetime import timedelta
+
+import jdatetime
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.doctors.models import DoctorHoliday, WorkSchedule
+from ..models import Appointment
+
+
+class CapacityCalendarService:
+    """
+    سرویس تقویم ظرفیت روزانه پزشک در یک مرکز
+    """
+
+    # وضعیت‌هایی که ظرفیت روز را اشغال می‌کنند
+    BOOKED_STATUSES = ['pending', 'confirmed', 'arrived', 'in_progress']
+
+    DAY_NAMES = ['شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه', 'پنج‌شنبه', 'جمعه']
+
+    @staticmethod
+    def get_day_of_week(date):
+        """روز هفته شمسی (شنبه=0 ... جمعه=6)"""
+        return (date.weekday() + 2) % 7
+
+    @staticmethod
+    def get_calendar(doctor, clinic, start, end):
+        """
+        وضعیت ظرفیت همه روزهای بازه [start, end]
+
+        Returns:
+            list of dict: برای هر روز {'date', 'date_str', 'day_of_week',
+            'day_name', 'status', 'schedules', 'booked_count',
+            'max_appointments', 'remaining'}؛ status یکی از
+            off (بدون برنامه)، holiday، full، available است.
+        """
+        # ۱. برنامه کاری: {day_of_week: [schedule, ...]}
+        schedule_map = {}
+        for ws in WorkSchedule.objects.filter(
+            doctor=doctor,
+            clinic=clinic,
+            is_active=True
+        ).order_by('day_of_week', 'start_time'):
+            schedule_map.setdefault(ws.day_of_week, []).append(ws)
+
+        if not schedule_map:
+            return []
+
+        # ۲. تعطیلات بازه
+        holidays = set(
+            DoctorHoliday.objects.filter(
+                doctor=doctor,
+                date__gte=start,
+                date__lte=end
+            ).filter(
+                Q(clinic=clinic) | Q(clinic__isnull=True)
+            ).values_list('date', flat=True)
+        )
+
+        # ۳. تعداد نوبت‌های رزروشده هر روز با یک GROUP BY
+        booked = dict(
+            Appointment.objects.filter(
+                doctor=doctor,
+                clinic=clinic,
+                date__gte=start,
+                date__lte=end,
+                status__in=CapacityCalendarService.BOOKED_STATUSES
+            ).values('date').annotate(
+                count=Count('id')
+            ).order_by().values_list('date', 'count')
+        )
+
+        today = timezone.now().date()
+        days = []
+        date = start
+        while date <= end:
+            day_of_week = CapacityCalendarService.get_day_of_week(date)
+            schedules = schedule_map.get(day_of_week, [])
+            booked_count = booked.get(date, 0)
+            max_for_day = (
+                (schedules[0].max_appointments or doctor.max_daily_appointments) if schedules else 0
+            )
+
+            if not schedules:
+                status = 'off'
+            elif date in holidays:
+                status = 'holiday'
+            elif booked_count >= max_for_day:
+                status = 'full'
+            else:
+                status = 'available'
+
+            days.append({
+                'date': date,
+                'date_str': date.isoformat(),
+                'day_of_week': day_of_week,
+                'day_name': CapacityCalendarService.DAY_NAMES[day_of_week],
+                'is_today': (date == today),
+                'status': status,
+                'schedules': schedules,
+                'booked_count': booked_count,
+                'max_appointments': max_for_day,
+                'remaining': max(max_for_day - booked_count, 0),
+            })
+            date += timedelta(days=1)
+
+        return days
+
+    @staticmethod
+    def get_working_dates(doctor, clinic, max_days=None):
+        """
+        روزهای قابل رزرو از امروز تا max_advance_days پزشک
+
+        Returns:
+            list of dict: فقط روزهای available خروجی get_calendar
+        """
+        if max_days is None:
+            max_days = doctor.max_advance_days or 30
+
+        today = timezone.now().date()
+        days = CapacityCalendarService.get_calendar(
+            doctor, clinic, today, today + timedelta(days=max_days - 1)
+        )
+        return [day for day in days if day['status'] == 'available']
+
+    @staticmethod
+    def get_month(doctor, clinic, year, month):
+        """
+        تقویم یک ماه شمسی کامل برای صفحه رزرو (یک رفت‌وبرگشت)
+
+        روزهای گذشته و روزهای خارج از بازه رزرو پزشک با وضعیت
+        past و out_of_range مشخص می‌شوند.
+
+        Args:
+            year (int): سال شمسی
+            month (int): ماه شمسی (۱ تا ۱۲)
+
+        Returns:
+            list of dict: روزهای ماه به همراه 'jalali_day'
+        """
+        first = jdatetime.date(year, month, 1)
+        if month == 12:
+            next_first = jdatetime.date(year + 1, 1, 1)
+        else:
+            next_first = jdatetime.date(year, month + 1, 1)
+        start = first.togregorian()
+        end = next_first.togregorian() - timedelta(days=1)
+
+        today = timezone.now().date()
+        last_bookable = today + timedelta(days=(doctor.max_advance_days or 30) - 1)
+
+        days = CapacityCalendarService.get_calendar(doctor, clinic, start, end)
+        for day in days:
+            day['jalali_day'] = jdatetime.date.fromgregorian(date=day['date']).day
+            if day['date'] < today:
+                day['status'] = 'past'
+            elif day['date'] > last_bookable and day['status'] == 'available':
+                day['status'] = 'out_of_range'
+        return days
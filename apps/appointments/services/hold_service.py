@@ -0,0 +1,139 @@
+"""
+سرویس نگه‌داشت موقت تایم - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+با انتخاب یک تایم، آن تایم برای BOOKING_HOLD_SECONDS ثانیه به نام بیمار
+نگه داشته می‌شود تا در حین تکمیل رزرو/پرداخت، بیمار دیگری همان تایم را
+نگیرد. لیست تایم‌ها تایم‌های نگه‌داشته‌شده دیگران را ناموجود نشان می‌دهد
+و ثبت نوبت (BookingService.book) نگه‌داشت بیمار را در همان تراکنش حذف
+می‌کند. نگه‌داشت‌های منقضی نادیده گرفته و به‌صورت دوره‌ای پاک می‌شوند.
+
+هر بیمار نزد هر پزشک فقط یک نگه‌داشت دارد و تعداد نگه‌داشت‌های فعالش در
+همه پزشکان به BOOKING_MAX_ACTIVE_HOLDS محدود است. گرفتن دوباره همان تایم
+مهلت آن را تمدید نمی‌کند.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import SlotHold
+from .booking_service import BookingService
+
+
+class SlotHoldService:
+    """
+    سرویس گرفتن، آزاد کردن و خواندن نگه‌داشت تایم‌ها
+    """
+
+    HOLD_SECONDS = getattr(settings, 'BOOKING_HOLD_SECONDS', 300)
+    MAX_ACTIVE_HOLDS = getattr(settings, 'BOOKING_MAX_ACTIVE_HOLDS', 3)
+
+    LIMIT_MESSAGE = 'تعداد تایم‌های در حال رزرو شما به حداکثر رسیده است. لطفاً ابتدا رزروهای قبلی را تکمیل کنید.'
+
+    @staticmethod
+    def acquire(doctor, clinic_id, date, time, patient):
+        """
+        نگه‌داشتن یک تایم برای بیمار (نگه‌داشت قبلی او نزد همین پزشک آزاد می‌شود)
+
+        Returns:
+            dict: {'hold': SlotHold|None, 'reasons': [...], 'message': str|None}
+        """
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                previous = SlotHold.objects.filter(
+                    doctor_id=doctor.id,
+                    patient_id=patient.id,
+                    expires_at__gt=now
+                )
+                # تکرار درخواست همان تایم مهلت را تمدید نمی‌کند
+                same = previous.filter(clinic_id=clinic_id, date=date, time=time).first()
+                if same is not None:
+                    return {'hold': same, 'reasons': [], 'message': None}
+
+                SlotHold.objects.filter(doctor_id=doctor.id, patient_id=patient.id).delete()
+                if SlotHold.objects.filter(
+                    patient_id=patient.id,
+                    expires_at__gt=now
+                ).count() >= SlotHoldService.MAX_ACTIVE_HOLDS:
+                    transaction.set_rollback(True)
+                    return {'hold': None, 'reasons': ['hold_limit'], 'message': SlotHoldService.LIMIT_MESSAGE}
+
+                SlotHold.objects.filter(
+                    doctor_id=doctor.id,
+                    date=date,
+                    time=time,
+                    expires_at__lte=now
+                ).delete()
+
+                facts = BookingService.preflight(doctor, clinic_id, date, time, patient)
+                reasons = facts['reasons']
+                if reasons:
+                    transaction.set_rollback(True)
+                    hold = None
+                else:
+                    hold = SlotHold.objects.create(
+                        doctor_id=doctor.id,
+                        clinic_id=clinic_id,
+                        patient_id=patient.id,
+                        date=date,
+                        time=time,
+                        expires_at=now + timedelta(seconds=SlotHoldService.HOLD_SECONDS),
+                    )
+        except IntegrityError:
+            # بیمار دیگری هم‌زمان همین تایم را نگه داشت
+            hold = None
+            reasons = ['slot_held']
+
+        return {
+            'hold': hold,
+            'reasons': reasons,
+            'message': BookingService.get_message(reasons),
+        }
+
+    @staticmethod
+    def release(doctor_id, patient_id):
+        """آزاد کردن نگه‌داشت بیمار نزد پزشک"""
+        return SlotHold.objects.filter(doctor_id=doctor_id, patient_id=patient_id).delete()[0]
+
+    @staticmethod
+    def get_held_times(doctor, clinic, date, exclude_patient=None):
+        """
+        ساعت‌های نگه‌داشته‌شده و منقضی‌نشده یک روز (یک کوئری)
+
+        Args:
+            exclude_patient (User|None): نگه‌داشت‌های این بیمار حساب نمی‌شوند
+        """
+        holds = SlotHold.objects.filter(
+            doctor_id=doctor.id,
+            clinic_id=clinic.id,
+            date=date,
+            expires_at__gt=timezone.now()
+        )
+        if exclude_patient is not None:
+            holds = holds.exclude(patient_id=exclude_patient.id)
+        return set(holds.values_list('time', flat=True))
+
+    @staticmethod
+    def get_held_range(doctor, clinic, start, end, exclude_patient=None):
+        """
+        (date, time) نگه‌داشت‌های منقضی‌نشده بازه [start, end] (یک کوئری)
+        """
+        holds = SlotHold.objects.filter(
+            doctor_id=doctor.id,
+            clinic_id=clinic.id,
+            date__gte=start,
+            date__lte=end,
+            expires_at__gt=timezone.now()
+        )
+        if exclude_patient is not None:
+            holds = holds.exclude(patient_id=exclude_patient.id)
+        return set(holds.values_list('date', 'time'))
+
+    @staticmethod
+    def purge_expired():
+        """حذف نگه‌داشت‌های منقضی"""
+        return SlotHold.objects.filter(expires_at__lte=timezone.now()).delete()[0]
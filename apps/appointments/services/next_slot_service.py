@@ -0,0 +1,157 @@
+"""
+سرویس جستجوی اولین تایم آزاد - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+نزدیک‌ترین تایم آزاد هر (پزشک، مرکز) در جدول NextAvailableSlot نگهداری
+می‌شود و با هر تغییر تایم‌ها (رزرو، لغو، مسدودی، ساخت افق رزرو و تغییر
+ظرفیت روزانه) فقط سطر همان پزشک/مرکز دوباره محاسبه می‌شود. تایم‌های
+روزهایی که ظرفیتشان پر شده در نظر گرفته نمی‌شوند. جستجوی بین پزشکان یک کوئری مرتب‌شده
+روی ایندکس (date, time) این جدول است.
+
+سطرهایی که زمانشان گذشته (روز جاری یا روزهای قبل) هنگام جستجو به‌روز
+می‌شوند و تا آن زمان در نتیجه نمی‌آیند.
+"""
+
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from apps.doctors.models import Doctor, DoctorClinic, WorkSchedule
+from ..models import Appointment, NextAvailableSlot, TimeSlot
+from .capacity_service import CapacityCalendarService
+
+
+class NextSlotService:
+    """
+    نگهداری و جستجوی نزدیک‌ترین تایم آزاد پزشکان
+    """
+
+    # حداکثر سطرهای منقضی که در هر جستجو به‌روز می‌شوند (ضریب limit)
+    STALE_REFRESH_FACTOR = 5
+
+    @staticmethod
+    def _future_q(prefix=''):
+        """شرط تایم‌های آینده نسبت به ساعت محلی فعلی"""
+        now = timezone.localtime()
+        return (
+            Q(**{f'{prefix}date__gt': now.date()})
+            | Q(**{f'{prefix}date': now.date(), f'{prefix}time__gt': now.time()})
+        )
+
+    @staticmethod
+    def get_full_dates(doctor_id, clinic_id):
+        """
+        روزهای آینده‌ای که ظرفیت روزانه‌شان پر شده است
+
+        سقف هر روز مانند BookingService.preflight است: max_appointments
+        اولین بازه کاری آن روز هفته یا max_daily_appointments پزشک.
+
+        Returns:
+            list[date]
+        """
+        doctor_max = Doctor.objects.filter(pk=doctor_id).values_list(
+            'max_daily_appointments', flat=True
+        ).first()
+        schedule_max = {}
+        for day_of_week, max_appointments in WorkSchedule.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            is_active=True
+        ).order_by('start_time').values_list('day_of_week', 'max_appointments'):
+            schedule_max.setdefault(day_of_week, max_appointments)
+
+        booked = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date__gte=timezone.localdate(),
+            status__in=CapacityCalendarService.BOOKED_STATUSES
+        ).values('date').annotate(count=Count('id')).order_by().values_list('date', 'count')
+
+        return [
+            date for date, count in booked
+            if count >= (
+                schedule_max.get(CapacityCalendarService.get_day_of_week(date)) or doctor_max or 0
+            )
+        ]
+
+    @staticmethod
+    def refresh(doctor_id, clinic_id):
+        """
+        محاسبه دوباره نزدیک‌ترین تایم آزاد یک پزشک در یک مرکز
+
+        روزهایی که ظرفیت روزانه‌شان پر شده نادیده گرفته می‌شوند. خارج از
+        تراکنش رزرو صدا زده شود (on_commit) تا سطر NextAvailableSlot
+        رزروهای هم‌زمان را پشت سر هم نیندازد.
+
+        Returns:
+            tuple|None: (date, time) یا None اگر تایم آزادی نباشد
+        """
+        first = TimeSlot.objects.filter(
+            NextSlotService._future_q(),
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            is_available=True,
+            is_blocked=False
+        ).exclude(
+            date__in=NextSlotService.get_full_dates(doctor_id, clinic_id)
+        ).order_by('date', 'time').values_list('date', 'time').first()
+
+        if first is None:
+            NextAvailableSlot.objects.filter(doctor_id=doctor_id, clinic_id=clinic_id).delete()
+        else:
+            NextAvailableSlot.objects.update_or_create(
+                doctor_id=doctor_id,
+                clinic_id=clinic_id,
+                defaults={'date': first[0], 'time': first[1]},
+            )
+        return first
+
+    @staticmethod
+    def refresh_doctor(doctor_id):
+        """محاسبه دوباره نزدیک‌ترین تایم آزاد پزشک در همه مراکز فعالش"""
+        for clinic_id in DoctorClinic.objects.filter(
+            doctor_id=doctor_id, is_active=True
+        ).values_list('clinic_id', flat=True):
+            NextSlotService.refresh(doctor_id, clinic_id)
+
+    @staticmethod
+    def search(specialization=None, city=None, province=None, limit=10):
+        """
+        نزدیک‌ترین تایم‌های آزاد بین همه پزشکان فعال (هر پزشک/مرکز یک تایم)
+
+        Args:
+            specialization (str|None): تخصص پزشک
+            city, province (str|None): شهر/استان مرکز
+            limit (int): حداکثر تعداد نتیجه
+
+        Returns:
+            list[NextAvailableSlot]: به ترتیب زمان (همراه doctor.user و clinic)
+        """
+        slots = NextAvailableSlot.objects.filter(
+            Exists(DoctorClinic.objects.filter(
+                doctor_id=OuterRef('doctor_id'),
+                clinic_id=OuterRef('clinic_id'),
+                is_active=True
+            )),
+            doctor__is_active=True,
+            doctor__allows_online_booking=True,
+            clinic__is_active=True,
+        )
+        if specialization:
+            slots = slots.filter(doctor__specialization=specialization)
+        if city:
+            slots = slots.filter(clinic__city=city)
+        if province:
+            slots = slots.filter(clinic__province=province)
+
+        # به‌روزرسانی سطرهایی که زمانشان گذشته
+        stale = slots.exclude(NextSlotService._future_q()).order_by('date', 'time').values_list(
+            'doctor_id', 'clinic_id'
+        )[:limit * NextSlotService.STALE_REFRESH_FACTOR]
+        for doctor_id, clinic_id in list(stale):
+            NextSlotService.refresh(doctor_id, clinic_id)
+
+        return list(
+            slots.filter(NextSlotService._future_q()).select_related(
+                'doctor__user', 'clinic'
+            ).order_by('date', 'time')[:limit]
+        )
@@ -0,0 +1,439 @@
+"""
+سرویس تایم‌های ازپیش‌ساخته نوبت‌دهی - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+تایم‌های هر روز از برنامه کاری پزشک، مدت ویزیت و فاصله بین نوبت‌ها
+ساخته و در جدول TimeSlot ذخیره می‌شوند تا لیست تایم‌ها فقط یک خواندن
+روی ایندکس (doctor, clinic, date, time) باشد:
+
+    - ساخت افق رزرو: دستور materialize_time_slots (روزانه) و ساخت
+      تنبل روزی که هنوز تایمی ندارد
+    - رزرو/لغو: is_available در همان تراکنش تغییر وضعیت نوبت عوض می‌شود
+      (QueueService.apply_transition)
+    - تغییر برنامه کاری، تعطیلی یا مدت ویزیت: فقط تفاوت‌ها بازنویسی
+      می‌شوند و تایم‌های باقی‌مانده وضعیت مسدودی (is_blocked) خود را حفظ می‌کنند
+
+پس از هر تغییر، نزدیک‌ترین تایم آزاد همان پزشک/مرکز (NextSlotService)
+به‌روز می‌شود.
+
+ساعت‌ها در محاسبات به‌صورت دقیقه از ابتدای روز (عدد صحیح) نگه داشته
+می‌شوند: الگوی تایم‌های هر بازه کاری یک بار برای هر ترکیب (بازه، مدت
+ویزیت، طول تایم) ساخته و در حافظه پروسه نگه داشته می‌شود و تغییر هر یک
+از این مقادیر کلید تازه‌ای می‌سازد. برچسب 'HH:MM' هر دقیقه هم فقط یک بار
+ساخته می‌شود.
+"""
+
+from datetime import time as dt_time, timedelta
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.doctors.models import DoctorClinic, DoctorHoliday, WorkSchedule
+from ..models import Appointment, TimeSlot
+from .capacity_service import CapacityCalendarService
+from .next_slot_service import NextSlotService
+
+# ساعت و برچسب هر دقیقه شبانه‌روز
+MINUTE_TIMES = tuple(dt_time(minute // 60, minute % 60) for minute in range(24 * 60))
+MINUTE_LABELS = tuple(value.strftime('%H:%M') for value in MINUTE_TIMES)
+
+
+@lru_cache(maxsize=1024)
+def _compile_template(start_minute, end_minute, visit_duration, slot_duration):
+    """دقیقه‌های شروع تایم‌های یک بازه کاری (هر تایم باید تا پایان بازه تمام شود)"""
+    return tuple(range(start_minute, end_minute - visit_duration + 1, max(slot_duration, 1)))
+
+
+class TimeSlotService:
+    """
+    سرویس ساخت، خواندن و بروزرسانی تایم‌های قابل رزرو
+    """
+
+    @staticmethod
+    def get_slot_minutes(doctor, clinic):
+        """
+        مدت ویزیت و طول هر تایم (ویزیت + فاصله) برای پزشک در مرکز
+
+        Returns:
+            tuple: (visit_duration, slot_duration) به دقیقه
+        """
+        doctor_clinic = DoctorClinic.objects.filter(doctor=doctor, clinic=clinic).first()
+        visit_duration = (
+            doctor_clinic.custom_visit_duration if doctor_clinic and doctor_clinic.custom_visit_duration
+            else doctor.visit_duration
+        )
+        return visit_duration, visit_duration + doctor.gap_between_visits
+
+    @staticmethod
+    def to_minutes(value):
+        """تبدیل ساعت به دقیقه از ابتدای روز"""
+        return value.hour * 60 + value.minute
+
+    @staticmethod
+    def get_template(schedule, visit_duration, slot_duration):
+        """الگوی ازپیش‌ساخته دقیقه‌های شروع تایم‌های یک برنامه کاری"""
+        return _compile_template(
+            TimeSlotService.to_minutes(schedule.start_time),
+            TimeSlotService.to_minutes(schedule.end_time),
+            visit_duration,
+            slot_duration,
+        )
+
+    @staticmethod
+    def build_minutes(schedules, visit_duration, slot_duration):
+        """دقیقه‌های شروع تایم‌های یک روز (مرتب) از بازه‌های کاری آن روز"""
+        if len(schedules) == 1:
+            return TimeSlotService.get_template(schedules[0], visit_duration, slot_duration)
+        minutes = set()
+        for ws in schedules:
+            minutes.update(TimeSlotService.get_template(ws, visit_duration, slot_duration))
+        return tuple(sorted(minutes))
+
+    @staticmethod
+    def get_horizon(doctor):
+        """
+        افق رزرو پزشک
+
+        Returns:
+            tuple: (today, آخرین روز قابل رزرو)
+        """
+        today = timezone.now().date()
+        return today, today + timedelta(days=(doctor.max_advance_days or 30) - 1)
+
+    @staticmethod
+    def materialize(doctor, clinic, start=None, end=None, dates=None):
+        """
+        ساخت/همگام‌سازی تایم‌های یک بازه با برنامه کاری فعلی
+
+        تایم‌های جدید ایجاد، تایم‌های خارج از برنامه (یا روزهای تعطیل)
+        حذف و موجود بودن بقیه با نوبت‌های رزروشده همگام می‌شود. تعداد
+        کوئری‌ها به طول بازه بستگی ندارد.
+
+        Args:
+            start, end (date|None): بازه (پیش‌فرض: امروز تا max_advance_days)
+            dates (iterable|None): به‌جای بازه، فقط همین روزها
+
+        Returns:
+            dict: {'created', 'deleted', 'updated'}
+        """
+        if dates is None:
+            if start is None:
+                start = timezone.now().date()
+            if end is None:
+                end = start + timedelta(days=(doctor.max_advance_days or 30) - 1)
+            dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        dates = sorted(set(dates))
+        if not dates:
+            return {'created': 0, 'deleted': 0, 'updated': 0}
+
+        schedule_map = {}
+        for ws in WorkSchedule.objects.filter(
+            doctor=doctor,
+            clinic=clinic,
+            is_active=True
+        ).order_by('start_time'):
+            schedule_map.setdefault(ws.day_of_week, []).append(ws)
+
+        holidays = set(
+            DoctorHoliday.objects.filter(
+                doctor=doctor,
+                date__in=dates
+            ).filter(
+                Q(clinic=clinic) | Q(clinic__isnull=True)
+            ).values_list('date', flat=True)
+        )
+        visit_duration, slot_duration = TimeSlotService.get_slot_minutes(doctor, clinic)
+
+        # الگوی دقیقه‌های هر روز هفته یک بار برای کل بازه
+        day_minutes = {
+            day_of_week: TimeSlotService.build_minutes(schedules, visit_duration, slot_duration)
+            for day_of_week, schedules in schedule_map.items()
+        }
+        to_minutes = TimeSlotService.to_minutes
+
+        with transaction.atomic():
+            booked = {
+                (booked_date, to_minutes(booked_time))
+                for booked_date, booked_time in Appointment.objects.filter(
+                    doctor=doctor,
+                    clinic=clinic,
+                    date__in=dates,
+                    status__in=CapacityCalendarService.BOOKED_STATUSES
+                ).values_list('date', 'time')
+            }
+            existing = {
+                (slot_date, to_minutes(slot_time)): (pk, is_available)
+                for pk, slot_date, slot_time, is_available in TimeSlot.objects.select_for_update().filter(
+                    doctor=doctor,
+                    clinic=clinic,
+                    date__in=dates
+                ).values_list('id', 'date', 'time', 'is_available')
+            }
+
+            to_create = []
+            to_book = []
+            to_free = []
+            wanted = set()
+            for date in dates:
+                if date in holidays:
+                    continue
+                for minute in day_minutes.get(CapacityCalendarService.get_day_of_week(date), ()):
+                    key = (date, minute)
+                    wanted.add(key)
+                    is_available = key not in booked
+                    if key not in existing:
+                        to_create.append(TimeSlot(
+                            doctor=doctor,
+                            clinic=clinic,
+                            date=date,
+                            time=MINUTE_TIMES[minute],
+                            is_available=is_available,
+                        ))
+                    elif existing[key][1] != is_available:
+                        (to_free if is_available else to_book).append(existing[key][0])
+
+            to_delete = [pk for key, (pk, _) in existing.items() if key not in wanted]
+
+            if to_delete:
+                TimeSlot.objects.filter(id__in=to_delete).delete()
+            if to_book:
+                TimeSlot.objects.filter(id__in=to_book).update(is_available=False)
+            if to_free:
+                TimeSlot.objects.filter(id__in=to_free).update(is_available=True)
+            TimeSlot.objects.bulk_create(to_create, ignore_conflicts=True)
+
+        NextSlotService.refresh(doctor.id, clinic.id)
+        return {
+            'created': len(to_create),
+            'deleted': len(to_delete),
+            'updated': len(to_book) + len(to_free),
+        }
+
+    @staticmethod
+    def materialize_doctor(doctor, dates=None):
+        """ساخت/همگام‌سازی افق رزرو پزشک در همه مراکز فعالش"""
+        for doctor_clinic in DoctorClinic.objects.filter(
+            doctor=doctor, is_active=True
+        ).select_related('clinic'):
+            TimeSlotService.materialize(doctor, doctor_clinic.clinic, dates=dates)
+
+    @staticmethod
+    def get_rows(doctor, clinic, date):
+        """
+        سطرهای خام تایم‌های یک روز با یک خواندن ایندکس‌شده
+
+        اگر روز هنوز ساخته نشده باشد (پیش از اجرای دستور روزانه) همان روز
+        ساخته می‌شود. روزهای خارج از افق رزرو تایمی ندارند و ساخته نمی‌شوند.
+
+        Returns:
+            list of tuple: [(time, is_available, is_blocked)]
+        """
+        today, horizon_end = TimeSlotService.get_horizon(doctor)
+        if not today <= date <= horizon_end:
+            return []
+
+        rows = list(TimeSlot.objects.filter(
+            doctor=doctor,
+            clinic=clinic,
+            date=date
+        ).order_by('time').values_list('time', 'is_available', 'is_blocked'))
+        if not rows and TimeSlotService.materialize(doctor, clinic, dates=[date])['created']:
+            rows = list(TimeSlot.objects.filter(
+                doctor=doctor,
+                clinic=clinic,
+                date=date
+            ).order_by('time').values_list('time', 'is_available', 'is_blocked'))
+        return rows
+
+    @staticmethod
+    def get_range_rows(doctor, clinic, start, end, dates=()):
+        """
+        سطرهای خام تایم‌های بازه [start, end] با یک کوئری
+
+        بازه به افق رزرو پزشک محدود می‌شود.
+
+        Args:
+            dates (iterable): روزهایی که باید تایم داشته باشند؛ اگر هنوز
+                ساخته نشده باشند یک‌جا ساخته می‌شوند
+
+        Returns:
+            dict: {date: [(time, is_available, is_blocked), ...]}
+        """
+        today, horizon_end = TimeSlotService.get_horizon(doctor)
+        start, end = max(start, today), min(end, horizon_end)
+        if start > end:
+            return {}
+
+        def read():
+            rows = {}
+            for slot_date, slot_time, is_available, is_blocked in TimeSlot.objects.filter(
+                doctor=doctor,
+                clinic=clinic,
+                date__gte=start,
+                date__lte=end
+            ).order_by('date', 'time').values_list('date', 'time', 'is_available', 'is_blocked'):
+                rows.setdefault(slot_date, []).append((slot_time, is_available, is_blocked))
+            return rows
+
+        rows = read()
+        missing = [date for date in dates if start <= date <= end and date not in rows]
+        if missing and TimeSlotService.materialize(doctor, clinic, dates=missing)['created']:
+            rows = read()
+        return rows
+
+    @staticmethod
+    def encode_range(days, rows, held=()):
+        """
+        خلاصه فشرده تایم‌های آزاد یک بازه
+
+        ساعت‌های هر روز به یک الگوی مشترک (لیست 'HH:MM') ارجاع می‌دهند و
+        آزاد بودن تایم‌ها یک bitset هگزادسیمال است: بیت i یعنی تایم i
+        الگو آزاد است. روزهای غیر available هیچ تایم آزادی ندارند.
+
+        Args:
+            days (list of dict): روزهای بازه با 'date'، 'status' و ...
+            rows (dict): خروجی get_range_rows
+            held (set): (date, time) تایم‌های نگه‌داشته‌شده توسط دیگران
+
+        Returns:
+            dict: {'templates': [[...], ...], 'days': [...]}
+        """
+        now = timezone.now()
+        to_minutes = TimeSlotService.to_minutes
+        templates = {}
+        days_data = []
+        for day in days:
+            date = day['date']
+            day_rows = rows.get(date, [])
+            template = None
+            free = 0
+            if day_rows:
+                minutes = tuple(to_minutes(slot_time) for slot_time, _, _ in day_rows)
+                template = templates.setdefault(minutes, len(templates))
+            if day_rows and day['status'] == 'available':
+                current_minute = to_minutes(now) if date == now.date() else -1
+                for index, (slot_time, is_available, is_blocked) in enumerate(day_rows):
+                    if (
+                        is_available and not is_blocked
+                        and minutes[index] > current_minute
+                        and (date, slot_time) not in held
+                    ):
+                        free |= 1 << index
+            days_data.append({
+                'date': date.isoformat(),
+                'day_name': day['day_name'],
+                'status': day['status'],
+                'remaining': day['remaining'],
+                'template': template,
+                'free': format(free, 'x'),
+                'free_count': bin(free).count('1'),
+            })
+
+        return {
+            'templates': [[MINUTE_LABELS[minute] for minute in minutes] for minutes in templates],
+            'days': days_data,
+        }
+
+    @staticmethod
+    def get_slots(doctor, clinic, date, rows=None):
+        """
+        تایم‌های یک روز برای نمایش
+
+        Args:
+            rows (list|None): سطرهای get_rows (مثلاً از کش)؛ None یعنی خواندن
+
+        Returns:
+            list of dict: [{'time': '08:00', 'time_obj': time, 'is_available',
+            'is_booked', 'is_blocked', 'is_past'}]
+        """
+        if rows is None:
+            rows = TimeSlotService.get_rows(doctor, clinic, date)
+
+        now = timezone.now()
+        current_minute = TimeSlotService.to_minutes(now) if date == now.date() else -1
+
+        time_slots = []
+        for slot_time, is_available, is_blocked in rows:
+            minute = slot_time.hour * 60 + slot_time.minute
+            is_past = minute <= current_minute
+            time_slots.append({
+                'time': MINUTE_LABELS[minute],
+                'time_obj': slot_time,
+                'is_available': is_available and not is_blocked and not is_past,
+                'is_booked': not is_available,
+                'is_blocked': is_blocked,
+                'is_past': is_past,
+            })
+        return time_slots
+
+    @staticmethod
+    def is_blocked(doctor, clinic, date, time):
+        """آیا تایم مشخص مسدود شده است"""
+        return TimeSlot.objects.filter(
+            doctor=doctor,
+            clinic=clinic,
+            date=date,
+            time=time,
+            is_blocked=True
+        ).exists()
+
+    @staticmethod
+    def sync_booking(appointment, old_status):
+        """
+        بروزرسانی موجود بودن تایم نوبت پس از رزرو/لغو
+
+        باید داخل همان تراکنشی صدا زده شود که نوبت ذخیره شده است؛
+        نزدیک‌ترین تایم آزاد پس از commit به‌روز می‌شود.
+        """
+        if appointment.clinic_id is None:
+            return
+        was_booked = old_status in CapacityCalendarService.BOOKED_STATUSES
+        is_booked = appointment.status in CapacityCalendarService.BOOKED_STATUSES
+        if was_booked == is_booked:
+            return
+
+        slots = TimeSlot.objects.filter(
+            doctor_id=appointment.doctor_id,
+            clinic_id=appointment.clinic_id,
+            date=appointment.date,
+            time=appointment.time
+        )
+        if is_booked:
+            changed = slots.update(is_available=False)
+        elif not Appointment.objects.filter(
+            doctor_id=appointment.doctor_id,
+            clinic_id=appointment.clinic_id,
+            date=appointment.date,
+            time=appointment.time,
+            status__in=CapacityCalendarService.BOOKED_STATUSES
+        ).exists():
+            changed = slots.update(is_available=True)
+        else:
+            changed = 0
+        if changed:
+            doctor_id, clinic_id = appointment.doctor_id, appointment.clinic_id
+            transaction.on_commit(lambda: NextSlotService.refresh(doctor_id, clinic_id))
+
+    @staticmethod
+    def set_blocked(doctor, clinic, date, start_time, end_time, blocked=True, reason=None):
+        """
+        مسدود/آزاد کردن تایم‌های یک بازه ساعتی (مثلاً ناهار یا اورژانس)
+
+        Returns:
+            int: تعداد تایم‌های تغییرکرده
+        """
+        # import داخلی برای جلوگیری از وابستگی چرخشی
+        from .availability_cache import AvailabilityCache
+
+        count = TimeSlot.objects.filter(
+            doctor=doctor,
+            clinic=clinic,
+            date=date,
+            time__gte=start_time,
+            time__lt=end_time
+        ).update(is_blocked=blocked, block_reason=reason if blocked else None)
+        AvailabilityCache.invalidate_date(doctor.id, clinic.id, date)
+        NextSlotService.refresh(doctor.id, clinic.id)
+        return count
@@ -0,0 +1,92 @@
+"""
+سرویس آمار نوبت‌ها - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+تعداد نوبت‌های هر وضعیت برای یک (پزشک، مرکز، بازه تاریخ) با یک کوئری
+aggregate و Count شرطی خوانده می‌شود و برای مدت کوتاهی در کش می‌ماند.
+کلید کش شامل شماره نسل پزشک است و هر تغییر نوبت (سیگنال Appointment)
+نسل همان پزشک و نسل کل را افزایش می‌دهد.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from ..models import Appointment
+
+
+class AppointmentStatsService:
+    """
+    سرویس شمارش نوبت‌ها بر اساس وضعیت
+    """
+
+    STATUSES = [code for code, _ in Appointment.STATUS_CHOICES]
+
+    TIMEOUT = getattr(settings, 'APPOINTMENT_STATS_CACHE_TIMEOUT', 60)
+
+    @staticmethod
+    def _generation_key(doctor_id):
+        return f'appointments:stats:gen:{doctor_id or "all"}'
+
+    @staticmethod
+    def compute(doctor_id=None, start=None, end=None, clinic_id=None):
+        """
+        شمارش نوبت‌های هر وضعیت با یک کوئری
+
+        Returns:
+            dict: {'total': int, '<status>': int, ...}
+        """
+        appointments = Appointment.objects.all()
+        if doctor_id:
+            appointments = appointments.filter(doctor_id=doctor_id)
+        if clinic_id:
+            appointments = appointments.filter(clinic_id=clinic_id)
+        if start:
+            appointments = appointments.filter(date__gte=start)
+        if end:
+            appointments = appointments.filter(date__lte=end)
+
+        return appointments.aggregate(
+            total=Count('id'),
+            **{
+                status: Count('id', filter=Q(status=status))
+                for status in AppointmentStatsService.STATUSES
+            }
+        )
+
+    @staticmethod
+    def get(doctor_id, start, end=None, clinic_id=None):
+        """
+        آمار نوبت‌های بازه [start, end] از کش (پیش‌فرض end: همان start)
+
+        Args:
+            doctor_id (int|None): پزشک (None یعنی همه پزشکان)
+            clinic_id (int|None): محدود کردن به یک مرکز
+        """
+        end = end or start
+        generation_key = AppointmentStatsService._generation_key(doctor_id)
+        generation = cache.get(generation_key)
+        if generation is None:
+            cache.add(generation_key, int(time.time() * 1000), None)
+            generation = cache.get(generation_key)
+
+        key = f'appointments:stats:{doctor_id}:{clinic_id}:{start}:{end}:{generation}'
+        stats = cache.get(key)
+        if stats is None:
+            stats = AppointmentStatsService.compute(doctor_id, start, end, clinic_id)
+            cache.set(key, stats, AppointmentStatsService.TIMEOUT)
+        return stats
+
+    @staticmethod
+    def invalidate(doctor_id):
+        """باطل کردن آمار پزشک و آمار کل"""
+        for key in (
+            AppointmentStatsService._generation_key(doctor_id),
+            AppointmentStatsService._generation_key(None),
+        ):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, int(time.time() * 1000), None)
@@ -0,0 +1,332 @@
+"""
+سرویس لیست انتظار - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+بیمار می‌تواند برای روز پر یک پزشک در یک مرکز در لیست انتظار قرار بگیرد.
+با لغو یک نوبت (QueueService.apply_transition) پس از commit، تایم آزادشده
+به اولین بیمار منتظر همان روز پیشنهاد می‌شود: تایم با یک SlotHold به مدت
+WAITLIST_OFFER_SECONDS برای او نگه داشته می‌شود و بیمار با همان مسیر
+عادی رزرو آن را ثبت می‌کند.
+
+پیامک پیشنهادها به‌صورت دسته‌ای (یک bulk_create برای همه پیشنهادهای یک
+رویداد) ساخته می‌شود. پیشنهادهای منقضی توسط دستور process_waitlist به
+نفر بعدی منتقل می‌شوند.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import jdatetime
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from apps.doctors.models import Doctor
+from apps.notifications.models import SMS, SMSTemplate
+from ..models import Appointment, SlotHold, WaitlistEntry
+from .availability_cache import AvailabilityCache
+from .booking_service import BookingService
+
+logger = logging.getLogger(__name__)
+
+
+class WaitlistService:
+    """
+    سرویس لیست انتظار و پیشنهاد تایم‌های آزادشده
+    """
+
+    OFFER_SECONDS = getattr(settings, 'WAITLIST_OFFER_SECONDS', 900)
+
+    TEMPLATE = 'waitlist_offer'
+    RELATED_MODEL = 'waitlist_entry'
+
+    # دلیل‌های رد که مانع ورود به لیست انتظار هستند
+    JOIN_RULES = ('clinic_inactive', 'past_date', 'holiday', 'no_schedule', 'patient_duplicate')
+
+    DUPLICATE_MESSAGE = 'شما قبلاً در لیست انتظار این روز هستید'
+
+    DEFAULT_MESSAGE = (
+        '{patient_name} عزیز، یک نوبت نزد {doctor_name} در {clinic_name} '
+        'برای {date} ساعت {time} آزاد شد و تا ساعت {expires} برای شما نگه داشته می‌شود.\nنوبان'
+    )
+
+    @staticmethod
+    def join(doctor, clinic, date, patient):
+        """
+        افزودن بیمار به لیست انتظار یک روز
+
+        Returns:
+            dict: {'entry': WaitlistEntry|None, 'message': str|None}
+        """
+        facts = BookingService.preflight(doctor, clinic.id, date, None, patient)
+        reasons = [code for code in facts['reasons'] if code in WaitlistService.JOIN_RULES]
+        if reasons:
+            return {'entry': None, 'message': BookingService.get_message(reasons)}
+
+        # روز پر از نظر ظرفیت (day_full) حتی با تایم‌های خالی قابل انتظار است
+        if 'day_full' not in facts['reasons'] and any(
+            slot['is_available'] for slot in AvailabilityCache.get_slots(doctor, clinic, date)
+        ):
+            return {'entry': None, 'message': 'این روز هنوز تایم آزاد دارد. لطفاً مستقیماً رزرو کنید.'}
+
+        try:
+            with transaction.atomic():
+                # قفل سطح پزشک مانند BookingService.book: MySQL محدودیت شرطی
+                # unique_active_waitlist_entry را اعمال نمی‌کند
+                list(Doctor.objects.select_for_update().filter(pk=doctor.id).values_list('pk'))
+                if WaitlistEntry.objects.filter(
+                    patient=patient,
+                    doctor=doctor,
+                    clinic=clinic,
+                    date=date,
+                    status__in=['waiting', 'offered'],
+                ).exists():
+                    return {'entry': None, 'message': WaitlistService.DUPLICATE_MESSAGE}
+                entry = WaitlistEntry.objects.create(
+                    patient=patient,
+                    doctor=doctor,
+                    clinic=clinic,
+                    date=date,
+                )
+        except IntegrityError:
+            return {'entry': None, 'message': WaitlistService.DUPLICATE_MESSAGE}
+        return {'entry': entry, 'message': None}
+
+    @staticmethod
+    def get_position(entry):
+        """جایگاه بیمار در لیست انتظار (از ۱)"""
+        return WaitlistEntry.objects.filter(
+            doctor_id=entry.doctor_id,
+            clinic_id=entry.clinic_id,
+            date=entry.date,
+            status='waiting',
+            created_at__lt=entry.created_at,
+        ).count() + 1
+
+    @staticmethod
+    def leave(entry):
+        """
+        خروج بیمار از لیست انتظار؛ تایم پیشنهادشده به او به نفر بعدی می‌رسد
+        """
+        with transaction.atomic():
+            if entry.status == 'offered':
+                SlotHold.objects.filter(
+                    doctor_id=entry.doctor_id,
+                    patient_id=entry.patient_id,
+                    date=entry.date,
+                    time=entry.offered_time,
+                ).delete()
+                slot = (entry.doctor_id, entry.clinic_id, entry.date, entry.offered_time)
+                transaction.on_commit(lambda: WaitlistService.process_freed([slot]))
+            entry.status = 'cancelled'
+            entry.save(update_fields=['status', 'updated_at'])
+
+    @staticmethod
+    def on_slot_freed(appointment):
+        """
+        ثبت پیشنهاد تایم نوبت لغوشده پس از commit
+
+        باید داخل همان تراکنشی صدا زده شود که نوبت لغو شده است.
+        """
+        if appointment.clinic_id is None:
+            return
+        slot = (appointment.doctor_id, appointment.clinic_id, appointment.date, appointment.time)
+        transaction.on_commit(lambda: WaitlistService.process_freed([slot]))
+
+    @staticmethod
+    def mark_booked(appointment):
+        """
+        خارج کردن بیمار از لیست انتظار روزی که در آن نوبت گرفت
+
+        اگر تایمی غیر از تایم رزروشده به او پیشنهاد شده بود، آن تایم به
+        نفر بعدی می‌رسد. باید داخل تراکنش ثبت نوبت صدا زده شود.
+        """
+        entries = WaitlistEntry.objects.filter(
+            patient_id=appointment.patient_id,
+            doctor_id=appointment.doctor_id,
+            date=appointment.date,
+            status__in=['waiting', 'offered'],
+        )
+        released = [
+            slot for slot in entries.filter(status='offered').values_list(
+                'doctor_id', 'clinic_id', 'date', 'offered_time'
+            )
+            if (slot[1], slot[3]) != (appointment.clinic_id, appointment.time)
+        ]
+        entries.update(status='booked', updated_at=timezone.now())
+        if released:
+            transaction.on_commit(lambda: WaitlistService.process_freed(released))
+
+    @staticmethod
+    def offer_slot(doctor_id, clinic_id, date, time):
+        """
+        پیشنهاد یک تایم آزاد به اولین بیمار منتظر همان روز
+
+        Returns:
+            WaitlistEntry|None: ردیف پیشنهادشده یا None اگر تایم قابل رزرو
+            نباشد یا کسی در انتظار نباشد
+        """
+        now = timezone.now()
+        local_now = timezone.localtime(now)
+        if date < local_now.date() or (date == local_now.date() and time <= local_now.time()):
+            return None
+
+        doctor = Doctor.objects.get(pk=doctor_id)
+        try:
+            with transaction.atomic():
+                SlotHold.objects.filter(
+                    doctor_id=doctor_id,
+                    date=date,
+                    time=time,
+                    expires_at__lte=now
+                ).delete()
+                if BookingService.preflight(doctor, clinic_id, date, time)['reasons']:
+                    return None
+
+                entry = WaitlistEntry.objects.select_for_update().filter(
+                    doctor_id=doctor_id,
+                    clinic_id=clinic_id,
+                    date=date,
+                    status='waiting',
+                ).exclude(
+                    # بیمارانی که در این فاصله نوبت گرفته‌اند
+                    Exists(Appointment.objects.filter(
+                        patient_id=OuterRef('patient_id'),
+                        doctor_id=doctor_id,
+                        date=date,
+                        status__in=['pending', 'confirmed'],
+                    ))
+                ).order_by('created_at').first()
+                if entry is None:
+                    return None
+
+                expires_at = now + timedelta(seconds=WaitlistService.OFFER_SECONDS)
+                SlotHold.objects.create(
+                    doctor_id=doctor_id,
+                    clinic_id=clinic_id,
+                    patient_id=entry.patient_id,
+                    date=date,
+                    time=time,
+                    expires_at=expires_at,
+                )
+                entry.status = 'offered'
+                entry.offered_time = time
+                entry.offer_expires_at = expires_at
+                entry.save(update_fields=['status', 'offered_time', 'offer_expires_at', 'updated_at'])
+        except IntegrityError:
+            # تایم هم‌زمان توسط بیمار دیگری نگه داشته شد
+            return None
+        return entry
+
+    @staticmethod
+    def process_freed(slots):
+        """
+        پیشنهاد تایم‌های آزادشده و ساخت پیامک‌ها با یک bulk_create
+
+        خطا فقط ثبت می‌شود تا درخواست لغو (که commit شده) شکست نخورد.
+
+        Args:
+            slots (list): [(doctor_id, clinic_id, date, time), ...]
+
+        Returns:
+            int: تعداد پیشنهادها
+        """
+        try:
+            offered = [
+                entry for entry in (WaitlistService.offer_slot(*slot) for slot in slots)
+                if entry is not None
+            ]
+            if offered:
+                WaitlistService.dispatch_sms([entry.id for entry in offered])
+            return len(offered)
+        except Exception:
+            logger.warning('پیشنهاد تایم به لیست انتظار ناموفق بود', exc_info=True)
+            return 0
+
+    @staticmethod
+    def expire_offers():
+        """
+        منقضی کردن پیشنهادهای بی‌پاسخ و پیشنهاد همان تایم‌ها به نفر بعدی
+
+        Returns:
+            int: تعداد پیشنهادهای منقضی‌شده
+        """
+        now = timezone.now()
+        expired = list(WaitlistEntry.objects.filter(
+            status='offered',
+            offer_expires_at__lte=now
+        ).values_list('id', 'doctor_id', 'clinic_id', 'date', 'offered_time'))
+        if not expired:
+            return 0
+
+        WaitlistEntry.objects.filter(
+            id__in=[row[0] for row in expired],
+            status='offered'
+        ).update(status='expired', updated_at=now)
+        WaitlistService.process_freed([row[1:] for row in expired])
+        return len(expired)
+
+    @staticmethod
+    def dispatch_sms(entry_ids):
+        """
+        ساخت پیامک پیشنهادهای فعال با یک bulk_create (هر پیشنهاد یک بار)
+
+        Returns:
+            int: تعداد پیامک‌های ایجادشده
+        """
+        rows = list(WaitlistEntry.objects.filter(
+            id__in=entry_ids,
+            status='offered',
+            offer_expires_at__gt=timezone.now(),
+            patient__phone__isnull=False,
+        ).values(
+            'id', 'date', 'offered_time', 'offer_expires_at',
+            'patient__phone', 'patient__first_name', 'patient__last_name',
+            'doctor__user__first_name', 'doctor__user__last_name', 'clinic__name',
+        ))
+        if not rows:
+            return 0
+
+        already_sent = set(SMS.objects.filter(
+            template=WaitlistService.TEMPLATE,
+            related_model=WaitlistService.RELATED_MODEL,
+            related_id__in=[row['id'] for row in rows],
+        ).values_list('related_id', flat=True))
+
+        template = SMSTemplate.objects.filter(
+            name=WaitlistService.TEMPLATE,
+            is_active=True,
+        ).values_list('content', flat=True).first() or WaitlistService.DEFAULT_MESSAGE
+
+        messages = [
+            SMS(
+                receptor=row['patient__phone'],
+                message=WaitlistService._render(template, row),
+                template=WaitlistService.TEMPLATE,
+                related_model=WaitlistService.RELATED_MODEL,
+                related_id=row['id'],
+            )
+            for row in rows
+            if row['id'] not in already_sent
+        ]
+        SMS.objects.bulk_create(messages)
+        return len(messages)
+
+    @staticmethod
+    def _render(template, row):
+        """جایگذاری متغیرهای الگو (متغیرهای ناشناخته خالی می‌شوند)"""
+        values = defaultdict(str, {
+            'patient_name': f"{row['patient__first_name']} {row['patient__last_name']}".strip(),
+            'doctor_name': f"دکتر {row['doctor__user__first_name']} {row['doctor__user__last_name']}",
+            'clinic_name': row['clinic__name'] or '',
+            'date': jdatetime.date.fromgregorian(date=row['date']).strftime('%Y/%m/%d'),
+            'time': row['offered_time'].strftime('%H:%M'),
+            'expires': timezone.localtime(row['offer_expires_at']).strftime('%H:%M'),
+        })
+        try:
+            return template.format_map(values)
+        except (ValueError, IndexError):
+            # الگوی نامعتبر (مثلاً آکولاد بسته‌نشده)
+            return WaitlistService.DEFAULT_MESSAGE.format_map(values)
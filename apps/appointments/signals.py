@@ -0,0 +1,108 @@
+"""
+سیگنال‌های اپلیکیشن نوبت‌دهی - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+با تغییر برنامه کاری، تعطیلی یا مدت ویزیت مرکز، تایم‌های ازپیش‌ساخته
+همان پزشک/مرکز پس از commit همگام می‌شوند. کش تایم‌ها و تقویم رزرو
+پس از همگام‌سازی (و با هر تغییر نوبت) فقط برای همان دامنه باطل می‌شود.
+آمار نوبت‌های پزشک هم با هر تغییر نوبت باطل می‌شود. با ذخیره پزشک (مثلاً
+تغییر max_daily_appointments) نزدیک‌ترین تایم آزاد او دوباره محاسبه می‌شود.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.clinics.models import Clinic
+from apps.doctors.models import Doctor, DoctorClinic, DoctorHoliday, WorkSchedule
+from .models import Appointment
+from .services.availability_cache import AvailabilityCache
+from .services.next_slot_service import NextSlotService
+from .services.slot_service import TimeSlotService
+from .services.stats_service import AppointmentStatsService
+
+
+def _get_parents(doctor_id, clinic_id=None):
+    """
+    پزشک و مرکز پس از commit (با حذف آبشاری ممکن است دیگر وجود نداشته باشند)
+
+    Returns:
+        tuple: (Doctor|None, Clinic|None)
+    """
+    doctor = Doctor.objects.filter(pk=doctor_id).first()
+    clinic = Clinic.objects.filter(pk=clinic_id).first() if clinic_id else None
+    return doctor, clinic
+
+
+@receiver([post_save, post_delete], sender=WorkSchedule)
+def sync_slots_on_schedule_change(sender, instance, **kwargs):
+    """همگام‌سازی افق رزرو پزشک در مرکز برنامه تغییرکرده"""
+    doctor_id, clinic_id = instance.doctor_id, instance.clinic_id
+    if clinic_id is None:
+        return
+
+    def sync():
+        doctor, clinic = _get_parents(doctor_id, clinic_id)
+        if doctor and clinic:
+            TimeSlotService.materialize(doctor, clinic)
+        AvailabilityCache.invalidate(doctor_id, clinic_id)
+
+    transaction.on_commit(sync)
+
+
+@receiver([post_save, post_delete], sender=DoctorHoliday)
+def sync_slots_on_holiday_change(sender, instance, **kwargs):
+    """همگام‌سازی تایم‌های همان روز تعطیلی (در یک مرکز یا همه مراکز)"""
+    doctor_id, clinic_id, date = instance.doctor_id, instance.clinic_id, instance.date
+
+    def sync():
+        doctor, clinic = _get_parents(doctor_id, clinic_id)
+        if clinic_id is None:
+            if doctor:
+                TimeSlotService.materialize_doctor(doctor, dates=[date])
+            AvailabilityCache.invalidate_doctor(doctor_id, date)
+        else:
+            if doctor and clinic:
+                TimeSlotService.materialize(doctor, clinic, dates=[date])
+            AvailabilityCache.invalidate_date(doctor_id, clinic_id, date)
+
+    transaction.on_commit(sync)
+
+
+@receiver([post_save, post_delete], sender=DoctorClinic)
+def sync_slots_on_clinic_settings_change(sender, instance, **kwargs):
+    """همگام‌سازی افق رزرو با مدت ویزیت اختصاصی مرکز"""
+    doctor_id, clinic_id = instance.doctor_id, instance.clinic_id
+    resync = kwargs['signal'] is post_save and instance.is_active
+
+    def sync():
+        if resync:
+            doctor, clinic = _get_parents(doctor_id, clinic_id)
+            if doctor and clinic:
+                TimeSlotService.materialize(doctor, clinic)
+        AvailabilityCache.invalidate(doctor_id, clinic_id)
+
+    transaction.on_commit(sync)
+
+
+@receiver(post_save, sender=Doctor)
+def refresh_next_slot_on_doctor_change(sender, instance, **kwargs):
+    """محاسبه دوباره نزدیک‌ترین تایم آزاد با تغییر ظرفیت روزانه پزشک"""
+    doctor_id = instance.id
+    transaction.on_commit(lambda: NextSlotService.refresh_doctor(doctor_id))
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def invalidate_availability_on_appointment_change(sender, instance, **kwargs):
+    """باطل کردن تایم‌های روز نوبت و تقویم پزشک در مرکز"""
+    key = (instance.doctor_id, instance.clinic_id, instance.date)
+    if key[1] is None:
+        return
+    transaction.on_commit(lambda: AvailabilityCache.invalidate_date(*key))
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def invalidate_stats_on_appointment_change(sender, instance, **kwargs):
+    """باطل کردن آمار نوبت‌های پزشک"""
+    doctor_id = instance.doctor_id
+    transaction.on_commit(lambda: AppointmentStatsService.invalidate(doctor_id))
@@ -3,6 +3,7 @@
 توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
 """
 
+from .roster_service import PatientRosterService
 from .tariff_service import TariffService
 
-__all__ = ['TariffService']
+__all__ = ['PatientRosterService', 'TariffService']
@@ -0,0 +1,88 @@
+"""
+سرویس لیست بیماران پزشک - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+لیست بیماران با یک کوئری گروه‌بندی‌شده (تعداد مراجعه و آخرین مراجعه
+با Count/Max) ساخته می‌شود؛ جستجو در SQL انجام می‌شود و صفحه‌بندی
+keyset (بر اساس تعداد مراجعه و شناسه) است تا زمان پاسخ به اندازه
+لیست بستگی نداشته باشد.
+"""
+
+from django.db.models import Count, Max, Q
+
+from apps.accounts.models import User
+
+
+class PatientRosterService:
+    """
+    سرویس لیست بیماران ویزیت‌شده یک پزشک
+    """
+
+    PAGE_SIZE = 50
+
+    @staticmethod
+    def get_queryset(doctor, search=None):
+        """
+        بیماران ویزیت‌شده پزشک با visit_count و last_visit
+
+        Args:
+            doctor (Doctor): پزشک
+            search (str|None): هر کلمه باید در نام، نام خانوادگی یا موبایل باشد
+
+        Returns:
+            QuerySet[User]: مرتب بر اساس بیشترین مراجعه
+        """
+        patients = User.objects.filter(
+            appointments__doctor=doctor,
+            appointments__status='visited'
+        )
+        for term in (search or '').split():
+            patients = patients.filter(
+                Q(first_name__icontains=term)
+                | Q(last_name__icontains=term)
+                | Q(phone__contains=term)
+            )
+        return patients.annotate(
+            visit_count=Count('appointments'),
+            last_visit=Max('appointments__date'),
+        ).order_by('-visit_count', '-id')
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """
+        خواندن نشانگر صفحه بعد ('visit_count.id')
+
+        Returns:
+            tuple|None: (visit_count, id) یا None برای نشانگر خالی/نامعتبر
+        """
+        try:
+            visit_count, patient_id = (int(part) for part in cursor.split('.'))
+        except (AttributeError, ValueError):
+            return None
+        return visit_count, patient_id
+
+    @staticmethod
+    def get_page(doctor, search=None, cursor=None, page_size=None):
+        """
+        یک صفحه از لیست بیماران (صفحه‌بندی keyset)
+
+        Returns:
+            dict: {'patients': [User, ...], 'next_cursor': str|None}
+        """
+        page_size = page_size or PatientRosterService.PAGE_SIZE
+        patients = PatientRosterService.get_queryset(doctor, search)
+
+        position = PatientRosterService.parse_cursor(cursor)
+        if position is not None:
+            visit_count, patient_id = position
+            patients = patients.filter(
+                Q(visit_count__lt=visit_count)
+                | Q(visit_count=visit_count, id__lt=patient_id)
+            )
+
+        page = list(patients[:page_size + 1])
+        next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_cursor = f'{page[-1].visit_count}.{page[-1].id}'
+        return {'patients': page, 'next_cursor': next_cursor}
@@ -0,0 +1,56 @@
+"""
+تست‌های اپلیکیشن پزشکان - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from datetime import timedelta
+
+from django.contrib.messages import get_messages
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.appointments.models import Appointment
+from apps.clinics.models import Clinic
+from .models import Doctor, DoctorClinic
+
+
+class DoctorAddAppointmentTests(TestCase):
+    """ثبت نوبت توسط پزشک با مرکز نامعتبر"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone='09120000001', password='pass', first_name='علی', last_name='رضایی', role='doctor'
+        )
+        self.doctor = Doctor.objects.create(user=self.user, specialization='general', medical_code='1001')
+        self.clinic = Clinic.objects.create(
+            name='مطب', phone='02100000000', province='تهران', city='تهران', address='-'
+        )
+        DoctorClinic.objects.create(doctor=self.doctor, clinic=self.clinic, is_primary=True)
+        self.other_clinic = Clinic.objects.create(
+            name='مطب دیگر', phone='02100000001', province='تهران', city='تهران', address='-'
+        )
+        self.client.force_login(self.user)
+
+    def post(self, clinic_id):
+        return self.client.post(reverse('doctor_add_appointment'), {
+            'patient_phone': '09130000000',
+            'date': (timezone.localdate() + timedelta(days=1)).isoformat(),
+            'time': '09:00',
+            'clinic_id': clinic_id,
+        })
+
+    def assert_rejected(self, response):
+        self.assertRedirects(response, reverse('doctor_add_appointment'), fetch_redirect_response=False)
+        self.assertIn(
+            'مرکز درمانی انتخاب‌شده معتبر نیست',
+            [str(message) for message in get_messages(response.wsgi_request)],
+        )
+        self.assertFalse(Appointment.objects.exists())
+
+    def test_malformed_clinic_id_is_rejected(self):
+        self.assert_rejected(self.post('abc'))
+
+    def test_clinic_of_another_doctor_is_rejected(self):
+        self.assert_rejected(self.post(str(self.other_clinic.id)))
@@ -71,6 +71,7 @@ doctor_panel_patterns = [
 api_patterns = [
     # جستجوی بیمار
     path('patients/search/', views.api_search_patient, name='api_search_patient'),
+    path('patients/<int:patient_id>/timeline/', views.api_patient_timeline, name='api_patient_timeline'),
     
     path('appointments/<int:appointment_id>/confirm/', views.api_confirm_appointment, name='api_confirm_appointment'),
     path('appointments/<int:appointment_id>/cancel/', views.api_cancel_appointment, name='api_cancel_appointment'),
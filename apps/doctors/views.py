@@ -6,20 +6,30 @@ Views برای بخش پزشکان - نوبان
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Q, Sum
 from django.utils import timezone
 from datetime import timedelta, datetime
 from .models import (
     Doctor, WorkSchedule, DoctorHoliday, DoctorClinic,
     ServiceType, InsuranceType, DoctorTariff
 )
+from .services.roster_service import PatientRosterService
 from .services.tariff_service import TariffService
 from apps.appointments.models import Appointment
+from apps.appointments.services import (
+    AppointmentStatsService, AvailabilityCache, BookingService, TimeSlotService
+)
 from apps.accounts.models import User
-from apps.patients.models import MedicalRecord, MedicalTerm, PrescriptionItem
+from apps.patients.models import MedicalRecord, MedicalTerm
+from apps.patients.services import MedicalRecordService, PatientTimelineService
 from apps.clinics.models import Clinic
+from apps.reports.models import DailyReport
+from apps.queue.models import QueueStatus
+from apps.queue.services import QueueService
 import json
 
 
@@ -73,33 +83,24 @@ def doctor_dashboard(request):
     doctor = get_doctor_or_404(request)
     today = timezone.now().date()
     
-    # آمار امروز
     today_appointments = Appointment.objects.filter(
         doctor=doctor,
         date=today
     )
     
-    today_count = today_appointments.count()
-    visited_today = today_appointments.filter(status='visited').count()
-    waiting_today = today_appointments.filter(status__in=['confirmed', 'arrived']).count()
+    # آمار امروز
+    today_stats = AppointmentStatsService.get(doctor.id, today)
+    today_count = today_stats['total']
+    visited_today = today_stats['visited']
+    waiting_today = today_stats['confirmed'] + today_stats['arrived']
     
     # آمار هفته
     week_start = today - timedelta(days=today.weekday())
-    week_appointments = Appointment.objects.filter(
-        doctor=doctor,
-        date__gte=week_start,
-        date__lte=today
-    )
-    week_visited = week_appointments.filter(status='visited').count()
+    week_visited = AppointmentStatsService.get(doctor.id, week_start, today)['visited']
     
     # آمار ماه
     month_start = today.replace(day=1)
-    month_appointments = Appointment.objects.filter(
-        doctor=doctor,
-        date__gte=month_start,
-        date__lte=today
-    )
-    month_visited = month_appointments.filter(status='visited').count()
+    month_visited = AppointmentStatsService.get(doctor.id, month_start, today)['visited']
     
     # نوبت‌های آینده امروز
     upcoming = today_appointments.filter(
@@ -143,11 +144,12 @@ def doctor_today_appointments(request):
     ).select_related('patient', 'clinic')
     
     # آمار
-    total_count = all_appointments.count()
-    visited_count = all_appointments.filter(status='visited').count()
-    arrived_count = all_appointments.filter(status__in=['arrived', 'in_progress']).count()
-    confirmed_count = all_appointments.filter(status='confirmed').count()
-    pending_count = all_appointments.filter(status='pending').count()
+    stats = AppointmentStatsService.get(doctor.id, today)
+    total_count = stats['total']
+    visited_count = stats['visited']
+    arrived_count = stats['arrived'] + stats['in_progress']
+    confirmed_count = stats['confirmed']
+    pending_count = stats['pending']
     
     # فیلتر وضعیت برای نمایش
     appointments = all_appointments.order_by('time')
@@ -483,42 +485,21 @@ def doctor_link_clinic(request):
 
 @login_required
 def doctor_patients(request):
-    """لیست بیماران پزشک"""
+    """
+    لیست بیماران پزشک
+
+    تعداد و آخرین مراجعه هر بیمار، جستجو و صفحه‌بندی (پارامتر cursor)
+    همه در یک کوئری انجام می‌شوند (PatientRosterService).
+    """
     doctor = get_doctor_or_404(request)
     
-    # بیماران با تعداد مراجعه
-    patient_stats = Appointment.objects.filter(
-        doctor=doctor,
-        status='visited'
-    ).values('patient').annotate(
-        visit_count=Count('id')
-    ).order_by('-visit_count')
-    
-    patients = []
-    for stat in patient_stats:
-        try:
-            patient = User.objects.get(id=stat['patient'])
-            patient.visit_count = stat['visit_count']
-            
-            # آخرین مراجعه
-            last_apt = Appointment.objects.filter(
-                doctor=doctor,
-                patient=patient,
-                status='visited'
-            ).order_by('-date').first()
-            patient.last_visit = last_apt.date if last_apt else None
-            
-            patients.append(patient)
-        except User.DoesNotExist:
-            pass
-    
-    # جستجو
-    search = request.GET.get('search')
-    if search:
-        patients = [p for p in patients if search in p.get_full_name() or search in p.phone]
+    search = request.GET.get('search', '').strip()
+    roster = PatientRosterService.get_page(doctor, search=search, cursor=request.GET.get('cursor'))
     
     context = {
-        'patients': patients,
+        'patients': roster['patients'],
+        'next_cursor': roster['next_cursor'],
+        'search_query': search,
         'doctor': doctor,
     }
     return render(request, 'doctors/patients.html', context)
@@ -540,23 +521,16 @@ def doctor_patient_record(request, patient_id):
         messages.error(request, 'شما دسترسی به پرونده این بیمار را ندارید')
         return redirect('doctor_patients')
     
-    # سوابق پزشکی (همراه آیتم‌های تجویز)
-    records = MedicalRecord.objects.filter(
-        doctor=doctor,
-        patient=patient
-    ).prefetch_related('prescription_items').order_by('-created_at')
-    
-    # نوبت‌های بیمار نزد این پزشک
-    appointments = Appointment.objects.filter(
-        doctor=doctor,
-        patient=patient
-    ).order_by('-date')
+    # صفحه اول خط زمانی پرونده‌ها و نوبت‌ها؛ صفحه‌های قدیمی‌تر از api_patient_timeline
+    timeline = PatientTimelineService.get_page(doctor, patient)
     
     context = {
         'patient': patient,
         'doctor': doctor,
-        'records': records,
-        'appointments': appointments,
+        'timeline': timeline['events'],
+        'next_cursor': timeline['next_cursor'],
+        'records': [e['object'] for e in timeline['events'] if e['kind'] == 'record'],
+        'appointments': [e['object'] for e in timeline['events'] if e['kind'] == 'appointment'],
     }
     return render(request, 'doctors/patient_record.html', context)
 
@@ -595,50 +569,36 @@ def doctor_add_record(request, appointment_id):
         id=appointment_id, 
         doctor=doctor
     )
+    form_data = None
     
     if request.method == 'POST':
-        record = MedicalRecord.objects.create(
-            doctor=doctor,
-            patient=appointment.patient,
-            appointment=appointment,
-            visit_date=appointment.date or timezone.now().date(),
-            chief_complaint=request.POST.get('chief_complaint', ''),
-            diagnosis=request.POST.get('diagnosis', ''),
-            prescription=request.POST.get('prescription', ''),
-            notes=request.POST.get('notes', ''),
-            next_visit_date=request.POST.get('next_visit_date') or None,
-        )
-        
-        # ذخیره آیتم‌های تجویز (دارو، آزمایش، تصویربرداری، اقدام)
-        prescription_data = request.POST.get('prescription_items_json', '[]')
+        # آیتم‌های تجویز (دارو، آزمایش، تصویربرداری، اقدام) پیش از ثبت اعتبارسنجی می‌شوند
         try:
-            items = json.loads(prescription_data)
-            for idx, item in enumerate(items):
-                PrescriptionItem.objects.create(
-                    record=record,
-                    item_type=item.get('item_type', 'medication'),
-                    name=item.get('name', ''),
-                    name_en=item.get('name_en', '') or None,
-                    form=item.get('form', '') or None,
-                    dosage=item.get('dosage', '') or None,
-                    frequency=item.get('frequency', '') or None,
-                    frequency_custom=item.get('frequency_custom', '') or None,
-                    timing=item.get('timing', '') or None,
-                    duration_value=int(item['duration_value']) if item.get('duration_value') else None,
-                    duration_unit=item.get('duration_unit', '') or None,
-                    quantity=item.get('quantity', '') or None,
-                    instructions=item.get('instructions', '') or None,
-                    sort_order=idx,
-                )
-        except (json.JSONDecodeError, TypeError, ValueError):
-            pass
-        
-        messages.success(request, 'پرونده با موفقیت ثبت شد')
-        return redirect('doctor_patient_record', patient_id=appointment.patient.id)
+            items = MedicalRecordService.build_items(request.POST.get('prescription_items_json', '[]'))
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            # فرم با همان مقادیر ارسالی دوباره نمایش داده می‌شود
+            form_data = request.POST
+        else:
+            MedicalRecordService.create_record(
+                doctor,
+                appointment.patient,
+                items,
+                appointment=appointment,
+                visit_date=appointment.date or timezone.now().date(),
+                chief_complaint=request.POST.get('chief_complaint', ''),
+                diagnosis=request.POST.get('diagnosis', ''),
+                prescription=request.POST.get('prescription', ''),
+                notes=request.POST.get('notes', ''),
+                next_visit_date=request.POST.get('next_visit_date') or None,
+            )
+            messages.success(request, 'پرونده با موفقیت ثبت شد')
+            return redirect('doctor_patient_record', patient_id=appointment.patient.id)
     
     context = {
         'appointment': appointment,
         'doctor': doctor,
+        'form_data': form_data,
     }
     return render(request, 'doctors/add_record.html', context)
 
@@ -647,48 +607,33 @@ def doctor_add_record(request, appointment_id):
 def doctor_new_record(request):
     """ثبت پرونده جدید بدون نوبت"""
     doctor = get_doctor_or_404(request)
+    form_data = None
     
     if request.method == 'POST':
         patient_id = request.POST.get('patient')
         patient = get_object_or_404(User, id=patient_id)
         
-        record = MedicalRecord.objects.create(
-            doctor=doctor,
-            patient=patient,
-            visit_date=timezone.now().date(),
-            chief_complaint=request.POST.get('chief_complaint', ''),
-            diagnosis=request.POST.get('diagnosis', ''),
-            prescription=request.POST.get('prescription', ''),
-            notes=request.POST.get('notes', ''),
-            next_visit_date=request.POST.get('next_visit_date') or None,
-        )
-        
-        # ذخیره آیتم‌های تجویز
-        prescription_data = request.POST.get('prescription_items_json', '[]')
+        # آیتم‌های تجویز پیش از ثبت اعتبارسنجی می‌شوند
         try:
-            items = json.loads(prescription_data)
-            for idx, item in enumerate(items):
-                PrescriptionItem.objects.create(
-                    record=record,
-                    item_type=item.get('item_type', 'medication'),
-                    name=item.get('name', ''),
-                    name_en=item.get('name_en', '') or None,
-                    form=item.get('form', '') or None,
-                    dosage=item.get('dosage', '') or None,
-                    frequency=item.get('frequency', '') or None,
-                    frequency_custom=item.get('frequency_custom', '') or None,
-                    timing=item.get('timing', '') or None,
-                    duration_value=int(item['duration_value']) if item.get('duration_value') else None,
-                    duration_unit=item.get('duration_unit', '') or None,
-                    quantity=item.get('quantity', '') or None,
-                    instructions=item.get('instructions', '') or None,
-                    sort_order=idx,
-                )
-        except (json.JSONDecodeError, TypeError, ValueError):
-            pass
-        
-        messages.success(request, 'پرونده با موفقیت ثبت شد')
-        return redirect('doctor_patient_record', patient_id=patient.id)
+            items = MedicalRecordService.build_items(request.POST.get('prescription_items_json', '[]'))
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            # فرم با همان مقادیر ارسالی دوباره نمایش داده می‌شود
+            form_data = request.POST
+        else:
+            MedicalRecordService.create_record(
+                doctor,
+                patient,
+                items,
+                visit_date=timezone.now().date(),
+                chief_complaint=request.POST.get('chief_complaint', ''),
+                diagnosis=request.POST.get('diagnosis', ''),
+                prescription=request.POST.get('prescription', ''),
+                notes=request.POST.get('notes', ''),
+                next_visit_date=request.POST.get('next_visit_date') or None,
+            )
+            messages.success(request, 'پرونده با موفقیت ثبت شد')
+            return redirect('doctor_patient_record', patient_id=patient.id)
     
     # لیست بیماران پزشک
     patient_ids = Appointment.objects.filter(
@@ -699,6 +644,7 @@ def doctor_new_record(request):
     context = {
         'patients': patients,
         'doctor': doctor,
+        'form_data': form_data,
     }
     return render(request, 'doctors/new_record.html', context)
 
@@ -709,22 +655,29 @@ def doctor_live_queue(request):
     doctor = get_doctor_or_404(request)
     today = timezone.now().date()
     
-    appointments = Appointment.objects.filter(
+    appointments = list(Appointment.objects.filter(
         doctor=doctor,
         date=today
     ).exclude(
         status__in=['cancelled', 'no_show']
-    ).select_related('patient').order_by('queue_number', 'time')
+    ).select_related('patient').order_by('queue_number', 'time'))
     
-    # بیمار فعلی
-    current = appointments.filter(status='in_progress').first()
+    # بیمار فعلی (از همان لیست، بدون کوئری اضافه)
+    current = next((a for a in appointments if a.status == 'in_progress'), None)
     if not current:
-        current = appointments.filter(status='arrived').first()
+        current = next((a for a in appointments if a.status == 'arrived'), None)
+    
+    # شمارنده‌های صف هر مرکز (یک سطر به ازای هر مرکز)
+    queue_statuses = QueueStatus.objects.filter(
+        doctor=doctor,
+        date=today
+    ).select_related('clinic')
     
     context = {
         'appointments': appointments,
         'doctor': doctor,
         'current_patient': current,
+        'queue_statuses': queue_statuses,
         'today': today,
     }
     return render(request, 'doctors/live_queue.html', context)
@@ -747,18 +700,34 @@ def doctor_reports(request):
     else:
         start_date = today - timedelta(days=7)
     
-    appointments = Appointment.objects.filter(
+    # سری روزانه از گزارش‌های ازپیش‌محاسبه‌شده (یک سطر در روز برای همه مراکز)
+    daily_reports = list(DailyReport.objects.filter(
         doctor=doctor,
         date__gte=start_date,
         date__lte=today
-    )
+    ).values('date').annotate(
+        total_appointments=Sum('total_appointments'),
+        completed_appointments=Sum('completed_appointments'),
+        cancelled_appointments=Sum('cancelled_appointments'),
+        no_show_appointments=Sum('no_show_appointments'),
+        new_patients=Sum('new_patients'),
+        total_revenue=Sum('total_revenue'),
+        refunded_amount=Sum('refunded_amount'),
+    ).order_by('date'))
+    
+    def total(field):
+        return sum(report[field] for report in daily_reports)
     
     context = {
         'doctor': doctor,
-        'total_appointments': appointments.count(),
-        'visited_count': appointments.filter(status='visited').count(),
-        'cancelled_count': appointments.filter(status='cancelled').count(),
-        'no_show_count': appointments.filter(status='no_show').count(),
+        'total_appointments': total('total_appointments'),
+        'visited_count': total('completed_appointments'),
+        'cancelled_count': total('cancelled_appointments'),
+        'no_show_count': total('no_show_appointments'),
+        'new_patients': total('new_patients'),
+        'total_revenue': total('total_revenue'),
+        'refunded_amount': total('refunded_amount'),
+        'daily_reports': daily_reports,
         'period': period,
         'start_date': start_date,
         'end_date': today,
@@ -844,25 +813,32 @@ def doctor_add_appointment(request):
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
             time = datetime.strptime(time_str, '%H:%M').time()
             
-            # محاسبه شماره صف
-            last_queue = Appointment.objects.filter(
-                doctor=doctor,
-                date=date
-            ).exclude(status='cancelled').order_by('-queue_number').first()
-            
-            queue_number = (last_queue.queue_number + 1) if last_queue else 1
+            # مرکز نوبت (اختیاری؛ باید از مراکز فعال همین پزشک باشد)
+            clinic_id = request.POST.get('clinic_id') or None
+            if clinic_id is not None and not (
+                clinic_id.isdigit() and DoctorClinic.objects.filter(
+                    doctor=doctor,
+                    clinic_id=int(clinic_id),
+                    is_active=True
+                ).exists()
+            ):
+                messages.error(request, 'مرکز درمانی انتخاب‌شده معتبر نیست')
+                return redirect('doctor_add_appointment')
             
-            appointment = Appointment.objects.create(
-                doctor=doctor,
-                patient=patient,
-                date=date,
-                time=time,
-                queue_number=queue_number,
+            result = BookingService.book(
+                doctor,
+                int(clinic_id) if clinic_id else None,
+                date,
+                time,
+                patient,
+                rules=BookingService.STAFF_RULES,
                 status='confirmed',
             )
-            
-            messages.success(request, f'نوبت برای {patient.get_full_name()} با موفقیت ثبت شد')
-            return redirect('doctor_today_appointments')
+            if result['appointment'] is None:
+                messages.error(request, result['message'])
+            else:
+                messages.success(request, f'نوبت برای {patient.get_full_name()} با موفقیت ثبت شد')
+                return redirect('doctor_today_appointments')
             
         except ValueError:
             messages.error(request, 'تاریخ یا ساعت نامعتبر است')
@@ -879,6 +855,8 @@ def doctor_settings(request):
     doctor = get_doctor_or_404(request)
     
     if request.method == 'POST':
+        slot_settings = (doctor.visit_duration, doctor.gap_between_visits)
+        max_daily_appointments = doctor.max_daily_appointments
         doctor.visit_duration = int(request.POST.get('visit_duration', 15))
         doctor.gap_between_visits = int(request.POST.get('gap_between_visits', 5))
         doctor.max_daily_appointments = int(request.POST.get('max_daily_appointments', 30))
@@ -889,6 +867,13 @@ def doctor_settings(request):
             doctor.profile_image = request.FILES['profile_image']
         
         doctor.save()
+        if (doctor.visit_duration, doctor.gap_between_visits) != slot_settings:
+            TimeSlotService.materialize_doctor(doctor)
+        if (doctor.visit_duration, doctor.gap_between_visits, doctor.max_daily_appointments) != (
+            *slot_settings, max_daily_appointments
+        ):
+            # تایم‌ها یا ظرفیت روزانه تقویم رزرو عوض شده است
+            AvailabilityCache.invalidate_doctor(doctor.id)
         messages.success(request, 'تنظیمات با موفقیت ذخیره شد')
         return redirect('doctor_settings')
     
@@ -1261,6 +1246,30 @@ def api_search_patient(request):
         return JsonResponse({'found': False, 'message': 'بیماری با این شماره یافت نشد'})
 
 
+@login_required
+def api_patient_timeline(request, patient_id):
+    """
+    صفحه‌های بعدی خط زمانی پرونده بیمار (بارگذاری تدریجی)
+    GET /api/patients/<patient_id>/timeline/?cursor=...
+    """
+    try:
+        doctor = Doctor.objects.get(user=request.user)
+    except Doctor.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'دسترسی ندارید'})
+    
+    if not Appointment.objects.filter(doctor=doctor, patient_id=patient_id).exists():
+        return JsonResponse({'success': False, 'message': 'شما دسترسی به پرونده این بیمار را ندارید'})
+    
+    timeline = PatientTimelineService.get_page(
+        doctor, patient_id, cursor=request.GET.get('cursor')
+    )
+    return JsonResponse({
+        'success': True,
+        'events': [PatientTimelineService.serialize(event) for event in timeline['events']],
+        'next_cursor': timeline['next_cursor'],
+    })
+
+
 @login_required
 @require_POST
 def api_confirm_appointment(request, appointment_id):
@@ -1269,8 +1278,7 @@ def api_confirm_appointment(request, appointment_id):
         doctor = Doctor.objects.get(user=request.user)
         appointment = Appointment.objects.get(id=appointment_id, doctor=doctor)
         
-        appointment.status = 'confirmed'
-        appointment.save()
+        QueueService.transition(appointment, 'confirmed', user=request.user)
         
         return JsonResponse({'success': True, 'message': 'نوبت تأیید شد'})
     except (Doctor.DoesNotExist, Appointment.DoesNotExist):
@@ -1285,9 +1293,7 @@ def api_cancel_appointment(request, appointment_id):
         doctor = Doctor.objects.get(user=request.user)
         appointment = Appointment.objects.get(id=appointment_id, doctor=doctor)
         
-        appointment.status = 'cancelled'
-        appointment.cancelled_at = timezone.now()
-        appointment.save()
+        QueueService.transition(appointment, 'cancelled', user=request.user, cancelled_at=timezone.now())
         
         return JsonResponse({'success': True, 'message': 'نوبت لغو شد'})
     except (Doctor.DoesNotExist, Appointment.DoesNotExist):
@@ -1302,9 +1308,7 @@ def api_mark_arrived(request, appointment_id):
         doctor = Doctor.objects.get(user=request.user)
         appointment = Appointment.objects.get(id=appointment_id, doctor=doctor)
         
-        appointment.status = 'arrived'
-        appointment.arrived_at = timezone.now()
-        appointment.save()
+        QueueService.transition(appointment, 'arrived', user=request.user, arrived_at=timezone.now())
         
         return JsonResponse({'success': True, 'message': 'حضور ثبت شد'})
     except (Doctor.DoesNotExist, Appointment.DoesNotExist):
@@ -1319,15 +1323,19 @@ def api_start_visit(request, appointment_id):
         doctor = Doctor.objects.get(user=request.user)
         appointment = Appointment.objects.get(id=appointment_id, doctor=doctor)
         
-        # پایان ویزیت قبلی
-        Appointment.objects.filter(
-            doctor=doctor,
-            date=timezone.now().date(),
-            status='in_progress'
-        ).update(status='visited', visited_at=timezone.now())
-        
-        appointment.status = 'in_progress'
-        appointment.save()
+        with transaction.atomic():
+            # پایان ویزیت قبلی
+            previous = Appointment.objects.filter(
+                doctor=doctor,
+                date=timezone.now().date(),
+                status='in_progress'
+            ).exclude(id=appointment.id)
+            for prev in previous:
+                QueueService.transition(prev, 'visited', user=request.user, visited_at=timezone.now())
+            
+            QueueService.transition(
+                appointment, 'in_progress', user=request.user, visit_started_at=timezone.now()
+            )
         
         return JsonResponse({'success': True, 'message': 'ویزیت شروع شد'})
     except (Doctor.DoesNotExist, Appointment.DoesNotExist):
@@ -1342,9 +1350,7 @@ def api_end_visit(request, appointment_id):
         doctor = Doctor.objects.get(user=request.user)
         appointment = Appointment.objects.get(id=appointment_id, doctor=doctor)
         
-        appointment.status = 'visited'
-        appointment.visited_at = timezone.now()
-        appointment.save()
+        QueueService.transition(appointment, 'visited', user=request.user, visited_at=timezone.now())
         
         return JsonResponse({'success': True, 'message': 'ویزیت پایان یافت'})
     except (Doctor.DoesNotExist, Appointment.DoesNotExist):
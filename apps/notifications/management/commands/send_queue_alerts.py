@@ -0,0 +1,30 @@
+"""
+دستور مدیریتی برای ایجاد پیامک‌های «نوبت شما نزدیک است» - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+پیامک‌ها پس از هر تغییر صف هم (در پایان پنجره تجمیع انتشار) ساخته می‌شوند؛
+این دستور برای اجرای دوره‌ای با cron است تا موارد جامانده پوشش داده شوند.
+
+استفاده:
+    python manage.py send_queue_alerts
+    python manage.py send_queue_alerts --doctor 3 --clinic 1
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.services import QueueAlertService
+
+
+class Command(BaseCommand):
+    help = 'ایجاد پیامک هشدار نزدیک شدن نوبت برای بیماران صف‌های امروز'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, help='شناسه پزشک')
+        parser.add_argument('--clinic', type=int, help='شناسه مرکز')
+
+    def handle(self, *args, **options):
+        count = QueueAlertService.dispatch(
+            doctor_id=options['doctor'],
+            clinic_id=options['clinic'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{count} پیامک در صف ارسال قرار گرفت.'))
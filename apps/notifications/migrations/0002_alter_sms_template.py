@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sms',
+            name='template',
+            field=models.CharField(blank=True, choices=[('appointment_confirm', 'تأیید نوبت'), ('appointment_reminder', 'یادآوری نوبت'), ('appointment_cancelled', 'لغو نوبت'), ('queue_update', 'بروزرسانی صف'), ('waitlist_offer', 'پیشنهاد نوبت از لیست انتظار'), ('payment_success', 'تأیید پرداخت'), ('verification_code', 'کد تأیید'), ('welcome', 'خوش\u200cآمدگویی'), ('custom', 'سفارشی')], max_length=50, null=True, verbose_name='الگو'),
+        ),
+    ]
@@ -24,6 +24,7 @@ class SMS(models.Model):
         ('appointment_reminder', 'یادآوری نوبت'),
         ('appointment_cancelled', 'لغو نوبت'),
         ('queue_update', 'بروزرسانی صف'),
+        ('waitlist_offer', 'پیشنهاد نوبت از لیست انتظار'),
         ('payment_success', 'تأیید پرداخت'),
         ('verification_code', 'کد تأیید'),
         ('welcome', 'خوش‌آمدگویی'),
@@ -0,0 +1,8 @@
+"""
+سرویس‌های اپلیکیشن اعلان‌ها - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from .queue_alert_service import QueueAlertService
+
+__all__ = ['QueueAlertService']
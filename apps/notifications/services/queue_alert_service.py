@@ -0,0 +1,202 @@
+"""
+سرویس پیامک «نوبت شما نزدیک است» - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+در صف‌هایی که ویزیت آن‌ها شروع شده است، بیمارانی که تعداد نفرات
+جلوترشان به آستانه QUEUE_ALERT_AHEAD_THRESHOLD رسیده است به‌صورت دسته‌ای
+پیدا می‌شوند و برایشان یک ردیف SMS با الگوی queue_update ساخته می‌شود.
+هر نوبت حداکثر یک بار پیامک می‌گیرد (related_model='appointment' و
+related_id=شناسه نوبت).
+"""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import jdatetime
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from apps.queue.models import QueueStatus
+from ..models import SMS, SMSSetting, SMSTemplate
+
+
+class QueueAlertService:
+    """
+    سرویس ارسال دسته‌ای هشدار نزدیک شدن نوبت
+    """
+
+    TEMPLATE = 'queue_update'
+    RELATED_MODEL = 'appointment'
+
+    # تعداد نفرات جلوتر که با رسیدن به آن پیامک ارسال می‌شود
+    AHEAD_THRESHOLD = getattr(settings, 'QUEUE_ALERT_AHEAD_THRESHOLD', 3)
+
+    # قفل اجرای همزمان هر صف (ثانیه) و حداکثر انتظار برای آزاد شدن آن
+    LOCK_KEY = 'notifications:queue_alerts:lock:{doctor_id}:{clinic_id}:{date}'
+    LOCK_TIMEOUT = 60
+    LOCK_WAIT = 5
+    LOCK_POLL = 0.1
+
+    # وضعیت‌هایی که در صف انتظار حساب می‌شوند
+    WAITING_STATUSES = ['pending', 'confirmed', 'arrived', 'in_progress']
+
+    # وضعیت‌هایی که پیامک دریافت می‌کنند
+    NOTIFY_STATUSES = ['confirmed', 'arrived']
+
+    DEFAULT_MESSAGE = (
+        '{patient_name} عزیز، تا نوبت شما نزد {doctor_name} '
+        '{ahead_count} نفر باقی مانده است. لطفاً در {clinic_name} حاضر باشید.\nنوبان'
+    )
+
+    @staticmethod
+    def dispatch(date=None, doctor_id=None, clinic_id=None):
+        """
+        یافتن بیماران نزدیک به نوبت و ایجاد پیامک‌ها (یک bulk_create برای هر صف)
+
+        هر صف (پزشک، مرکز، روز) قفل جداگانه دارد. انتشار یک صف منتظر
+        پایان اجرای هم‌زمان همان صف می‌ماند؛ اجرای دوره‌ای همه صف‌ها از
+        صف‌های قفل‌شده می‌گذرد چون همان لحظه در حال پردازش‌اند.
+
+        Args:
+            date (date|None): روز صف (پیش‌فرض امروز)
+            doctor_id, clinic_id: محدود کردن به یک صف (اختیاری)
+
+        Returns:
+            int: تعداد پیامک‌های ایجادشده
+        """
+        if not SMSSetting.get_settings().send_queue_update:
+            return 0
+        date = date or timezone.localdate()
+
+        if doctor_id and clinic_id:
+            return QueueAlertService._dispatch_queue(date, doctor_id, clinic_id, wait=True)
+
+        queues = Appointment.objects.filter(
+            date=date,
+            status__in=QueueAlertService.NOTIFY_STATUSES,
+        )
+        if doctor_id:
+            queues = queues.filter(doctor_id=doctor_id)
+        if clinic_id:
+            queues = queues.filter(clinic_id=clinic_id)
+        return sum(
+            QueueAlertService._dispatch_queue(date, queue_doctor_id, queue_clinic_id, wait=False)
+            for queue_doctor_id, queue_clinic_id in queues.values_list(
+                'doctor_id', 'clinic_id'
+            ).distinct().order_by()
+        )
+
+    @staticmethod
+    def _dispatch_queue(date, doctor_id, clinic_id, wait):
+        """اجرای یک صف زیر قفل همان صف (wait: انتظار کوتاه برای آزاد شدن قفل)"""
+        lock_key = QueueAlertService.LOCK_KEY.format(
+            doctor_id=doctor_id, clinic_id=clinic_id, date=date
+        )
+        deadline = time.monotonic() + (QueueAlertService.LOCK_WAIT if wait else 0)
+        while not cache.add(lock_key, 1, QueueAlertService.LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return 0
+            time.sleep(QueueAlertService.LOCK_POLL)
+        try:
+            return QueueAlertService._dispatch(date, doctor_id, clinic_id)
+        finally:
+            cache.delete(lock_key)
+
+    @staticmethod
+    def is_running(date, doctor_id, clinic_id):
+        """
+        آیا ویزیت‌های صف شروع شده است (started_at سطر صف یا نوبت در حال
+        ویزیت/ویزیت‌شده)؛ پیش از آن «نفرات جلوتر» معنایی ندارد
+        """
+        return QueueStatus.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+            started_at__isnull=False,
+        ).exists() or Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+            status__in=['in_progress', 'visited'],
+        ).exists()
+
+    @staticmethod
+    def _dispatch(date, doctor_id, clinic_id):
+        if not QueueAlertService.is_running(date, doctor_id, clinic_id):
+            return 0
+
+        appointments = Appointment.objects.filter(
+            date=date,
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            status__in=QueueAlertService.WAITING_STATUSES,
+        )
+
+        rows = list(appointments.order_by('time').values(
+            'id', 'doctor_id', 'clinic_id', 'time', 'queue_number', 'status',
+            'patient__phone', 'patient__first_name', 'patient__last_name',
+            'doctor__user__first_name', 'doctor__user__last_name', 'clinic__name',
+        ))
+
+        # ساعت نوبت‌های در انتظار هر صف (مرتب) برای محاسبه نفرات جلوتر
+        queue_times = defaultdict(list)
+        for row in rows:
+            queue_times[(row['doctor_id'], row['clinic_id'])].append(row['time'])
+
+        candidates = {}
+        for row in rows:
+            if row['status'] not in QueueAlertService.NOTIFY_STATUSES or not row['patient__phone']:
+                continue
+            ahead = bisect_left(queue_times[(row['doctor_id'], row['clinic_id'])], row['time'])
+            if ahead <= QueueAlertService.AHEAD_THRESHOLD:
+                candidates[row['id']] = (row, ahead)
+        if not candidates:
+            return 0
+
+        # حذف نوبت‌هایی که قبلاً پیامک گرفته‌اند
+        already_sent = set(SMS.objects.filter(
+            template=QueueAlertService.TEMPLATE,
+            related_model=QueueAlertService.RELATED_MODEL,
+            related_id__in=list(candidates),
+        ).values_list('related_id', flat=True))
+
+        template = SMSTemplate.objects.filter(
+            name=QueueAlertService.TEMPLATE,
+            is_active=True,
+        ).values_list('content', flat=True).first() or QueueAlertService.DEFAULT_MESSAGE
+        jalali_date = jdatetime.date.fromgregorian(date=date).strftime('%Y/%m/%d')
+
+        messages = [
+            SMS(
+                receptor=row['patient__phone'],
+                message=QueueAlertService._render(template, row, ahead, jalali_date),
+                template=QueueAlertService.TEMPLATE,
+                related_model=QueueAlertService.RELATED_MODEL,
+                related_id=appointment_id,
+            )
+            for appointment_id, (row, ahead) in candidates.items()
+            if appointment_id not in already_sent
+        ]
+        SMS.objects.bulk_create(messages)
+        return len(messages)
+
+    @staticmethod
+    def _render(template, row, ahead, jalali_date):
+        """جایگذاری متغیرهای الگو (متغیرهای ناشناخته خالی می‌شوند)"""
+        values = defaultdict(str, {
+            'patient_name': f"{row['patient__first_name']} {row['patient__last_name']}".strip(),
+            'doctor_name': f"دکتر {row['doctor__user__first_name']} {row['doctor__user__last_name']}",
+            'clinic_name': row['clinic__name'] or '',
+            'date': jalali_date,
+            'time': row['time'].strftime('%H:%M'),
+            'queue_number': row['queue_number'] or '',
+            'ahead_count': ahead,
+        })
+        try:
+            return template.format_map(values)
+        except (ValueError, IndexError):
+            # الگوی نامعتبر (مثلاً آکولاد بسته‌نشده)
+            return QueueAlertService.DEFAULT_MESSAGE.format_map(values)
@@ -0,0 +1,63 @@
+"""
+تست‌های اپلیکیشن اعلان‌ها - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from datetime import time
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.appointments.models import Appointment
+from apps.clinics.models import Clinic
+from apps.doctors.models import Doctor, DoctorClinic
+from .models import SMS
+from .services import QueueAlertService
+
+
+class QueueAlertServiceTests(TestCase):
+    """پیامک «نوبت شما نزدیک است» فقط برای صف‌های شروع‌شده"""
+
+    def setUp(self):
+        user = User.objects.create_user(phone='09120000001', first_name='علی', last_name='رضایی', role='doctor')
+        self.doctor = Doctor.objects.create(user=user, specialization='general', medical_code='1001')
+        self.clinic = Clinic.objects.create(
+            name='مطب', phone='02100000000', province='تهران', city='تهران', address='-'
+        )
+        DoctorClinic.objects.create(doctor=self.doctor, clinic=self.clinic)
+        self.today = timezone.localdate()
+        self.appointments = []
+        for i in range(4):
+            patient = User.objects.create_user(
+                phone=f'0913000000{i}', first_name='بیمار', last_name=str(i), role='patient'
+            )
+            self.appointments.append(Appointment.objects.create(
+                patient=patient,
+                doctor=self.doctor,
+                clinic=self.clinic,
+                date=self.today,
+                time=time(9, i * 15),
+                queue_number=i + 1,
+                status='confirmed',
+            ))
+
+    def dispatch(self):
+        return QueueAlertService.dispatch(self.today, doctor_id=self.doctor.id, clinic_id=self.clinic.id)
+
+    def test_queue_not_started_sends_nothing(self):
+        self.assertEqual(self.dispatch(), 0)
+        self.assertFalse(SMS.objects.exists())
+
+    def test_started_queue_alerts_patients_near_their_turn(self):
+        first = self.appointments[0]
+        first.status = 'in_progress'
+        first.save()
+
+        self.assertEqual(self.dispatch(), 3)
+        self.assertEqual(
+            set(SMS.objects.values_list('related_id', flat=True)),
+            {appointment.id for appointment in self.appointments[1:]},
+        )
+        # هر نوبت فقط یک بار پیامک می‌گیرد
+        self.assertEqual(self.dispatch(), 0)
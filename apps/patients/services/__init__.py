@@ -0,0 +1,9 @@
+"""
+سرویس‌های اپلیکیشن بیماران - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from .record_service import MedicalRecordService
+from .timeline_service import PatientTimelineService
+
+__all__ = ['MedicalRecordService', 'PatientTimelineService']
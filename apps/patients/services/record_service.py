@@ -0,0 +1,122 @@
+"""
+سرویس ثبت پرونده پزشکی - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+آیتم‌های تجویز پیش از هر نوشتنی در حافظه ساخته و اعتبارسنجی می‌شوند؛
+سپس پرونده، همه آیتم‌ها (یک bulk_create) و شمارنده استفاده اصطلاحات
+پزشکی (یک UPDATE) در یک تراکنش ثبت می‌شوند.
+"""
+
+import json
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+
+from ..models import MedicalRecord, MedicalTerm, PrescriptionItem
+
+
+class MedicalRecordService:
+    """
+    سرویس ثبت پرونده و آیتم‌های تجویز
+    """
+
+    # فیلدهای متنی اختیاری آیتم (مقدار خالی → None)
+    OPTIONAL_FIELDS = (
+        'name_en', 'form', 'dosage', 'frequency', 'frequency_custom',
+        'timing', 'duration_unit', 'quantity', 'instructions',
+    )
+
+    @staticmethod
+    def build_items(items_json):
+        """
+        ساخت و اعتبارسنجی آیتم‌های تجویز در حافظه (بدون کوئری)
+
+        فقط ساختار JSON و عدد بودن مدت مصرف بررسی می‌شود؛ مقادیر فیلدهای
+        انتخابی (فرم، دوره و زمان مصرف) مانند قبل همان‌طور که فرم فرستاده
+        ذخیره می‌شوند. آیتم‌های بدون نام (ردیف‌های خالی فرم) نادیده گرفته
+        می‌شوند.
+
+        Args:
+            items_json (str): لیست JSON آیتم‌ها
+
+        Returns:
+            list[PrescriptionItem]: آیتم‌های ذخیره‌نشده بدون پرونده
+
+        Raises:
+            ValidationError: JSON یا مدت مصرف یکی از آیتم‌ها نامعتبر باشد
+        """
+        try:
+            data = json.loads(items_json or '[]')
+        except (json.JSONDecodeError, TypeError):
+            raise ValidationError('اطلاعات تجویز نامعتبر است')
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise ValidationError('اطلاعات تجویز نامعتبر است')
+
+        items = []
+        for item in data:
+            name = str(item.get('name') or '').strip()
+            if not name:
+                continue
+            try:
+                duration_value = int(item['duration_value']) if item.get('duration_value') else None
+            except (TypeError, ValueError):
+                raise ValidationError(f'مدت مصرف «{name}» نامعتبر است')
+
+            items.append(PrescriptionItem(
+                item_type=item.get('item_type') or 'medication',
+                name=name,
+                duration_value=duration_value,
+                sort_order=len(items),
+                **{
+                    field: str(item.get(field) or '').strip() or None
+                    for field in MedicalRecordService.OPTIONAL_FIELDS
+                }
+            ))
+        return items
+
+    @staticmethod
+    def create_record(doctor, patient, items, **fields):
+        """
+        ثبت پرونده، آیتم‌های تجویز و شمارنده اصطلاحات در یک تراکنش
+
+        Args:
+            items (list[PrescriptionItem]): خروجی build_items
+            **fields: فیلدهای پرونده (appointment، visit_date، diagnosis و ...)
+
+        Returns:
+            MedicalRecord: پرونده ثبت‌شده
+        """
+        with transaction.atomic():
+            record = MedicalRecord.objects.create(doctor=doctor, patient=patient, **fields)
+            for item in items:
+                item.record = record
+            PrescriptionItem.objects.bulk_create(items)
+            MedicalRecordService.bump_term_usage(items)
+        return record
+
+    @staticmethod
+    def bump_term_usage(items):
+        """
+        افزایش usage_count اصطلاحات به‌کاررفته در آیتم‌ها با یک UPDATE
+
+        آیتم با نام فارسی یا انگلیسی اصطلاحی از همان دسته تطبیق داده می‌شود.
+
+        Returns:
+            int: تعداد اصطلاحات بروزرسانی‌شده
+        """
+        names = defaultdict(set)
+        for item in items:
+            names[item.item_type].add(item.name)
+            if item.name_en:
+                names[item.item_type].add(item.name_en)
+        if not names:
+            return 0
+
+        condition = Q()
+        for category, category_names in names.items():
+            condition |= Q(category=category) & (
+                Q(name_fa__in=category_names) | Q(name_en__in=category_names)
+            )
+        return MedicalTerm.objects.filter(condition).update(usage_count=F('usage_count') + 1)
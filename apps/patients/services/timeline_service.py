@@ -0,0 +1,148 @@
+"""
+سرویس خط زمانی پرونده بیمار - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+پرونده‌ها و نوبت‌های بیمار نزد یک پزشک در یک خط زمانی (جدیدترین اول)
+ادغام می‌شوند. صفحه‌بندی keyset بر اساس (تاریخ، نوع، شناسه) است: از هر
+جدول حداکثر page_size + 1 سطر بعد از نشانگر خوانده و در پایتون ادغام
+می‌شود. آیتم‌های تجویز و فایل‌های پرونده‌ها با Prefetch خوانده می‌شوند
+تا تعداد کوئری هر صفحه ثابت باشد.
+"""
+
+from datetime import date as date_cls
+
+from django.db.models import Prefetch, Q
+
+from apps.appointments.models import Appointment
+from ..models import MedicalFile, MedicalRecord, PrescriptionItem
+
+
+class PatientTimelineService:
+    """
+    سرویس خط زمانی پرونده‌ها و نوبت‌های بیمار
+    """
+
+    PAGE_SIZE = 20
+
+    # ترتیب انواع در یک روز (بزرگ‌تر اول): پرونده بالای نوبت همان روز
+    KINDS = {'record': 1, 'appointment': 0}
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """
+        خواندن نشانگر صفحه بعد ('YYYY-MM-DD.kind.id')
+
+        Returns:
+            tuple|None: (date, kind, id) یا None برای نشانگر خالی/نامعتبر
+        """
+        try:
+            day, kind, event_id = cursor.split('.')
+            position = (date_cls.fromisoformat(day), kind, int(event_id))
+        except (AttributeError, ValueError):
+            return None
+        if kind not in PatientTimelineService.KINDS:
+            return None
+        return position
+
+    @staticmethod
+    def _after(date_field, kind, position):
+        """شرط سطرهای یک نوع که پس از نشانگر می‌آیند"""
+        if position is None:
+            return Q()
+        day, cursor_kind, event_id = position
+        rank = PatientTimelineService.KINDS[kind]
+        cursor_rank = PatientTimelineService.KINDS[cursor_kind]
+        if rank < cursor_rank:
+            return Q(**{f'{date_field}__lte': day})
+        if rank > cursor_rank:
+            return Q(**{f'{date_field}__lt': day})
+        return Q(**{f'{date_field}__lt': day}) | Q(**{date_field: day, 'id__lt': event_id})
+
+    @staticmethod
+    def get_page(doctor, patient, cursor=None, page_size=None):
+        """
+        یک صفحه از خط زمانی (سه کوئری برای پرونده‌ها، دو کوئری برای نوبت‌ها)
+
+        Returns:
+            dict: {'events': [{'kind', 'date', 'object'}, ...], 'next_cursor': str|None}
+        """
+        page_size = page_size or PatientTimelineService.PAGE_SIZE
+        position = PatientTimelineService.parse_cursor(cursor)
+
+        records = MedicalRecord.objects.filter(
+            PatientTimelineService._after('visit_date', 'record', position),
+            doctor=doctor,
+            patient=patient,
+        ).select_related('appointment').prefetch_related(
+            Prefetch('prescription_items', queryset=PrescriptionItem.objects.order_by('sort_order', 'id')),
+            Prefetch('files', queryset=MedicalFile.objects.order_by('-created_at')),
+        ).order_by('-visit_date', '-id')[:page_size + 1]
+
+        appointments = Appointment.objects.filter(
+            PatientTimelineService._after('date', 'appointment', position),
+            doctor=doctor,
+            patient=patient,
+        ).select_related('clinic').order_by('-date', '-id')[:page_size + 1]
+
+        events = [
+            {'kind': 'record', 'date': record.visit_date, 'object': record}
+            for record in records
+        ] + [
+            {'kind': 'appointment', 'date': appointment.date, 'object': appointment}
+            for appointment in appointments
+        ]
+        events.sort(
+            key=lambda event: (
+                event['date'], PatientTimelineService.KINDS[event['kind']], event['object'].id
+            ),
+            reverse=True
+        )
+
+        next_cursor = None
+        if len(events) > page_size:
+            events = events[:page_size]
+            last = events[-1]
+            next_cursor = f"{last['date'].isoformat()}.{last['kind']}.{last['object'].id}"
+        return {'events': events, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def serialize(event):
+        """تبدیل یک رویداد خط زمانی به dict قابل JSON"""
+        obj = event['object']
+        if event['kind'] == 'appointment':
+            return {
+                'kind': 'appointment',
+                'id': obj.id,
+                'date': obj.date.isoformat(),
+                'time': obj.time.strftime('%H:%M') if obj.time else '',
+                'status': obj.status,
+                'status_display': obj.get_status_display(),
+                'clinic': obj.clinic.name if obj.clinic else '',
+                'queue_number': obj.queue_number,
+            }
+
+        return {
+            'kind': 'record',
+            'id': obj.id,
+            'date': obj.visit_date.isoformat(),
+            'appointment_id': obj.appointment_id,
+            'chief_complaint': obj.chief_complaint or '',
+            'diagnosis': obj.diagnosis or '',
+            'prescription': obj.prescription or '',
+            'notes': obj.notes or '',
+            'next_visit_date': obj.next_visit_date.isoformat() if obj.next_visit_date else None,
+            'prescription_items': {
+                item_type: [item.get_full_description() for item in items]
+                for item_type, items in obj.prescription_items_by_type.items()
+            },
+            'files': [
+                {
+                    'id': medical_file.id,
+                    'url': medical_file.file.url if medical_file.file else '',
+                    'title': medical_file.title or medical_file.get_file_type_display(),
+                    'file_type': medical_file.file_type,
+                    'size': medical_file.get_file_size_display(),
+                }
+                for medical_file in obj.files.all()
+            ],
+        }
@@ -17,6 +17,14 @@ urlpatterns = [
     # API رزرو (AJAX)
     path('book/<int:doctor_id>/dates/', views.api_doctor_dates, name='api_doctor_dates'),
     path('book/<int:doctor_id>/times/', views.api_doctor_times, name='api_doctor_times'),
+    path('book/<int:doctor_id>/month/', views.api_doctor_month, name='api_doctor_month'),
+    path('book/<int:doctor_id>/availability/', views.api_doctor_availability, name='api_doctor_availability'),
+    path('book/<int:doctor_id>/hold/', views.api_hold_slot, name='api_hold_slot'),
+    path('book/earliest/', views.api_earliest_slots, name='api_earliest_slots'),
+
+    # لیست انتظار
+    path('book/<int:doctor_id>/waitlist/', views.api_join_waitlist, name='api_join_waitlist'),
+    path('waitlist/<int:pk>/leave/', views.api_leave_waitlist, name='api_leave_waitlist'),
 
     # نوبت‌های من
     path('appointments/', views.my_appointments, name='patient_appointments'),
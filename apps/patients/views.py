@@ -10,15 +10,23 @@ Views برای بخش بیماران - نوبان
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 from django.utils import timezone
 from django.db.models import Q
-from datetime import datetime, timedelta, time as dt_time
-from apps.doctors.models import Doctor, DoctorClinic, WorkSchedule, DoctorHoliday
+from datetime import datetime, time as dt_time
+import jdatetime
+from apps.doctors.models import Doctor, DoctorClinic, DoctorHoliday
 from apps.clinics.models import Clinic
-from apps.appointments.models import Appointment
+from apps.appointments.models import Appointment, WaitlistEntry
+from apps.appointments.services import (
+    AvailabilityCache, BookingService, CapacityCalendarService, NextSlotService,
+    SlotHoldService, TimeSlotService, WaitlistService
+)
+from apps.queue.services import QueueService
 from .models import MedicalRecord, MedicalFile
 
 
@@ -55,86 +63,13 @@ def get_doctor_working_dates(doctor, clinic, max_days=None):
     - حداکثر روزهای رزرو آینده (max_advance_days)
     - حداکثر نوبت روزانه
 
+    تعداد نوبت‌های همه روزها با یک کوئری گروه‌بندی‌شده خوانده می‌شود
+    (CapacityCalendarService) و نتیجه تا تغییر بعدی در کش می‌ماند.
+
     Returns:
         list of dict: [{'date': date, 'day_of_week': int, 'day_name': str, 'schedules': [...]}]
     """
-    if max_days is None:
-        max_days = doctor.max_advance_days or 30
-
-    today = timezone.now().date()
-
-    # ۱. دریافت روزهای کاری پزشک در این مرکز
-    work_schedules = WorkSchedule.objects.filter(
-        doctor=doctor,
-        clinic=clinic,
-        is_active=True
-    ).order_by('day_of_week', 'start_time')
-
-    if not work_schedules.exists():
-        return []
-
-    # ساخت دیکشنری روزهای کاری: {day_of_week: [schedule1, schedule2, ...]}
-    schedule_map = {}
-    for ws in work_schedules:
-        if ws.day_of_week not in schedule_map:
-            schedule_map[ws.day_of_week] = []
-        schedule_map[ws.day_of_week].append(ws)
-
-    # ۲. دریافت تعطیلات پزشک
-    holidays = set(
-        DoctorHoliday.objects.filter(
-            doctor=doctor,
-            date__gte=today,
-            date__lte=today + timedelta(days=max_days)
-        ).filter(
-            Q(clinic=clinic) | Q(clinic__isnull=True)
-        ).values_list('date', flat=True)
-    )
-
-    # ۳. تولید لیست تاریخ‌های کاری واقعی
-    working_dates = []
-    day_names = ['شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه', 'پنج‌شنبه', 'جمعه']
-
-    for i in range(max_days):
-        date = today + timedelta(days=i)
-        jalali_dow = get_jalali_day_of_week(date)
-
-        # آیا این روز در تقویم کاری هست؟
-        if jalali_dow not in schedule_map:
-            continue
-
-        # آیا تعطیل هست؟
-        if date in holidays:
-            continue
-
-        # بررسی آیا هنوز ظرفیت دارد
-        booked_count = Appointment.objects.filter(
-            doctor=doctor,
-            clinic=clinic,
-            date=date,
-            status__in=['pending', 'confirmed', 'arrived', 'in_progress']
-        ).count()
-
-        # حداکثر نوبت از WorkSchedule یا از تنظیمات پزشک
-        schedules_for_day = schedule_map[jalali_dow]
-        max_for_day = schedules_for_day[0].max_appointments or doctor.max_daily_appointments
-
-        if booked_count >= max_for_day:
-            continue
-
-        working_dates.append({
-            'date': date,
-            'date_str': date.isoformat(),
-            'day_of_week': jalali_dow,
-            'day_name': day_names[jalali_dow],
-            'is_today': (date == today),
-            'schedules': schedules_for_day,
-            'booked_count': booked_count,
-            'max_appointments': max_for_day,
-            'remaining': max_for_day - booked_count,
-        })
-
-    return working_dates
+    return AvailabilityCache.get_working_dates(doctor, clinic, max_days)
 
 
 def get_available_time_slots(doctor, clinic, date):
@@ -147,76 +82,13 @@ def get_available_time_slots(doctor, clinic, date):
     - نوبت‌های رزرو شده موجود
     - اگر امروز باشد، ساعت‌های گذشته حذف شوند
 
+    تایم‌ها از جدول TimeSlot (ساخته‌شده توسط TimeSlotService) و از طریق
+    کش AvailabilityCache خوانده می‌شوند.
+
     Returns:
         list of dict: [{'time': '08:00', 'time_obj': time, 'is_available': True/False}]
     """
-    jalali_dow = get_jalali_day_of_week(date)
-
-    # ۱. دریافت ساعات کاری
-    work_schedules = WorkSchedule.objects.filter(
-        doctor=doctor,
-        clinic=clinic,
-        day_of_week=jalali_dow,
-        is_active=True
-    ).order_by('start_time')
-
-    if not work_schedules.exists():
-        return []
-
-    # ۲. مدت هر تایم (ویزیت + فاصله)
-    # اگر مرکز تنظیمات سفارشی داره استفاده کن
-    doctor_clinic = DoctorClinic.objects.filter(
-        doctor=doctor, clinic=clinic
-    ).first()
-
-    visit_duration = (
-        doctor_clinic.custom_visit_duration if doctor_clinic and doctor_clinic.custom_visit_duration
-        else doctor.visit_duration
-    )
-    gap = doctor.gap_between_visits
-    slot_duration = visit_duration + gap  # مجموع زمان هر اسلات
-
-    # ۳. نوبت‌های رزرو شده
-    booked_times = set(
-        Appointment.objects.filter(
-            doctor=doctor,
-            clinic=clinic,
-            date=date,
-            status__in=['pending', 'confirmed', 'arrived', 'in_progress']
-        ).values_list('time', flat=True)
-    )
-
-    # ۴. ساعت فعلی (اگر امروز باشد)
-    now = timezone.now()
-    is_today = (date == now.date())
-    current_time = now.time() if is_today else None
-
-    # ۵. تولید تایم‌ها
-    time_slots = []
-
-    for ws in work_schedules:
-        current_slot = datetime.combine(date, ws.start_time)
-        end_datetime = datetime.combine(date, ws.end_time)
-
-        while current_slot + timedelta(minutes=visit_duration) <= end_datetime:
-            slot_time = current_slot.time()
-            time_str = slot_time.strftime('%H:%M')
-
-            # بررسی موجود بودن
-            is_booked = slot_time in booked_times
-            is_past = is_today and current_time and slot_time <= current_time
-
-            time_slots.append({
-                'time': time_str,
-                'time_obj': slot_time,
-                'is_available': not is_booked and not is_past,
-                'is_booked': is_booked,
-                'is_past': is_past,
-            })
-
-            current_slot += timedelta(minutes=slot_duration)
-
-    return time_slots
+    return AvailabilityCache.get_slots(doctor, clinic, date)
 
 
 # ============================================================
@@ -363,91 +235,22 @@ def book_appointment_doctor(request, doctor_id):
             messages.error(request, 'اطلاعات نامعتبر')
             return redirect('patient_book_doctor', doctor_id=doctor_id)
 
-        # بررسی اعتبار مرکز
-        if not doctor_clinics.filter(clinic=booking_clinic).exists():
-            messages.error(request, 'پزشک در این مرکز فعالیت ندارد')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # بررسی تاریخ گذشته
-        if booking_date < timezone.now().date():
-            messages.error(request, 'امکان رزرو برای تاریخ گذشته وجود ندارد')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # بررسی تعطیلی
-        is_holiday = DoctorHoliday.objects.filter(
-            doctor=doctor,
-            date=booking_date
-        ).filter(
-            Q(clinic=booking_clinic) | Q(clinic__isnull=True)
-        ).exists()
-        if is_holiday:
-            messages.error(request, 'پزشک در این تاریخ تعطیل است')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # بررسی برنامه کاری
-        jalali_dow = get_jalali_day_of_week(booking_date)
-        has_schedule = WorkSchedule.objects.filter(
-            doctor=doctor,
-            clinic=booking_clinic,
-            day_of_week=jalali_dow,
-            is_active=True
-        ).exists()
-        if not has_schedule:
-            messages.error(request, 'پزشک در این روز در این مرکز برنامه‌ای ندارد')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # بررسی نوبت تکراری
-        if Appointment.objects.filter(
-            doctor=doctor,
-            clinic=booking_clinic,
-            date=booking_date,
-            time=booking_time,
-            status__in=['pending', 'confirmed', 'arrived', 'in_progress']
-        ).exists():
-            messages.error(request, 'این زمان قبلاً رزرو شده است. لطفاً زمان دیگری انتخاب کنید.')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # بررسی ظرفیت روزانه
-        booked_count = Appointment.objects.filter(
-            doctor=doctor,
-            clinic=booking_clinic,
-            date=booking_date,
-            status__in=['pending', 'confirmed', 'arrived', 'in_progress']
-        ).count()
-        if booked_count >= doctor.max_daily_appointments:
-            messages.error(request, 'ظرفیت نوبت این روز تکمیل شده است')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # بررسی نوبت تکراری بیمار در همان روز و پزشک
-        if Appointment.objects.filter(
-            patient=request.user,
-            doctor=doctor,
-            date=booking_date,
-            status__in=['pending', 'confirmed']
-        ).exists():
-            messages.error(request, 'شما قبلاً در این تاریخ نزد این پزشک نوبت دارید')
-            return redirect('patient_book_doctor', doctor_id=doctor_id)
-
-        # محاسبه شماره صف
-        queue_number = booked_count + 1
-
-        # دریافت هزینه ویزیت
-        doctor_clinic_obj = doctor_clinics.filter(clinic=booking_clinic).first()
-        visit_fee = doctor_clinic_obj.get_visit_fee() if doctor_clinic_obj else (doctor.visit_fee or 0)
-
-        # ایجاد نوبت
-        appointment = Appointment.objects.create(
-            patient=request.user,
-            doctor=doctor,
-            clinic=booking_clinic,
-            date=booking_date,
-            time=booking_time,
+        # بررسی همه شرط‌ها و ایجاد نوبت در یک تراکنش
+        result = BookingService.book(
+            doctor,
+            booking_clinic.id,
+            booking_date,
+            booking_time,
+            request.user,
+            with_fee=True,
             status='pending',
             payment_status='unpaid',
-            payment_amount=visit_fee,
-            queue_number=queue_number,
             booking_source='online',
         )
+        if result['appointment'] is None:
+            messages.error(request, result['message'])
+            return redirect('patient_book_doctor', doctor_id=doctor_id)
+        queue_number = result['appointment'].queue_number
 
         messages.success(
             request,
@@ -523,6 +326,105 @@ def api_doctor_dates(request, doctor_id):
     })
 
 
+# ============================================================
+#  API - تقویم ماهانه ظرفیت (AJAX)
+# ============================================================
+
+@login_required
+def api_doctor_month(request, doctor_id):
+    """
+    API: تقویم یک ماه شمسی پزشک در یک مرکز با وضعیت ظرفیت هر روز
+    GET /patient/book/<doctor_id>/month/?clinic=<clinic_id>&month=<YYYY-MM شمسی>
+    """
+    doctor = get_object_or_404(Doctor, id=doctor_id, is_active=True)
+    clinic_id = request.GET.get('clinic')
+
+    if not clinic_id:
+        return JsonResponse({'success': False, 'message': 'مرکز مشخص نشده'})
+
+    try:
+        clinic = Clinic.objects.get(id=int(clinic_id), is_active=True)
+        month_str = request.GET.get('month')
+        if month_str:
+            year, month = (int(part) for part in month_str.split('-'))
+        else:
+            current = jdatetime.date.today()
+            year, month = current.year, current.month
+        if not 1 <= month <= 12:
+            raise ValueError
+    except (ValueError, Clinic.DoesNotExist):
+        return JsonResponse({'success': False, 'message': 'پارامترهای نامعتبر'})
+
+    # بررسی ارتباط پزشک-مرکز
+    if not DoctorClinic.objects.filter(doctor=doctor, clinic=clinic, is_active=True).exists():
+        return JsonResponse({'success': False, 'message': 'پزشک در این مرکز فعالیت ندارد'})
+
+    days = AvailabilityCache.get_month(doctor, clinic, year, month)
+
+    days_data = []
+    for day in days:
+        days_data.append({
+            'date': day['date_str'],
+            'jalali_day': day['jalali_day'],
+            'day_name': day['day_name'],
+            'is_today': day['is_today'],
+            'status': day['status'],
+            'remaining': day['remaining'],
+            'max_appointments': day['max_appointments'],
+        })
+
+    return JsonResponse({
+        'success': True,
+        'month': f'{year}-{month:02d}',
+        'days': days_data,
+        'clinic_name': clinic.name,
+    })
+
+
+# ============================================================
+#  API - نزدیک‌ترین تایم‌های آزاد بین پزشکان (AJAX)
+# ============================================================
+
+@login_required
+def api_earliest_slots(request):
+    """
+    API: نزدیک‌ترین تایم‌های آزاد همه پزشکان فعال (هر پزشک/مرکز یک تایم)
+    GET /patient/book/earliest/?specialization=<>&city=<>&province=<>&limit=<N>
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'پارامترهای نامعتبر'})
+
+    slots = NextSlotService.search(
+        specialization=request.GET.get('specialization'),
+        city=request.GET.get('city'),
+        province=request.GET.get('province'),
+        limit=limit,
+    )
+
+    slots_data = []
+    for slot in slots:
+        slots_data.append({
+            'doctor_id': slot.doctor_id,
+            'doctor_name': slot.doctor.get_full_title(),
+            'specialization': slot.doctor.specialization,
+            'clinic_id': slot.clinic_id,
+            'clinic_name': slot.clinic.name,
+            'city': slot.clinic.city,
+            'date': slot.date.isoformat(),
+            'jalali_date': jdatetime.date.fromgregorian(date=slot.date).strftime('%Y/%m/%d'),
+            'day_name': CapacityCalendarService.DAY_NAMES[get_jalali_day_of_week(slot.date)],
+            'time': slot.time.strftime('%H:%M'),
+            'book_url': f"{reverse('patient_book_doctor', args=[slot.doctor_id])}?clinic={slot.clinic_id}",
+        })
+
+    return JsonResponse({
+        'success': True,
+        'slots': slots_data,
+    })
+
+
 # ============================================================
 #  API - دریافت تایم‌های خالی (AJAX)
 # ============================================================
@@ -546,6 +448,11 @@ def api_doctor_times(request, doctor_id):
     except (ValueError, Clinic.DoesNotExist):
         return JsonResponse({'success': False, 'message': 'پارامترهای نامعتبر'})
 
+    # فقط روزهای افق رزرو پزشک
+    today, horizon_end = TimeSlotService.get_horizon(doctor)
+    if not today <= date <= horizon_end:
+        return JsonResponse({'success': False, 'message': 'تاریخ خارج از بازه رزرو است'})
+
     # بررسی ارتباط پزشک-مرکز
     if not DoctorClinic.objects.filter(doctor=doctor, clinic=clinic, is_active=True).exists():
         return JsonResponse({'success': False, 'message': 'پزشک در این مرکز فعالیت ندارد'})
@@ -560,6 +467,12 @@ def api_doctor_times(request, doctor_id):
 
     time_slots = get_available_time_slots(doctor, clinic, date)
 
+    # تایم‌هایی که بیماران دیگر موقتاً نگه داشته‌اند
+    held_times = {
+        t.strftime('%H:%M')
+        for t in SlotHoldService.get_held_times(doctor, clinic, date, exclude_patient=request.user)
+    }
+
     # هزینه ویزیت
     dc = DoctorClinic.objects.filter(doctor=doctor, clinic=clinic).first()
     visit_fee = dc.get_visit_fee() if dc else (doctor.visit_fee or 0)
@@ -567,10 +480,13 @@ def api_doctor_times(request, doctor_id):
 
     slots_data = []
     for slot in time_slots:
+        is_held = slot['time'] in held_times
         slots_data.append({
             'time': slot['time'],
-            'is_available': slot['is_available'],
+            'is_available': slot['is_available'] and not is_held,
             'is_booked': slot['is_booked'],
+            'is_blocked': slot.get('is_blocked', False),
+            'is_held': is_held,
             'is_past': slot.get('is_past', False),
         })
 
@@ -586,6 +502,151 @@ def api_doctor_times(request, doctor_id):
     })
 
 
+# ============================================================
+#  API - خلاصه تاریخ‌ها و تایم‌های یک بازه (AJAX)
+# ============================================================
+
+@login_required
+def api_doctor_availability(request, doctor_id):
+    """
+    API: روزها و تایم‌های آزاد یک بازه در یک پاسخ
+    GET /patient/book/<doctor_id>/availability/?clinic=<clinic_id>&start=<YYYY-MM-DD>&end=<YYYY-MM-DD>
+
+    هر روز به یکی از templates (لیست ساعت‌ها) ارجاع می‌دهد و free یک
+    bitset هگزادسیمال است: بیت i یعنی ساعت i آن الگو آزاد است.
+    پیش‌فرض بازه: امروز تا max_advance_days پزشک.
+    """
+    doctor = get_object_or_404(Doctor, id=doctor_id, is_active=True)
+    clinic_id = request.GET.get('clinic')
+
+    if not clinic_id:
+        return JsonResponse({'success': False, 'message': 'مرکز مشخص نشده'})
+
+    today, horizon_end = TimeSlotService.get_horizon(doctor)
+    try:
+        clinic = Clinic.objects.get(id=int(clinic_id), is_active=True)
+        start_str = request.GET.get('start')
+        end_str = request.GET.get('end')
+        start = datetime.strptime(start_str, '%Y-%m-%d').date() if start_str else today
+        end = datetime.strptime(end_str, '%Y-%m-%d').date() if end_str else horizon_end
+    except (ValueError, Clinic.DoesNotExist):
+        return JsonResponse({'success': False, 'message': 'پارامترهای نامعتبر'})
+
+    start = max(start, today)
+    end = min(end, horizon_end)
+    if start > end:
+        return JsonResponse({'success': False, 'message': 'بازه تاریخ نامعتبر'})
+
+    dc = DoctorClinic.objects.filter(doctor=doctor, clinic=clinic, is_active=True).first()
+    if dc is None:
+        return JsonResponse({'success': False, 'message': 'پزشک در این مرکز فعالیت ندارد'})
+
+    held = SlotHoldService.get_held_range(doctor, clinic, start, end, exclude_patient=request.user)
+    availability = AvailabilityCache.get_range(doctor, clinic, start, end, held)
+
+    return JsonResponse({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'templates': availability['templates'],
+        'days': availability['days'],
+        'clinic_name': clinic.name,
+        'visit_fee': int(dc.get_visit_fee()),
+        'visit_duration': dc.get_visit_duration(),
+    })
+
+
+# ============================================================
+#  API - نگه‌داشت موقت تایم (AJAX)
+# ============================================================
+
+@login_required
+@require_POST
+def api_hold_slot(request, doctor_id):
+    """
+    API: نگه‌داشتن موقت یک تایم تا تکمیل رزرو
+    POST /patient/book/<doctor_id>/hold/  (clinic, date=<YYYY-MM-DD>, time=<HH:MM>)
+    """
+    doctor = get_object_or_404(Doctor, id=doctor_id, is_active=True)
+    clinic_id = request.POST.get('clinic')
+    date_str = request.POST.get('date')
+    time_str = request.POST.get('time')
+
+    if not clinic_id or not date_str or not time_str:
+        return JsonResponse({'success': False, 'message': 'پارامترهای ناقص'})
+
+    try:
+        clinic = Clinic.objects.get(id=int(clinic_id), is_active=True)
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        slot_time = datetime.strptime(time_str, '%H:%M').time()
+    except (ValueError, Clinic.DoesNotExist):
+        return JsonResponse({'success': False, 'message': 'پارامترهای نامعتبر'})
+
+    result = SlotHoldService.acquire(doctor, clinic.id, date, slot_time, request.user)
+    if result['hold'] is None:
+        return JsonResponse({
+            'success': False,
+            'reasons': result['reasons'],
+            'message': result['message'],
+        })
+
+    return JsonResponse({
+        'success': True,
+        'expires_at': result['hold'].expires_at.isoformat(),
+        'hold_seconds': SlotHoldService.HOLD_SECONDS,
+    })
+
+
+# ============================================================
+#  API - لیست انتظار (AJAX)
+# ============================================================
+
+@login_required
+@require_POST
+def api_join_waitlist(request, doctor_id):
+    """
+    API: ورود به لیست انتظار روز پر پزشک
+    POST /patient/book/<doctor_id>/waitlist/  (clinic, date=<YYYY-MM-DD>)
+    """
+    doctor = get_object_or_404(Doctor, id=doctor_id, is_active=True)
+    clinic_id = request.POST.get('clinic')
+    date_str = request.POST.get('date')
+
+    if not clinic_id or not date_str:
+        return JsonResponse({'success': False, 'message': 'پارامترهای ناقص'})
+
+    try:
+        clinic = Clinic.objects.get(id=int(clinic_id), is_active=True)
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except (ValueError, Clinic.DoesNotExist):
+        return JsonResponse({'success': False, 'message': 'پارامترهای نامعتبر'})
+
+    result = WaitlistService.join(doctor, clinic, date, request.user)
+    if result['entry'] is None:
+        return JsonResponse({'success': False, 'message': result['message']})
+
+    return JsonResponse({
+        'success': True,
+        'entry_id': result['entry'].id,
+        'position': WaitlistService.get_position(result['entry']),
+        'message': 'در لیست انتظار قرار گرفتید. با آزاد شدن نوبت پیامک دریافت می‌کنید.',
+    })
+
+
+@login_required
+@require_POST
+def api_leave_waitlist(request, pk):
+    """API: خروج از لیست انتظار"""
+    entry = get_object_or_404(
+        WaitlistEntry,
+        pk=pk,
+        patient=request.user,
+        status__in=['waiting', 'offered']
+    )
+    WaitlistService.leave(entry)
+    return JsonResponse({'success': True, 'message': 'از لیست انتظار خارج شدید'})
+
+
 # ============================================================
 #  نوبت‌های من
 # ============================================================
@@ -601,9 +662,16 @@ def my_appointments(request):
     if status:
         appointments = appointments.filter(status=status)
 
+    waitlist_entries = WaitlistEntry.objects.filter(
+        patient=request.user,
+        status__in=['waiting', 'offered'],
+        date__gte=timezone.now().date()
+    ).select_related('doctor__user', 'clinic').order_by('date')
+
     context = {
         'appointments': appointments,
         'selected_status': status,
+        'waitlist_entries': waitlist_entries,
     }
     return render(request, 'patients/appointments.html', context)
 
@@ -622,11 +690,13 @@ def cancel_appointment(request, pk):
         return redirect('patient_appointments')
 
     if request.method == 'POST':
-        appointment.status = 'cancelled'
-        appointment.cancelled_at = timezone.now()
-        appointment.cancel_reason = request.POST.get('reason', '')
-        appointment.cancelled_by = request.user
-        appointment.save()
+        QueueService.transition(
+            appointment,
+            'cancelled',
+            cancelled_at=timezone.now(),
+            cancel_reason=request.POST.get('reason', ''),
+            cancelled_by=request.user,
+        )
 
         messages.success(request, 'نوبت با موفقیت لغو شد')
         return redirect('patient_appointments')
@@ -669,36 +739,20 @@ def live_queue(request):
     upcoming_appointments = []
 
     if active_appointment:
-        # محاسبه تعداد نفرات جلوتر
-        ahead_count = Appointment.objects.filter(
-            doctor=active_appointment.doctor,
-            clinic=active_appointment.clinic,
-            date=active_appointment.date,
-            time__lt=active_appointment.time,
-            status__in=['pending', 'confirmed', 'arrived', 'in_progress']
-        ).count()
-
-        # محاسبه تعداد کل نوبت‌های آن روز
-        total_day = Appointment.objects.filter(
-            doctor=active_appointment.doctor,
-            clinic=active_appointment.clinic,
-            date=active_appointment.date,
-            status__in=['pending', 'confirmed', 'arrived', 'in_progress', 'visited']
-        ).count()
-
-        # تعداد ویزیت‌شده‌ها
-        visited_count = Appointment.objects.filter(
-            doctor=active_appointment.doctor,
-            clinic=active_appointment.clinic,
-            date=active_appointment.date,
-            status='visited'
-        ).count()
+        # محاسبه تعداد نفرات جلوتر (نمای Redis یا دیتابیس)
+        ahead_count = QueueService.get_ahead_count(active_appointment)
+
+        # شمارنده‌های صف از سطر QueueStatus (کلید یکتا پزشک/مرکز/تاریخ)
+        queue_status = QueueService.get_status(
+            active_appointment.doctor_id,
+            active_appointment.clinic_id,
+            active_appointment.date
+        )
+        total_day = queue_status.total_appointments
+        visited_count = queue_status.completed_appointments
 
         # محاسبه زمان تقریبی
-        estimated_wait = ahead_count * (
-            active_appointment.doctor.visit_duration +
-            active_appointment.doctor.gap_between_visits
-        )
+        estimated_wait = ahead_count * QueueService.get_average_duration(queue_status)
 
         is_today = (active_appointment.date == today)
         is_future = (active_appointment.date > today)
@@ -713,6 +767,17 @@ def live_queue(request):
             'visited_count': visited_count,
             'is_today': is_today,
             'is_future': is_future,
+            'current_queue_number': queue_status.current_queue_number,
+            # مسیر WebSocket (و جایگزین SSE) برای دریافت تغییرات بدون رفرش صفحه
+            'ws_path': (
+                f'/ws/queue/{active_appointment.doctor_id}/{active_appointment.clinic_id or 0}/'
+                f'{active_appointment.date.isoformat()}/?appointment={active_appointment.id}'
+            ),
+            'sse_url': reverse('queue_events', kwargs={
+                'doctor_id': active_appointment.doctor_id,
+                'clinic_id': active_appointment.clinic_id or 0,
+                'date': active_appointment.date.isoformat(),
+            }) + f'?appointment={active_appointment.id}',
         }
 
     # سایر نوبت‌های آینده (بعد از نوبت فعال)
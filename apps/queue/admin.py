@@ -5,7 +5,7 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import QueueStatus, QueueLog, QueueAnnouncement
+from .models import QueueStatus, VisitDurationEstimate, QueueLog, QueueAnnouncement
 
 
 @admin.register(QueueStatus)
@@ -52,6 +52,18 @@ class QueueStatusAdmin(admin.ModelAdmin):
     doctor_name.short_description = 'پزشک'
 
 
+@admin.register(VisitDurationEstimate)
+class VisitDurationEstimateAdmin(admin.ModelAdmin):
+    """پنل ادمین تخمین مدت ویزیت"""
+    
+    list_display = ('doctor', 'hour', 'average_minutes', 'samples', 'updated_at')
+    list_filter = ('hour',)
+    search_fields = ('doctor__user__first_name', 'doctor__user__last_name')
+    ordering = ('doctor', 'hour')
+    readonly_fields = ('updated_at',)
+    raw_id_fields = ('doctor',)
+
+
 @admin.register(QueueLog)
 class QueueLogAdmin(admin.ModelAdmin):
     """پنل ادمین لاگ صف"""
@@ -9,3 +9,6 @@ class QueueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.queue'
     verbose_name = 'مدیریت صف زنده'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,73 @@
+"""
+WebSocket Consumer صف زنده - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+ws/queue/<doctor_id>/<clinic_id>/<YYYY-MM-DD>/?appointment=<id>
+"""
+
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .services import QueueService
+
+
+class QueueConsumer(AsyncJsonWebsocketConsumer):
+    """
+    مشترک صف زنده یک پزشک در یک مرکز و یک روز
+
+    کلاینت پس از اتصال یک snapshot دریافت می‌کند و بعد از آن فقط
+    هنگام تغییر وضعیت نوبت‌ها پیام queue.delta (فیلدهای تغییرکرده) می‌گیرد.
+    """
+
+    async def connect(self):
+        kwargs = self.scope['url_route']['kwargs']
+        try:
+            self.doctor_id = int(kwargs['doctor_id'])
+            self.clinic_id = int(kwargs['clinic_id']) or None
+            self.date = datetime.strptime(kwargs['date'], '%Y-%m-%d').date()
+        except (KeyError, ValueError):
+            await self.close()
+            return
+
+        self.group_name = QueueService.get_group_name(self.doctor_id, self.clinic_id, self.date)
+        self.my_time = await self.get_my_time()
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        snapshot = await database_sync_to_async(QueueService.build_snapshot)(
+            self.doctor_id, self.clinic_id, self.date
+        )
+        self.last_view = QueueService.build_view(snapshot, self.my_time)
+        await self.send_json(self.last_view)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def queue_update(self, event):
+        """پیام گروه: snapshot جدید صف (فقط تغییرات برای کلاینت ارسال می‌شود)"""
+        view = QueueService.build_view(event['snapshot'], self.my_time)
+        delta = QueueService.diff_view(self.last_view, view)
+        self.last_view = view
+        if delta:
+            await self.send_json(delta)
+
+    @database_sync_to_async
+    def get_my_time(self):
+        """ساعت نوبت بیمار متصل (فقط نوبت متعلق به خود کاربر)"""
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        return QueueService.get_patient_time(
+            self.scope.get('user'),
+            query.get('appointment', [''])[0],
+            self.doctor_id,
+            self.clinic_id,
+            self.date,
+        )
@@ -0,0 +1,208 @@
+"""
+دستور مدیریتی بنچمارک پخش وضعیت صف روی WebSocket - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+برنامه ASGI پروژه (config.asgi.application) داخل همین پروسه اجرا می‌شود،
+برای هر گروه صف N مشترک WebSocket باز می‌شود و با ارسال تغییرات صف در
+گروه‌ها این موارد اندازه‌گیری می‌شود:
+
+    - تأخیر رسیدن پیام به مشترکین (p50/p99)
+    - حافظه به ازای هر اتصال (tracemalloc)
+    - تعداد پیام تحویل‌شده در ثانیه در حالت انفجاری
+
+snapshot صف به‌صورت مصنوعی و بدون دیتابیس ساخته می‌شود تا فقط هزینه
+channel layer و consumer سنجیده شود. خروجی JSON شامل شناسه commit است
+تا نتایج commitهای مختلف قابل مقایسه باشند.
+
+استفاده:
+    python manage.py bench_queue_fanout
+    python manage.py bench_queue_fanout --groups 5 --subscribers 200 --transitions 50
+    python manage.py bench_queue_fanout --layer redis --output bench.jsonl
+"""
+
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.queue.services import QueueService
+
+
+class Command(BaseCommand):
+    help = 'بنچمارک تأخیر، حافظه و توان پخش وضعیت صف به مشترکین WebSocket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=1, help='تعداد گروه صف')
+        parser.add_argument('--subscribers', type=int, default=100, help='تعداد مشترک هر گروه')
+        parser.add_argument('--transitions', type=int, default=20, help='تعداد تغییر صف هر گروه')
+        parser.add_argument(
+            '--layer', choices=['memory', 'redis'], default='memory',
+            help='نوع channel layer (redis از REDIS_HOST/REDIS_PORT استفاده می‌کند)'
+        )
+        parser.add_argument('--timeout', type=float, default=10, help='حداکثر انتظار هر پیام (ثانیه)')
+        parser.add_argument('--output', help='افزودن نتیجه (JSON در یک خط) به این فایل')
+
+    def handle(self, *args, **options):
+        if options['groups'] < 1 or options['subscribers'] < 1 or options['transitions'] < 1:
+            raise CommandError('مقادیر باید مثبت باشند')
+
+        if options['layer'] == 'redis':
+            layers = {
+                'default': {
+                    'BACKEND': 'channels_redis.core.RedisChannelLayer',
+                    'CONFIG': {
+                        'hosts': [(settings.REDIS_HOST, settings.REDIS_PORT)],
+                        'capacity': options['transitions'] * 10,
+                    },
+                },
+            }
+        else:
+            layers = {
+                'default': {
+                    'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                    'CONFIG': {'capacity': options['transitions'] * 10},
+                },
+            }
+
+        with override_settings(CHANNEL_LAYERS=layers), \
+                mock.patch.object(QueueService, 'build_snapshot', side_effect=self._snapshot):
+            result = asyncio.run(self._run(options))
+
+        result.update({
+            'commit': self._git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'layer': options['layer'],
+            'groups': options['groups'],
+            'subscribers_per_group': options['subscribers'],
+            'transitions_per_group': options['transitions'],
+        })
+
+        line = json.dumps(result, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'a', encoding='utf-8') as handle:
+                handle.write(line + '\n')
+
+        self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f"p50={result['latency_p50_ms']}ms p99={result['latency_p99_ms']}ms "
+            f"memory/conn={result['memory_per_connection_kb']}KB "
+            f"throughput={result['messages_per_second']} msg/s"
+        ))
+
+    @staticmethod
+    def _snapshot(doctor_id, clinic_id, date, current_number=0):
+        """snapshot مصنوعی صف (بدون دیتابیس)"""
+        return {
+            'current_number': current_number,
+            'waiting_times': list(range(480, 480 + 20 * 15, 15)),
+            'total_day': 20,
+            'visited_count': current_number,
+            'slot_minutes': 15,
+            'version': current_number,
+        }
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    async def _run(self, options):
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from config.asgi import application
+
+        channel_layer = get_channel_layer()
+        today = date.today()
+        groups = [(doctor_id, 1, today) for doctor_id in range(1, options['groups'] + 1)]
+        timeout = options['timeout']
+
+        # اتصال مشترکین و اندازه‌گیری حافظه
+        tracemalloc.start()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        subscribers = {}
+        for doctor_id, clinic_id, day in groups:
+            subscribers[doctor_id] = []
+            for _ in range(options['subscribers']):
+                communicator = WebsocketCommunicator(
+                    application, f'/ws/queue/{doctor_id}/{clinic_id}/{day.isoformat()}/'
+                )
+                connected, _ = await communicator.connect(timeout=timeout)
+                if not connected:
+                    raise CommandError('اتصال WebSocket برقرار نشد')
+                await communicator.receive_json_from(timeout=timeout)
+                subscribers[doctor_id].append(communicator)
+        memory_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        connections_count = options['groups'] * options['subscribers']
+
+        async def publish(doctor_id, clinic_id, day, number):
+            await channel_layer.group_send(
+                QueueService.get_group_name(doctor_id, clinic_id, day),
+                {'type': 'queue.update', 'snapshot': self._snapshot(doctor_id, clinic_id, day, number)},
+            )
+
+        async def receive_all():
+            await asyncio.gather(*(
+                communicator.receive_json_from(timeout=timeout)
+                for group in subscribers.values()
+                for communicator in group
+            ))
+
+        # تأخیر: هر تغییر جداگانه ارسال و تا رسیدن به همه مشترکین صبر می‌شود
+        latencies = []
+
+        async def timed_receive(communicator, started):
+            await communicator.receive_json_from(timeout=timeout)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        number = 0
+        for _ in range(options['transitions']):
+            number += 1
+            for doctor_id, clinic_id, day in groups:
+                started = time.perf_counter()
+                await asyncio.gather(
+                    publish(doctor_id, clinic_id, day, number),
+                    *(timed_receive(c, started) for c in subscribers[doctor_id]),
+                )
+
+        # توان: همه تغییرات پشت‌سرهم ارسال و زمان تحویل کامل سنجیده می‌شود
+        started = time.perf_counter()
+        receivers = []
+        for _ in range(options['transitions']):
+            number += 1
+            for doctor_id, clinic_id, day in groups:
+                await publish(doctor_id, clinic_id, day, number)
+            receivers.append(receive_all())
+        for receiver in receivers:
+            await receiver
+        elapsed = time.perf_counter() - started
+        delivered = options['transitions'] * connections_count
+
+        for group in subscribers.values():
+            for communicator in group:
+                await communicator.disconnect()
+
+        latencies.sort()
+        return {
+            'connections': connections_count,
+            'latency_p50_ms': round(statistics.median(latencies), 3),
+            'latency_p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+            'memory_per_connection_kb': round((memory_after - memory_before) / connections_count / 1024, 2),
+            'messages_per_second': round(delivered / elapsed, 1) if elapsed else None,
+        }
@@ -0,0 +1,64 @@
+"""
+دستور مدیریتی برای بازسازی شمارنده‌های صف از روی نوبت‌ها - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+شمارنده‌های QueueStatus هنگام تغییر وضعیت نوبت به‌صورت افزایشی به‌روز
+می‌شوند؛ این دستور برای تطبیق دوره‌ای (مثلاً شبانه) یا پس از ویرایش
+مستقیم داده‌ها مقادیر را دوباره از جدول نوبت‌ها محاسبه می‌کند.
+
+استفاده:
+    python manage.py rebuild_queue_status
+    python manage.py rebuild_queue_status --date 2024-01-01 --days 7
+    python manage.py rebuild_queue_status --doctor 3 --clinic 1
+
+در صورت فعال بودن QUEUE_PROJECTION_ENABLED نمای Redis صف‌ها هم بازسازی می‌شود.
+"""
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from apps.queue.services import QueueProjection, QueueService
+
+
+class Command(BaseCommand):
+    help = 'بازسازی شمارنده‌های وضعیت صف (QueueStatus) از روی نوبت‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='تاریخ شروع (YYYY-MM-DD)، پیش‌فرض امروز')
+        parser.add_argument('--days', type=int, default=1, help='تعداد روزها از تاریخ شروع')
+        parser.add_argument('--doctor', type=int, help='شناسه پزشک')
+        parser.add_argument('--clinic', type=int, help='شناسه مرکز')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                start = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('فرمت تاریخ نامعتبر است (YYYY-MM-DD)')
+        else:
+            start = timezone.now().date()
+
+        days = max(options['days'], 1)
+        queues = Appointment.objects.filter(
+            date__gte=start,
+            date__lt=start + timedelta(days=days),
+            clinic__isnull=False
+        )
+        if options['doctor']:
+            queues = queues.filter(doctor_id=options['doctor'])
+        if options['clinic']:
+            queues = queues.filter(clinic_id=options['clinic'])
+
+        count = 0
+        for doctor_id, clinic_id, date in queues.values_list(
+            'doctor_id', 'clinic_id', 'date'
+        ).distinct().order_by():
+            QueueService.rebuild_status(doctor_id, clinic_id, date)
+            if QueueProjection.is_enabled():
+                QueueProjection.rebuild(doctor_id, clinic_id, date)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{count} صف بازسازی شد.'))
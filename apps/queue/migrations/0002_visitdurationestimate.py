@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_merge_20260206_0751'),
+        ('queue', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitDurationEstimate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='ساعت روز')),
+                ('average_minutes', models.FloatField(default=0, verbose_name='میانگین مدت ویزیت (دقیقه)')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='تعداد نمونه\u200cها')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visit_duration_estimates', to='doctors.doctor', verbose_name='پزشک')),
+            ],
+            options={
+                'verbose_name': 'تخمین مدت ویزیت',
+                'verbose_name_plural': 'تخمین\u200cهای مدت ویزیت',
+                'db_table': 'queue_visit_duration_estimate',
+                'ordering': ['doctor', 'hour'],
+                'unique_together': {('doctor', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue', '0002_visitdurationestimate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuestatus',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='نسخه'),
+        ),
+    ]
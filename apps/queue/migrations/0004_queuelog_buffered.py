@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue', '0003_queuestatus_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='queuelog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاریخ'),
+        ),
+        migrations.AddIndex(
+            model_name='queuelog',
+            index=models.Index(fields=['queue_status', 'created_at'], name='queue_log_queue_s_7169d3_idx'),
+        ),
+    ]
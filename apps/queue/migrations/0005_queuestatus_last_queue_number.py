@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:00
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_queue_number(apps, schema_editor):
+    """مقدار اولیه: بزرگ‌ترین شماره صف موجود هر (پزشک، مرکز، تاریخ)"""
+    QueueStatus = apps.get_model('queue', 'QueueStatus')
+    Appointment = apps.get_model('appointments', 'Appointment')
+    last_numbers = Appointment.objects.filter(
+        doctor_id=OuterRef('doctor_id'),
+        clinic_id=OuterRef('clinic_id'),
+        date=OuterRef('date'),
+    ).order_by().values('doctor_id').annotate(last=Max('queue_number')).values('last')
+    QueueStatus.objects.update(
+        last_queue_number=Coalesce(Subquery(last_numbers), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('queue', '0004_queuelog_buffered'),
+        ('appointments', '0002_appointment_insurance_type_appointment_service_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuestatus',
+            name='last_queue_number',
+            field=models.PositiveIntegerField(default=0, verbose_name='آخرین شماره صف'),
+        ),
+        migrations.RunPython(backfill_last_queue_number, migrations.RunPython.noop),
+    ]
@@ -5,6 +5,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class QueueStatus(models.Model):
@@ -66,6 +67,18 @@ class QueueStatus(models.Model):
         verbose_name='تخمین زمان انتظار (دقیقه)'
     )
     
+    # آخرین شماره صف تخصیص‌یافته (فقط افزایشی؛ شماره نوبت‌های لغوشده تکرار نمی‌شود)
+    last_queue_number = models.PositiveIntegerField(
+        default=0,
+        verbose_name='آخرین شماره صف'
+    )
+    
+    # نسخه (با هر تغییر صف یک واحد افزایش می‌یابد؛ شناسه رویدادهای SSE)
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='نسخه'
+    )
+    
     # وضعیت پزشک
     is_doctor_available = models.BooleanField(
         default=True,
@@ -108,7 +121,45 @@ class QueueStatus(models.Model):
         """محاسبه تخمین زمان انتظار"""
         ahead = self.get_ahead_count(queue_number)
         avg_duration = self.average_visit_duration or self.doctor.visit_duration
-        return ahead * avg_duration
+        return ahead * (avg_duration + self.doctor.gap_between_visits)
+
+
+class VisitDurationEstimate(models.Model):
+    """
+    مدل تخمین برخط مدت ویزیت (میانگین متحرک نمایی به ازای پزشک و ساعت روز)
+    """
+
+    doctor = models.ForeignKey(
+        'doctors.Doctor',
+        on_delete=models.CASCADE,
+        related_name='visit_duration_estimates',
+        verbose_name='پزشک'
+    )
+    hour = models.PositiveSmallIntegerField(
+        verbose_name='ساعت روز'
+    )
+    average_minutes = models.FloatField(
+        default=0,
+        verbose_name='میانگین مدت ویزیت (دقیقه)'
+    )
+    samples = models.PositiveIntegerField(
+        default=0,
+        verbose_name='تعداد نمونه‌ها'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='آخرین بروزرسانی'
+    )
+
+    class Meta:
+        db_table = 'queue_visit_duration_estimate'
+        verbose_name = 'تخمین مدت ویزیت'
+        verbose_name_plural = 'تخمین‌های مدت ویزیت'
+        unique_together = ['doctor', 'hour']
+        ordering = ['doctor', 'hour']
+
+    def __str__(self):
+        return f"{self.doctor} - {self.hour}:00 - {self.average_minutes:.1f}"
 
 
 class QueueLog(models.Model):
@@ -156,8 +207,9 @@ class QueueLog(models.Model):
         null=True,
         verbose_name='یادداشت'
     )
+    # زمان رویداد (نه زمان ذخیره؛ لاگ‌ها با تأخیر و دسته‌ای ذخیره می‌شوند)
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
         verbose_name='تاریخ'
     )
     
@@ -166,6 +218,9 @@ class QueueLog(models.Model):
         verbose_name = 'لاگ صف'
         verbose_name_plural = 'لاگ‌های صف'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['queue_status', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.queue_status} - {self.get_action_display()}"
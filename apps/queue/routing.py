@@ -1,11 +1,16 @@
 """
 WebSocket routing for Queue app
-این فایل در فاز 5 (نوبت‌دهی و صف زنده) تکمیل خواهد شد
+مسیرهای WebSocket صف زنده
 """
 
 from django.urls import re_path
 
-# WebSocket URL patterns (will be completed in Phase 5)
+from .consumers import QueueConsumer
+
+# WebSocket URL patterns
 websocket_urlpatterns = [
-    # مثال: re_path(r'ws/queue/(?P<queue_id>\w+)/$', QueueConsumer.as_asgi()),
+    re_path(
+        r'ws/queue/(?P<doctor_id>\d+)/(?P<clinic_id>\d+)/(?P<date>\d{4}-\d{2}-\d{2})/$',
+        QueueConsumer.as_asgi()
+    ),
 ]
@@ -0,0 +1,13 @@
+"""
+سرویس‌های اپلیکیشن صف زنده - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from .queue_service import QueueService
+from .board_service import ClinicBoardService
+from .broadcast_service import QueueBroadcaster
+from .duration_service import VisitDurationService
+from .log_service import QueueLogService
+from .projection_service import QueueProjection
+
+__all__ = ['QueueService', 'ClinicBoardService', 'QueueBroadcaster', 'VisitDurationService', 'QueueLogService', 'QueueProjection']
@@ -0,0 +1,119 @@
+"""
+سرویس تابلوی اتاق انتظار مرکز - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+تابلوی هر مرکز شماره فعلی صف همه پزشکان و اعلان‌های فعال را نشان می‌دهد.
+ETag تابلو از نسخه سطرهای QueueStatus و نسخه اعلان‌ها ساخته می‌شود تا
+صفحه‌های نمایش که مرتب درخواست می‌دهند در اغلب موارد پاسخ 304 بگیرند.
+لیست اعلان‌ها تا تغییر بعدی (سیگنال‌های QueueAnnouncement) در کش می‌ماند.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from ..models import QueueAnnouncement, QueueStatus
+
+
+class ClinicBoardService:
+    """
+    سرویس داده و ETag تابلوی صف مرکز
+    """
+
+    ANNOUNCEMENT_VERSION_KEY = 'queue:announcements:version'
+
+    # مدت نگهداری لیست اعلان‌های هر مرکز/روز در کش (ثانیه)
+    ANNOUNCEMENT_TIMEOUT = 24 * 60 * 60
+
+    @staticmethod
+    def get_announcement_version():
+        """نسخه فعلی اعلان‌ها (با هر تغییر اعلان عوض می‌شود)"""
+        version = cache.get(ClinicBoardService.ANNOUNCEMENT_VERSION_KEY)
+        if version is None:
+            cache.add(ClinicBoardService.ANNOUNCEMENT_VERSION_KEY, int(time.time() * 1000), None)
+            version = cache.get(ClinicBoardService.ANNOUNCEMENT_VERSION_KEY)
+        return version
+
+    @staticmethod
+    def invalidate_announcements():
+        """باطل کردن همه لیست‌های کش‌شده اعلان‌ها"""
+        try:
+            cache.incr(ClinicBoardService.ANNOUNCEMENT_VERSION_KEY)
+        except ValueError:
+            cache.set(ClinicBoardService.ANNOUNCEMENT_VERSION_KEY, int(time.time() * 1000), None)
+
+    @staticmethod
+    def get_announcements(clinic_id, date):
+        """
+        اعلان‌های فعال یک مرکز در یک روز (سراسری، مرکز یا پزشکان مرکز)
+
+        Returns:
+            list[dict]: اعلان‌ها به ترتیب اولویت
+        """
+        version = ClinicBoardService.get_announcement_version()
+        key = f'queue:announcements:{clinic_id}:{date:%Y%m%d}:{version}'
+        announcements = cache.get(key)
+        if announcements is None:
+            announcements = list(QueueAnnouncement.objects.filter(
+                Q(is_global=True)
+                | Q(clinic_id=clinic_id)
+                | Q(clinic__isnull=True, doctor__clinics__clinic_id=clinic_id),
+                Q(start_date__isnull=True) | Q(start_date__lte=date),
+                Q(end_date__isnull=True) | Q(end_date__gte=date),
+                is_active=True,
+            ).distinct().order_by('-priority', '-created_at').values(
+                'id', 'message', 'priority', 'doctor_id'
+            ))
+            cache.set(key, announcements, ClinicBoardService.ANNOUNCEMENT_TIMEOUT)
+        return announcements
+
+    @staticmethod
+    def get_etag(clinic_id, date):
+        """
+        ETag تابلو از نسخه صف‌های مرکز و نسخه اعلان‌ها (یک کوئری سبک)
+        """
+        versions = QueueStatus.objects.filter(
+            clinic_id=clinic_id,
+            date=date,
+        ).order_by('doctor_id').values_list('doctor_id', 'version')
+        raw = f'{clinic_id}:{date}:{list(versions)}:{ClinicBoardService.get_announcement_version()}'
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @staticmethod
+    def get_board(clinic_id, date):
+        """
+        داده تابلو: صف همه پزشکان مرکز با یک کوئری به همراه اعلان‌ها
+
+        Returns:
+            dict: {'date', 'queues': [...], 'announcements': [...]}
+        """
+        rows = QueueStatus.objects.filter(
+            clinic_id=clinic_id,
+            date=date,
+        ).order_by('doctor__user__last_name').values(
+            'doctor_id', 'doctor__user__first_name', 'doctor__user__last_name',
+            'doctor__specialization', 'current_queue_number', 'remaining_appointments',
+            'completed_appointments', 'estimated_wait_time', 'is_doctor_available',
+            'doctor_break_until', 'version',
+        )
+
+        queues = [{
+            'doctor_id': row['doctor_id'],
+            'doctor_name': f"دکتر {row['doctor__user__first_name']} {row['doctor__user__last_name']}",
+            'specialization': row['doctor__specialization'],
+            'current_number': row['current_queue_number'],
+            'remaining': row['remaining_appointments'],
+            'visited': row['completed_appointments'],
+            'estimated_wait_minutes': row['estimated_wait_time'],
+            'is_available': row['is_doctor_available'],
+            'break_until': row['doctor_break_until'].strftime('%H:%M') if row['doctor_break_until'] else None,
+            'version': row['version'],
+        } for row in rows]
+
+        return {
+            'date': date.isoformat(),
+            'queues': queues,
+            'announcements': ClinicBoardService.get_announcements(clinic_id, date),
+        }
@@ -0,0 +1,103 @@
+"""
+سرویس انتشار تجمیعی وضعیت صف - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+تغییرات پشت‌سرهم یک صف (مثلاً ثبت حضور چند بیمار توسط منشی) در یک
+پنجره زمانی کوتاه جمع می‌شوند و در پایان پنجره فقط یک snapshot در گروه
+channel layer منتشر می‌شود. تجمیع در سطح هر پروسه انجام می‌شود.
+"""
+
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class QueueBroadcaster:
+    """
+    انتشار تجمیع‌شده و با نرخ محدود snapshot صف‌ها
+    """
+
+    # طول پنجره تجمیع (ثانیه)؛ صفر یعنی انتشار فوری
+    WINDOW = getattr(settings, 'QUEUE_BROADCAST_WINDOW_MS', 300) / 1000
+
+    _lock = threading.Lock()
+    _pending = set()
+
+    @staticmethod
+    def schedule(doctor_id, clinic_id, date):
+        """
+        ثبت تغییر یک صف؛ اگر انتشار این صف در پنجره جاری زمان‌بندی شده
+        باشد تغییر با همان انتشار ارسال می‌شود.
+        """
+        key = (doctor_id, clinic_id, date)
+        if QueueBroadcaster.WINDOW <= 0:
+            QueueBroadcaster.send(*key)
+            QueueBroadcaster.dispatch_alerts(*key)
+            return
+
+        with QueueBroadcaster._lock:
+            if key in QueueBroadcaster._pending:
+                return
+            QueueBroadcaster._pending.add(key)
+
+        timer = threading.Timer(QueueBroadcaster.WINDOW, QueueBroadcaster._flush, args=(key,))
+        timer.daemon = True
+        timer.start()
+
+    @staticmethod
+    def _flush(key):
+        """پایان پنجره: ساخت snapshot فعلی و انتشار یک‌باره آن"""
+        with QueueBroadcaster._lock:
+            QueueBroadcaster._pending.discard(key)
+        try:
+            QueueBroadcaster.send(*key)
+            QueueBroadcaster.dispatch_alerts(*key)
+        finally:
+            # اتصال دیتابیس این thread بسته شود
+            connections.close_all()
+
+    @staticmethod
+    def dispatch_alerts(doctor_id, clinic_id, date):
+        """
+        ایجاد پیامک‌های «نوبت شما نزدیک است» برای همین صف
+
+        در thread پنجره تجمیع اجرا می‌شود، نه در thread درخواست (مگر با
+        پنجره صفر که انتشار هم فوری است).
+        """
+        from apps.notifications.services import QueueAlertService
+
+        if date != timezone.localdate():
+            return
+        try:
+            QueueAlertService.dispatch(date, doctor_id=doctor_id, clinic_id=clinic_id)
+        except Exception:
+            logger.warning('ایجاد پیامک‌های صف ناموفق بود', exc_info=True)
+
+    @staticmethod
+    def send(doctor_id, clinic_id, date):
+        """
+        ساخت snapshot و ارسال آن در گروه صف
+
+        خطای channel layer (مثلاً قطع بودن Redis) فقط ثبت می‌شود.
+        """
+        # import داخلی برای جلوگیری از وابستگی چرخشی
+        from .queue_service import QueueService
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            snapshot = QueueService.build_snapshot(doctor_id, clinic_id, date)
+            async_to_sync(channel_layer.group_send)(
+                QueueService.get_group_name(doctor_id, clinic_id, date),
+                {'type': 'queue.update', 'snapshot': snapshot}
+            )
+        except Exception:
+            logger.warning('انتشار وضعیت صف ناموفق بود', exc_info=True)
@@ -0,0 +1,106 @@
+"""
+سرویس تخمین مدت ویزیت - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+مدت هر ویزیت (از visit_started_at تا visited_at) در پایان ویزیت وارد یک
+میانگین متحرک نمایی به ازای (پزشک، ساعت روز) می‌شود. بروزرسانی با یک
+UPDATE اتمیک و بدون خواندن سوابق انجام می‌شود و نتیجه در
+QueueStatus.average_visit_duration صف همان روز ذخیره می‌شود.
+"""
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from ..models import QueueStatus, VisitDurationEstimate
+
+
+class VisitDurationService:
+    """
+    سرویس میانگین متحرک نمایی مدت ویزیت
+    """
+
+    # ضریب هموارسازی (وزن نمونه جدید)
+    ALPHA = getattr(settings, 'QUEUE_DURATION_EWMA_ALPHA', 0.2)
+
+    # حداقل نمونه لازم پیش از جایگزینی مقدار تنظیم‌شده پزشک
+    MIN_SAMPLES = getattr(settings, 'QUEUE_DURATION_MIN_SAMPLES', 3)
+
+    # نمونه‌های خارج از این بازه (دقیقه) نادیده گرفته می‌شوند
+    MAX_MINUTES = 180
+
+    @staticmethod
+    def get_hour(value):
+        """ساعت روز (به وقت محلی) برای یک زمان"""
+        return timezone.localtime(value).hour
+
+    @staticmethod
+    def get_estimate(doctor_id, hour):
+        """
+        تخمین فعلی مدت ویزیت پزشک در یک ساعت روز
+
+        Returns:
+            int: دقیقه (۰ اگر نمونه کافی وجود نداشته باشد)
+        """
+        row = VisitDurationEstimate.objects.filter(
+            doctor_id=doctor_id,
+            hour=hour,
+        ).values_list('average_minutes', 'samples').first()
+        if not row or row[1] < VisitDurationService.MIN_SAMPLES:
+            return 0
+        return max(1, round(row[0]))
+
+    @staticmethod
+    def record_visit(appointment):
+        """
+        ثبت مدت یک ویزیت پایان‌یافته و بروزرسانی QueueStatus صف آن
+
+        در نمونه‌های اول (کمتر از 1/ALPHA) میانگین ساده محاسبه می‌شود تا
+        مقدار اولیه صفر تخمین را به سمت پایین نکشد.
+
+        Args:
+            appointment (Appointment): نوبت با visit_started_at و visited_at
+
+        Returns:
+            int|None: تخمین جدید (دقیقه) یا None اگر نمونه معتبر نبود
+        """
+        if not appointment.visit_started_at or not appointment.visited_at:
+            return None
+
+        minutes = (appointment.visited_at - appointment.visit_started_at).total_seconds() / 60
+        if minutes <= 0 or minutes > VisitDurationService.MAX_MINUTES:
+            return None
+
+        hour = VisitDurationService.get_hour(appointment.visit_started_at)
+        VisitDurationEstimate.objects.get_or_create(doctor_id=appointment.doctor_id, hour=hour)
+
+        alpha = VisitDurationService.ALPHA
+        weight = Case(
+            When(
+                samples__lt=round(1 / alpha),
+                then=Value(1.0) / Cast(F('samples') + 1, FloatField()),
+            ),
+            default=Value(alpha),
+            output_field=FloatField(),
+        )
+        VisitDurationEstimate.objects.filter(
+            doctor_id=appointment.doctor_id,
+            hour=hour,
+        ).update(
+            average_minutes=F('average_minutes') + weight * (Value(minutes) - F('average_minutes')),
+            samples=F('samples') + 1,
+        )
+
+        estimate = VisitDurationService.get_estimate(appointment.doctor_id, hour)
+        if estimate and appointment.clinic_id is not None:
+            gap = appointment.doctor.gap_between_visits
+            QueueStatus.objects.filter(
+                doctor_id=appointment.doctor_id,
+                clinic_id=appointment.clinic_id,
+                date=appointment.date,
+            ).update(
+                average_visit_duration=estimate,
+                estimated_wait_time=F('remaining_appointments') * (estimate + gap),
+            )
+        return estimate or None
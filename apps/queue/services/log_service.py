@@ -0,0 +1,166 @@
+"""
+سرویس لاگ بافرشده صف - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+رویدادهای صف (فراخوانی، پایان ویزیت، رد شدن و ...) به‌جای INSERT همزمان
+در هر درخواست، در حافظه پروسه جمع می‌شوند و با bulk_create ذخیره می‌شوند:
+
+    - با رسیدن تعداد به QUEUE_LOG_BUFFER_SIZE
+    - حداکثر QUEUE_LOG_FLUSH_SECONDS ثانیه پس از اولین رویداد بافر
+    - هنگام خروج پروسه (atexit)
+
+در صورت خطای دیتابیس رویدادها به بافر برمی‌گردند و در flush بعدی دوباره
+ارسال می‌شوند (حداقل یک بار). با کشته شدن ناگهانی پروسه، رویدادهای
+ذخیره‌نشده همان بافر از دست می‌روند.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import QueueLog, QueueStatus
+
+logger = logging.getLogger(__name__)
+
+
+class QueueLogService:
+    """
+    ثبت بافرشده و خواندن لاگ صف
+    """
+
+    BUFFER_SIZE = getattr(settings, 'QUEUE_LOG_BUFFER_SIZE', 50)
+    FLUSH_SECONDS = getattr(settings, 'QUEUE_LOG_FLUSH_SECONDS', 5)
+
+    # سقف بافر هنگام در دسترس نبودن دیتابیس (قدیمی‌ترها حذف می‌شوند)
+    MAX_BUFFER = BUFFER_SIZE * 20
+
+    _lock = threading.Lock()
+    _buffer = []
+    _timer = None
+
+    @staticmethod
+    def log(doctor_id, clinic_id, date, action, appointment_id=None, performed_by_id=None, notes=None):
+        """
+        افزودن یک رویداد به بافر (بدون کوئری)
+
+        Args:
+            doctor_id, clinic_id, date: کلید صف
+            action (str): یکی از QueueLog.ACTION_CHOICES
+            appointment_id (int|None): نوبت مربوط
+            performed_by_id (int|None): کاربر انجام‌دهنده
+            notes (str|None): یادداشت
+        """
+        if clinic_id is None:
+            # QueueStatus فقط برای صف‌های دارای مرکز وجود دارد
+            return
+
+        entry = {
+            'key': (doctor_id, clinic_id, date),
+            'action': action,
+            'appointment_id': appointment_id,
+            'performed_by_id': performed_by_id,
+            'notes': notes,
+            'created_at': timezone.now(),
+        }
+        with QueueLogService._lock:
+            QueueLogService._buffer.append(entry)
+            size = len(QueueLogService._buffer)
+            if size < QueueLogService.BUFFER_SIZE:
+                QueueLogService._schedule()
+
+        if size >= QueueLogService.BUFFER_SIZE:
+            QueueLogService.flush()
+
+    @staticmethod
+    def _schedule():
+        """زمان‌بندی flush بعدی (باید با قفل گرفته‌شده صدا زده شود)"""
+        if QueueLogService._timer is None:
+            QueueLogService._timer = threading.Timer(
+                QueueLogService.FLUSH_SECONDS, QueueLogService._flush_from_timer
+            )
+            QueueLogService._timer.daemon = True
+            QueueLogService._timer.start()
+
+    @staticmethod
+    def _flush_from_timer():
+        """flush زمان‌بندی‌شده (در thread جداگانه)"""
+        try:
+            QueueLogService.flush()
+        finally:
+            # اتصال دیتابیس این thread بسته شود
+            connections.close_all()
+
+    @staticmethod
+    def flush():
+        """
+        ذخیره همه رویدادهای بافر با یک کوئری خواندن و یک bulk_create
+
+        Returns:
+            int: تعداد رکوردهای ذخیره‌شده
+        """
+        with QueueLogService._lock:
+            entries = QueueLogService._buffer
+            QueueLogService._buffer = []
+            if QueueLogService._timer is not None:
+                QueueLogService._timer.cancel()
+                QueueLogService._timer = None
+        if not entries:
+            return 0
+
+        try:
+            keys = {entry['key'] for entry in entries}
+            condition = Q()
+            for doctor_id, clinic_id, date in keys:
+                condition |= Q(doctor_id=doctor_id, clinic_id=clinic_id, date=date)
+            status_ids = {
+                (doctor_id, clinic_id, date): pk
+                for pk, doctor_id, clinic_id, date in QueueStatus.objects.filter(condition).values_list(
+                    'id', 'doctor_id', 'clinic_id', 'date'
+                )
+            }
+
+            logs = [
+                QueueLog(
+                    queue_status_id=status_ids[entry['key']],
+                    action=entry['action'],
+                    appointment_id=entry['appointment_id'],
+                    performed_by_id=entry['performed_by_id'],
+                    notes=entry['notes'],
+                    created_at=entry['created_at'],
+                )
+                for entry in entries
+                if entry['key'] in status_ids
+            ]
+            QueueLog.objects.bulk_create(logs)
+            return len(logs)
+        except Exception:
+            logger.warning('ذخیره لاگ صف ناموفق بود؛ رویدادها دوباره تلاش می‌شوند', exc_info=True)
+            with QueueLogService._lock:
+                QueueLogService._buffer = (entries + QueueLogService._buffer)[-QueueLogService.MAX_BUFFER:]
+                QueueLogService._schedule()
+            return 0
+
+    @staticmethod
+    def get_timeline(doctor_id, clinic_id, date):
+        """
+        خط زمانی رویدادهای صف یک روز (یک کوئری روی ایندکس صف/زمان)
+
+        Returns:
+            list[dict]: رویدادها به ترتیب زمان
+        """
+        return list(QueueLog.objects.filter(
+            queue_status__doctor_id=doctor_id,
+            queue_status__clinic_id=clinic_id,
+            queue_status__date=date,
+        ).order_by('created_at', 'id').values(
+            'id', 'action', 'appointment_id', 'appointment__queue_number',
+            'performed_by_id', 'notes', 'created_at',
+        ))
+
+
+atexit.register(QueueLogService.flush)
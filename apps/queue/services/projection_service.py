@@ -0,0 +1,197 @@
+"""
+سرویس نمای Redis صف - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+برای هر صف (پزشک، مرکز، تاریخ) دو sorted set در Redis نگه داشته می‌شود:
+
+    waiting:   نوبت‌های در انتظار با امتیاز ساعت نوبت (برای تعداد نفرات جلوتر)
+    callable:  نوبت‌های تأییدشده/حاضر با امتیاز شماره صف (برای نفر بعدی)
+
+هر دو با ZCOUNT/ZRANGE در O(log n) خوانده می‌شوند. کلید ready نشان
+می‌دهد نما کامل ساخته شده است؛ در نبود آن نما از دیتابیس بازسازی
+می‌شود. این قابلیت اختیاری است (QUEUE_PROJECTION_ENABLED) و در صورت
+غیرفعال بودن یا خطای Redis، فراخواننده به کوئری دیتابیس برمی‌گردد.
+"""
+
+import logging
+
+from django.conf import settings
+
+from apps.appointments.models import Appointment
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class QueueProjection:
+    """
+    نمای sorted set صف روزانه در Redis
+    """
+
+    KEY_PREFIX = 'noban:queue'
+
+    # نما پس از این مدت (ثانیه) منقضی و در صورت نیاز دوباره ساخته می‌شود
+    TTL = 2 * 24 * 60 * 60
+
+    # وضعیت‌های داخل هر sorted set
+    WAITING_STATUSES = ['pending', 'confirmed', 'arrived', 'in_progress']
+    CALLABLE_STATUSES = ['confirmed', 'arrived']
+
+    _client = None
+
+    @staticmethod
+    def is_enabled():
+        """فعال بودن نمای Redis"""
+        return redis is not None and getattr(settings, 'QUEUE_PROJECTION_ENABLED', False)
+
+    @staticmethod
+    def get_client():
+        """اتصال Redis (یک بار ساخته می‌شود)"""
+        if QueueProjection._client is None:
+            QueueProjection._client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=getattr(settings, 'QUEUE_PROJECTION_REDIS_DB', 1),
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            )
+        return QueueProjection._client
+
+    @staticmethod
+    def get_keys(doctor_id, clinic_id, date):
+        """کلیدهای (waiting, callable, ready) یک صف"""
+        base = f'{QueueProjection.KEY_PREFIX}:{doctor_id}:{clinic_id or 0}:{date:%Y%m%d}'
+        return f'{base}:waiting', f'{base}:callable', f'{base}:ready'
+
+    @staticmethod
+    def _minutes(value):
+        """ساعت نوبت به دقیقه از ابتدای روز"""
+        return value.hour * 60 + value.minute
+
+    @staticmethod
+    def _waiting_score(time, queue_number):
+        """امتیاز مرتب‌سازی بر اساس ساعت (و سپس شماره صف)"""
+        return QueueProjection._minutes(time) * 10000 + (queue_number or 0)
+
+    @staticmethod
+    def _callable_score(time, queue_number):
+        """امتیاز مرتب‌سازی بر اساس شماره صف (و سپس ساعت)"""
+        return (queue_number or 0) * 1440 + QueueProjection._minutes(time)
+
+    @staticmethod
+    def rebuild(doctor_id, clinic_id, date, client=None):
+        """
+        ساخت کامل نمای یک صف از روی دیتابیس (یک کوئری)
+        """
+        client = client or QueueProjection.get_client()
+        waiting_key, callable_key, ready_key = QueueProjection.get_keys(doctor_id, clinic_id, date)
+
+        rows = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+            status__in=QueueProjection.WAITING_STATUSES,
+        ).values_list('id', 'time', 'queue_number', 'status')
+
+        waiting = {}
+        callable_ = {}
+        for appointment_id, time, queue_number, status in rows:
+            waiting[appointment_id] = QueueProjection._waiting_score(time, queue_number)
+            if status in QueueProjection.CALLABLE_STATUSES:
+                callable_[appointment_id] = QueueProjection._callable_score(time, queue_number)
+
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(waiting_key, callable_key)
+        if waiting:
+            pipe.zadd(waiting_key, waiting)
+            pipe.expire(waiting_key, QueueProjection.TTL)
+        if callable_:
+            pipe.zadd(callable_key, callable_)
+            pipe.expire(callable_key, QueueProjection.TTL)
+        pipe.set(ready_key, 1, ex=QueueProjection.TTL)
+        pipe.execute()
+
+    @staticmethod
+    def _ensure(client, doctor_id, clinic_id, date):
+        """بازسازی نما در صورت نبودن (miss)"""
+        ready_key = QueueProjection.get_keys(doctor_id, clinic_id, date)[2]
+        if not client.exists(ready_key):
+            QueueProjection.rebuild(doctor_id, clinic_id, date, client=client)
+
+    @staticmethod
+    def apply(appointment):
+        """
+        اعمال وضعیت فعلی یک نوبت در نما
+
+        نمای ناقص (بدون کلید ready) هم بروز می‌شود؛ در اولین خواندن
+        به‌طور کامل بازسازی خواهد شد.
+        """
+        if not QueueProjection.is_enabled():
+            return
+        waiting_key, callable_key, _ = QueueProjection.get_keys(
+            appointment.doctor_id, appointment.clinic_id, appointment.date
+        )
+        member = appointment.id
+        try:
+            pipe = QueueProjection.get_client().pipeline(transaction=True)
+            if appointment.status in QueueProjection.WAITING_STATUSES:
+                pipe.zadd(waiting_key, {
+                    member: QueueProjection._waiting_score(appointment.time, appointment.queue_number)
+                })
+                pipe.expire(waiting_key, QueueProjection.TTL)
+            else:
+                pipe.zrem(waiting_key, member)
+            if appointment.status in QueueProjection.CALLABLE_STATUSES:
+                pipe.zadd(callable_key, {
+                    member: QueueProjection._callable_score(appointment.time, appointment.queue_number)
+                })
+                pipe.expire(callable_key, QueueProjection.TTL)
+            else:
+                pipe.zrem(callable_key, member)
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning('بروزرسانی نمای Redis صف ناموفق بود', exc_info=True)
+
+    @staticmethod
+    def get_ahead_count(doctor_id, clinic_id, date, time):
+        """
+        تعداد نوبت‌های در انتظار با ساعت کمتر از time
+
+        Returns:
+            int|None: None اگر نما در دسترس نباشد
+        """
+        if not QueueProjection.is_enabled():
+            return None
+        try:
+            client = QueueProjection.get_client()
+            QueueProjection._ensure(client, doctor_id, clinic_id, date)
+            waiting_key = QueueProjection.get_keys(doctor_id, clinic_id, date)[0]
+            bound = QueueProjection._minutes(time) * 10000
+            return client.zcount(waiting_key, '-inf', f'({bound}')
+        except redis.RedisError:
+            logger.warning('خواندن نمای Redis صف ناموفق بود', exc_info=True)
+            return None
+
+    @staticmethod
+    def get_next_id(doctor_id, clinic_id, date):
+        """
+        شناسه نوبت بعدی برای فراخوانی (کمترین شماره صف تأییدشده/حاضر)
+
+        Returns:
+            tuple: (در دسترس بودن نما, شناسه نوبت یا None)
+        """
+        if not QueueProjection.is_enabled():
+            return False, None
+        try:
+            client = QueueProjection.get_client()
+            QueueProjection._ensure(client, doctor_id, clinic_id, date)
+            callable_key = QueueProjection.get_keys(doctor_id, clinic_id, date)[1]
+            members = client.zrange(callable_key, 0, 0)
+        except redis.RedisError:
+            logger.warning('خواندن نمای Redis صف ناموفق بود', exc_info=True)
+            return False, None
+        return True, (int(members[0]) if members else None)
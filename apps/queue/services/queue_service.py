@@ -0,0 +1,547 @@
+"""
+سرویس صف زنده - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+هر صف با کلید (پزشک، مرکز، تاریخ) مشخص می‌شود و همه کلاینت‌های آن صف
+در یک گروه channel layer عضو هستند. با هر تغییر وضعیت نوبت فقط یک
+snapshot ساخته و یک بار در گروه منتشر می‌شود.
+
+شمارنده‌های QueueStatus در همان تراکنش تغییر وضعیت و با F() به‌صورت
+اتمیک بروزرسانی می‌شوند تا صفحات صف فقط یک سطر را بخوانند.
+"""
+
+from bisect import bisect_left
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from apps.appointments.services import TimeSlotService, WaitlistService
+from apps.doctors.models import Doctor
+from ..models import QueueStatus
+from .broadcast_service import QueueBroadcaster
+from .duration_service import VisitDurationService
+from .log_service import QueueLogService
+from .projection_service import QueueProjection
+
+
+class QueueService:
+    """
+    سرویس ساخت و انتشار وضعیت صف زنده
+    """
+
+    # وضعیت‌هایی که در صف انتظار حساب می‌شوند
+    WAITING_STATUSES = ['pending', 'confirmed', 'arrived', 'in_progress']
+
+    # نگاشت (وضعیت قبلی، وضعیت جدید) به عملیات QueueLog؛ None یعنی هر وضعیت
+    LOG_ACTIONS = {
+        ('in_progress', 'visited'): 'complete',
+        (None, 'in_progress'): 'call_next',
+        (None, 'no_show'): 'skip',
+    }
+
+    @staticmethod
+    def get_group_name(doctor_id, clinic_id, date):
+        """
+        نام گروه channel layer برای یک صف
+
+        Args:
+            doctor_id (int): شناسه پزشک
+            clinic_id (int|None): شناسه مرکز
+            date (date): تاریخ صف
+
+        Returns:
+            str: نام گروه (فقط حروف مجاز channels)
+        """
+        return f'queue_{doctor_id}_{clinic_id or 0}_{date:%Y%m%d}'
+
+    @staticmethod
+    def _bucket_deltas(old_status, new_status):
+        """
+        تغییر شمارنده‌ها برای یک انتقال وضعیت
+
+        Returns:
+            tuple: (تغییر remaining, تغییر completed)
+        """
+        def bucket(status):
+            if status in QueueService.WAITING_STATUSES:
+                return 1, 0
+            if status == 'visited':
+                return 0, 1
+            return 0, 0
+
+        old_remaining, old_completed = bucket(old_status)
+        new_remaining, new_completed = bucket(new_status)
+        return new_remaining - old_remaining, new_completed - old_completed
+
+    @staticmethod
+    def _add(field, delta):
+        """
+        عبارت F() برای افزایش/کاهش اتمیک یک شمارنده بدون منفی شدن
+        (ستون‌های PositiveIntegerField در MySQL بدون علامت هستند)
+        """
+        if delta >= 0:
+            return F(field) + delta
+        return Case(
+            When(**{f'{field}__gte': -delta}, then=F(field) + delta),
+            default=Value(0),
+        )
+
+    @staticmethod
+    def _compute_status_values(doctor_id, clinic_id, date):
+        """محاسبه شمارنده‌های صف مستقیماً از روی نوبت‌ها"""
+        stats = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+        ).aggregate(
+            remaining=Count('id', filter=Q(status__in=QueueService.WAITING_STATUSES)),
+            completed=Count('id', filter=Q(status='visited')),
+            last_number=Max('queue_number'),
+        )
+        current = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+            status='in_progress',
+        ).only('id', 'queue_number').order_by('time').first()
+
+        values = {
+            'total_appointments': stats['remaining'] + stats['completed'],
+            'completed_appointments': stats['completed'],
+            'remaining_appointments': stats['remaining'],
+            'current_appointment': current,
+            'current_queue_number': (current.queue_number or 0) if current else 0,
+            'last_queue_number': stats['last_number'] or 0,
+        }
+
+        # تخمین برخط مدت ویزیت برای صف امروز
+        if date == timezone.localdate():
+            estimate = VisitDurationService.get_estimate(
+                doctor_id, VisitDurationService.get_hour(timezone.now())
+            )
+            if estimate:
+                values['average_visit_duration'] = estimate
+        return values
+
+    @staticmethod
+    def rebuild_status(doctor_id, clinic_id, date):
+        """
+        محاسبه مجدد کامل سطر QueueStatus از روی نوبت‌ها (برای رفع انحراف)
+
+        اگر نوبت‌ها مرکز نداشته باشند سطر ذخیره نمی‌شود و فقط نمونه
+        محاسبه‌شده برگردانده می‌شود.
+
+        Returns:
+            QueueStatus: سطر بروزشده
+        """
+        values = QueueService._compute_status_values(doctor_id, clinic_id, date)
+        if not values['current_appointment']:
+            # شماره آخرین نفر فراخوانده‌شده حفظ می‌شود
+            values.pop('current_queue_number')
+        # شمارنده تخصیص شماره صف هرگز کاهش نمی‌یابد
+        last_queue_number = values.pop('last_queue_number')
+
+        if clinic_id is None:
+            queue_status = QueueStatus(doctor_id=doctor_id, clinic_id=None, date=date, **values)
+        else:
+            queue_status, _ = QueueStatus.objects.update_or_create(
+                doctor_id=doctor_id,
+                clinic_id=clinic_id,
+                date=date,
+                defaults=values,
+            )
+
+        queue_status.estimated_wait_time = (
+            queue_status.remaining_appointments * QueueService.get_average_duration(queue_status)
+        )
+        if queue_status.pk:
+            queue_status.save(update_fields=['estimated_wait_time'])
+            QueueStatus.objects.filter(pk=queue_status.pk).update(
+                version=F('version') + 1,
+                last_queue_number=Greatest(F('last_queue_number'), Value(last_queue_number)),
+            )
+        return queue_status
+
+    @staticmethod
+    def get_status(doctor_id, clinic_id, date):
+        """
+        خواندن سطر وضعیت صف با کلید یکتا (پزشک، مرکز، تاریخ)
+        در صورت نبودن، سطر از روی نوبت‌ها ساخته می‌شود.
+        """
+        queue_status = QueueStatus.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+        ).select_related('doctor').first()
+        if queue_status is None:
+            queue_status = QueueService.rebuild_status(doctor_id, clinic_id, date)
+        return queue_status
+
+    @staticmethod
+    def get_average_duration(queue_status):
+        """میانگین زمان هر نوبت صف (مدت ویزیت تخمینی یا تنظیم‌شده + فاصله)"""
+        doctor = queue_status.doctor
+        return (queue_status.average_visit_duration or doctor.visit_duration) + doctor.gap_between_visits
+
+    @staticmethod
+    def apply_transition(appointment, old_status, user=None):
+        """
+        بروزرسانی اتمیک شمارنده‌های صف برای تغییر وضعیت یک نوبت
+
+        باید داخل همان تراکنشی صدا زده شود که نوبت ذخیره شده است.
+
+        Args:
+            appointment (Appointment): نوبت ذخیره‌شده با وضعیت جدید
+            old_status (str|None): وضعیت قبلی (None برای نوبت جدید)
+            user (User|None): کاربر انجام‌دهنده (برای لاگ صف)
+        """
+        new_status = appointment.status
+        if old_status != new_status and appointment.clinic_id is not None:
+            QueueService._update_counters(appointment, old_status, new_status)
+            if old_status == 'in_progress' and new_status == 'visited':
+                VisitDurationService.record_visit(appointment)
+        if old_status != new_status:
+            TimeSlotService.sync_booking(appointment, old_status)
+            if new_status == 'cancelled' and old_status is not None:
+                # پیشنهاد تایم آزادشده به لیست انتظار همان روز
+                WaitlistService.on_slot_freed(appointment)
+            transaction.on_commit(lambda: QueueProjection.apply(appointment))
+            QueueService._log_transition(appointment, old_status, new_status, user)
+        QueueService.notify_transition(appointment)
+
+    @staticmethod
+    def _log_transition(appointment, old_status, new_status, user=None):
+        """ثبت رویداد صف در لاگ بافرشده پس از commit"""
+        action = (
+            QueueService.LOG_ACTIONS.get((old_status, new_status))
+            or QueueService.LOG_ACTIONS.get((None, new_status))
+        )
+        if action is None:
+            return
+        key = (appointment.doctor_id, appointment.clinic_id, appointment.date)
+        appointment_id = appointment.id
+        user_id = user.id if user is not None and user.is_authenticated else None
+        transaction.on_commit(lambda: QueueLogService.log(
+            *key, action, appointment_id=appointment_id, performed_by_id=user_id
+        ))
+
+    @staticmethod
+    def _update_counters(appointment, old_status, new_status):
+        """اعمال تغییرات شمارنده‌ها روی سطر QueueStatus"""
+        key = {
+            'doctor_id': appointment.doctor_id,
+            'clinic_id': appointment.clinic_id,
+            'date': appointment.date,
+        }
+        if not QueueStatus.objects.filter(**key).exists():
+            # سطر جدید مستقیماً از روی نوبت‌ها (شامل همین تغییر) ساخته می‌شود
+            values = QueueService._compute_status_values(**key)
+            try:
+                with transaction.atomic():
+                    queue_status = QueueStatus.objects.create(**key, **values, version=1)
+            except IntegrityError:
+                # سطر هم‌زمان توسط درخواست دیگری ساخته شد؛ تغییر را اعمال کن
+                pass
+            else:
+                queue_status.estimated_wait_time = (
+                    queue_status.remaining_appointments * QueueService.get_average_duration(queue_status)
+                )
+                queue_status.save(update_fields=['estimated_wait_time'])
+                return
+
+        remaining_delta, completed_delta = QueueService._bucket_deltas(old_status, new_status)
+        doctor = appointment.doctor
+
+        # ترتیب مهم است: MySQL عبارات SET را از چپ به راست و با مقادیر
+        # جدید ارزیابی می‌کند، پس زمان انتظار پیش از remaining می‌آید.
+        updates = {
+            'estimated_wait_time': QueueService._add('remaining_appointments', remaining_delta) * (
+                Case(
+                    When(average_visit_duration__gt=0, then=F('average_visit_duration')),
+                    default=Value(doctor.visit_duration),
+                ) + doctor.gap_between_visits
+            ),
+            'remaining_appointments': QueueService._add('remaining_appointments', remaining_delta),
+            'completed_appointments': QueueService._add('completed_appointments', completed_delta),
+            'total_appointments': QueueService._add(
+                'total_appointments', remaining_delta + completed_delta
+            ),
+            'last_update': timezone.now(),
+            'version': F('version') + 1,
+        }
+
+        if new_status == 'in_progress':
+            updates['current_queue_number'] = appointment.queue_number or 0
+            updates['current_appointment'] = appointment
+            updates['started_at'] = Coalesce(F('started_at'), Value(timezone.now()))
+        elif old_status == 'in_progress':
+            updates['current_appointment'] = Case(
+                When(current_appointment_id=appointment.id, then=Value(None)),
+                default=F('current_appointment'),
+            )
+
+        QueueStatus.objects.filter(**key).update(**updates)
+
+    @staticmethod
+    def allocate_queue_number(doctor_id, clinic_id, date):
+        """
+        تخصیص شماره صف بعدی بدون تکرار در رزروهای هم‌زمان
+
+        شمارنده last_queue_number سطر QueueStatus با یک UPDATE اتمیک
+        افزایش می‌یابد؛ قفل سطر تا پایان تراکنش رزرو می‌ماند و رزروهای
+        هم‌زمان همان صف پشت سر هم شماره می‌گیرند. باید داخل همان تراکنشی
+        صدا زده شود که نوبت ایجاد می‌شود.
+
+        Returns:
+            int: شماره صف نوبت جدید
+        """
+        if clinic_id is None:
+            # صف بدون مرکز سطر QueueStatus ندارد؛ قفل روی سطر پزشک
+            list(Doctor.objects.select_for_update().filter(pk=doctor_id).values_list('pk'))
+            last_number = Appointment.objects.filter(
+                doctor_id=doctor_id,
+                clinic__isnull=True,
+                date=date,
+            ).aggregate(last=Max('queue_number'))['last']
+            return (last_number or 0) + 1
+
+        key = {'doctor_id': doctor_id, 'clinic_id': clinic_id, 'date': date}
+        if not QueueStatus.objects.filter(**key).update(last_queue_number=F('last_queue_number') + 1):
+            values = QueueService._compute_status_values(**key)
+            values['last_queue_number'] += 1
+            try:
+                with transaction.atomic():
+                    QueueStatus.objects.create(**key, **values, version=1)
+                return values['last_queue_number']
+            except IntegrityError:
+                # سطر هم‌زمان توسط درخواست دیگری ساخته شد
+                QueueStatus.objects.filter(**key).update(last_queue_number=F('last_queue_number') + 1)
+        return QueueStatus.objects.filter(**key).values_list('last_queue_number', flat=True).get()
+
+    @staticmethod
+    def register_booking(appointment):
+        """ثبت نوبت تازه ایجادشده در شمارنده‌های صف"""
+        QueueService.apply_transition(appointment, None)
+
+    @staticmethod
+    def transition(appointment, new_status, user=None, **fields):
+        """
+        تغییر وضعیت نوبت و بروزرسانی صف در یک تراکنش
+
+        Args:
+            appointment (Appointment): نوبت
+            new_status (str): وضعیت جدید
+            user (User|None): کاربر انجام‌دهنده (برای لاگ صف)
+            **fields: فیلدهای دیگری که همراه وضعیت ذخیره می‌شوند
+
+        وضعیت قبلی از سطر قفل‌شده (select_for_update) خوانده می‌شود تا دو
+        تغییر هم‌زمان (مثلاً فراخوانی پزشک و لغو منشی) هر دو شمارنده‌ها را
+        تغییر ندهند. اگر نوبت همین حالا در وضعیت جدید باشد کاری انجام نمی‌شود.
+
+        Returns:
+            Appointment: نوبت بروزشده
+        """
+        with transaction.atomic():
+            locked = Appointment.objects.select_for_update().get(pk=appointment.pk)
+            old_status = locked.status
+            if old_status == new_status:
+                appointment.status = old_status
+                return appointment
+
+            locked.status = new_status
+            for name, value in fields.items():
+                setattr(locked, name, value)
+            locked.save(update_fields=['status', 'updated_at', *fields])
+            QueueService.apply_transition(locked, old_status, user=user)
+
+        appointment.status = new_status
+        appointment.updated_at = locked.updated_at
+        for name, value in fields.items():
+            setattr(appointment, name, value)
+        return appointment
+
+    @staticmethod
+    def get_ahead_count(appointment):
+        """
+        تعداد نوبت‌های در انتظار پیش از یک نوبت
+
+        در صورت فعال بودن نمای Redis از ZCOUNT و در غیر این صورت از
+        COUNT دیتابیس استفاده می‌شود.
+        """
+        ahead_count = QueueProjection.get_ahead_count(
+            appointment.doctor_id, appointment.clinic_id, appointment.date, appointment.time
+        )
+        if ahead_count is None:
+            ahead_count = Appointment.objects.filter(
+                doctor_id=appointment.doctor_id,
+                clinic_id=appointment.clinic_id,
+                date=appointment.date,
+                time__lt=appointment.time,
+                status__in=QueueService.WAITING_STATUSES
+            ).count()
+        return ahead_count
+
+    @staticmethod
+    def get_next_appointment(doctor_id, clinic_id, date):
+        """
+        نوبت بعدی برای فراخوانی (تأییدشده یا حاضر، به ترتیب شماره صف)
+        """
+        queryset = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+        ).select_related('patient', 'clinic')
+
+        available, appointment_id = QueueProjection.get_next_id(doctor_id, clinic_id, date)
+        if available:
+            if appointment_id is None:
+                return None
+            appointment = queryset.filter(
+                id=appointment_id, status__in=QueueProjection.CALLABLE_STATUSES
+            ).first()
+            if appointment:
+                return appointment
+
+        return queryset.filter(
+            status__in=QueueProjection.CALLABLE_STATUSES
+        ).order_by('queue_number', 'time').first()
+
+    @staticmethod
+    def _time_to_minutes(value):
+        """تبدیل ساعت به دقیقه از ابتدای روز"""
+        return value.hour * 60 + value.minute
+
+    @staticmethod
+    def build_snapshot(doctor_id, clinic_id, date):
+        """
+        ساخت snapshot فشرده صف با یک کوئری
+
+        Returns:
+            dict: {
+                'current_number': شماره نوبت در حال ویزیت,
+                'waiting_times': زمان نوبت‌های در انتظار (دقیقه، مرتب),
+                'total_day': کل نوبت‌های فعال و ویزیت‌شده,
+                'visited_count': تعداد ویزیت‌شده‌ها,
+                'slot_minutes': مدت هر نوبت (ویزیت تخمینی + فاصله),
+                'version': نسخه سطر QueueStatus (۰ برای صف بدون مرکز),
+            }
+        """
+        doctor = Doctor.objects.only('visit_duration', 'gap_between_visits').get(id=doctor_id)
+        average, version = QueueStatus.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+        ).values_list('average_visit_duration', 'version').first() or (0, 0)
+
+        rows = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+        ).exclude(
+            status__in=['cancelled', 'no_show']
+        ).values_list('time', 'queue_number', 'status').order_by('time')
+
+        current_number = 0
+        waiting_times = []
+        visited_count = 0
+        for time, queue_number, status in rows:
+            if status == 'visited':
+                visited_count += 1
+                continue
+            if status == 'in_progress':
+                current_number = queue_number or 0
+            waiting_times.append(QueueService._time_to_minutes(time))
+
+        return {
+            'current_number': current_number,
+            'waiting_times': waiting_times,
+            'total_day': len(waiting_times) + visited_count,
+            'visited_count': visited_count,
+            'slot_minutes': (average or doctor.visit_duration) + doctor.gap_between_visits,
+            'version': version,
+        }
+
+    @staticmethod
+    def build_view(snapshot, my_time=None):
+        """
+        محاسبه وضعیت شخصی یک بیمار از روی snapshot گروه (بدون کوئری)
+
+        Args:
+            snapshot (dict): خروجی build_snapshot
+            my_time (time|None): ساعت نوبت بیمار
+
+        Returns:
+            dict: شماره فعلی، تعداد نفرات جلوتر و زمان تقریبی انتظار
+        """
+        ahead_count = 0
+        if my_time is not None:
+            ahead_count = bisect_left(
+                snapshot['waiting_times'],
+                QueueService._time_to_minutes(my_time)
+            )
+
+        return {
+            'type': 'queue.snapshot',
+            'current_number': snapshot['current_number'],
+            'ahead_count': ahead_count,
+            'estimated_wait_minutes': ahead_count * snapshot['slot_minutes'],
+            'total_day': snapshot['total_day'],
+            'visited_count': snapshot['visited_count'],
+            'version': snapshot.get('version', 0),
+        }
+
+    @staticmethod
+    def diff_view(previous, view):
+        """
+        تغییرات یک view نسبت به view قبلی ارسال‌شده به همان کلاینت
+
+        Returns:
+            dict|None: پیام queue.delta شامل فیلدهای تغییرکرده و نسخه،
+            یا None اگر تغییری نباشد
+        """
+        changed = {
+            name: value for name, value in view.items()
+            if name not in ('type', 'version') and previous.get(name) != value
+        }
+        if not changed:
+            return None
+        return {'type': 'queue.delta', 'version': view['version'], **changed}
+
+    @staticmethod
+    def get_patient_time(user, appointment_id, doctor_id, clinic_id, date):
+        """
+        ساعت نوبت بیمار متصل به صف (فقط نوبت متعلق به خود کاربر)
+
+        Returns:
+            time|None
+        """
+        if not user or not user.is_authenticated:
+            return None
+        if not appointment_id or not str(appointment_id).isdigit():
+            return None
+
+        return Appointment.objects.filter(
+            id=int(appointment_id),
+            patient=user,
+            doctor_id=doctor_id,
+            clinic_id=clinic_id,
+            date=date,
+        ).values_list('time', flat=True).first()
+
+    @staticmethod
+    def publish(doctor_id, clinic_id, date):
+        """
+        انتشار snapshot جدید صف پس از commit تراکنش
+
+        تغییرات پشت‌سرهم یک صف توسط QueueBroadcaster در یک پنجره کوتاه
+        تجمیع و یک بار منتشر می‌شوند.
+        """
+        transaction.on_commit(lambda: QueueBroadcaster.schedule(doctor_id, clinic_id, date))
+
+    @staticmethod
+    def notify_transition(appointment):
+        """اطلاع‌رسانی تغییر وضعیت یک نوبت به مشترکین صف آن"""
+        QueueService.publish(appointment.doctor_id, appointment.clinic_id, appointment.date)
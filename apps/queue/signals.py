@@ -0,0 +1,16 @@
+"""
+سیگنال‌های اپلیکیشن صف زنده - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import QueueAnnouncement
+from .services.board_service import ClinicBoardService
+
+
+@receiver([post_save, post_delete], sender=QueueAnnouncement)
+def invalidate_announcement_cache(sender, **kwargs):
+    """باطل کردن کش اعلان‌های تابلو با هر تغییر اعلان"""
+    ClinicBoardService.invalidate_announcements()
@@ -0,0 +1,26 @@
+"""
+URLs برای بخش صف زنده - نوبان
+"""
+
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # جریان SSE صف زنده (جایگزین WebSocket)
+    path(
+        'events/<int:doctor_id>/<int:clinic_id>/<str:date>/',
+        views.queue_events,
+        name='queue_events'
+    ),
+    
+    # خط زمانی رویدادهای صف
+    path(
+        'api/timeline/<int:doctor_id>/<int:clinic_id>/<str:date>/',
+        views.api_queue_timeline,
+        name='api_queue_timeline'
+    ),
+    
+    # تابلوی اتاق انتظار مرکز (عمومی)
+    path('board/<int:clinic_id>/', views.clinic_board, name='clinic_board'),
+    path('api/board/<int:clinic_id>/', views.api_clinic_board, name='api_clinic_board'),
+]
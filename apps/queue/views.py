@@ -0,0 +1,176 @@
+"""
+ویوهای اپلیکیشن صف زنده - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+
+from apps.clinics.models import Clinic
+from apps.doctors.models import Doctor
+from .services import ClinicBoardService, QueueLogService, QueueService
+
+# فاصله ارسال heartbeat (ثانیه) تا پراکسی‌ها اتصال بیکار را نبندند
+SSE_HEARTBEAT_SECONDS = 15
+
+# حداکثر عمر هر اتصال؛ مرورگر با Last-Event-ID دوباره وصل می‌شود
+SSE_MAX_DURATION_SECONDS = 300
+
+# تأخیر اتصال مجدد پیشنهادی به کلاینت (میلی‌ثانیه)
+SSE_RETRY_MS = 3000
+
+
+def _format_event(view):
+    """قالب‌بندی یک رویداد text/event-stream"""
+    data = json.dumps(view, ensure_ascii=False)
+    return f'id: {view["version"]}\nevent: queue\ndata: {data}\n\n'
+
+
+async def queue_events(request, doctor_id, clinic_id, date):
+    """
+    جریان Server-Sent Events صف زنده (جایگزین WebSocket)
+
+    /queue/events/<doctor_id>/<clinic_id>/<YYYY-MM-DD>/?appointment=<id>
+
+    از همان گروه channel layer مصرف‌کننده WebSocket تغذیه می‌شود. شناسه
+    هر رویداد نسخه QueueStatus است؛ اگر Last-Event-ID کلاینت با نسخه
+    فعلی برابر باشد snapshot اولیه دوباره ارسال نمی‌شود و پس از آن فقط
+    تغییرات (queue.delta) ارسال می‌شوند. این ویو async
+    است و باید زیر ASGI (config.asgi.application) اجرا شود تا هر اتصال
+    باز یک thread را اشغال نکند.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        date = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return HttpResponseBadRequest('تاریخ نامعتبر')
+    clinic_id = clinic_id or None
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return HttpResponseBadRequest('صف زنده در دسترس نیست')
+
+    my_time = await sync_to_async(QueueService.get_patient_time)(
+        request.user,
+        request.GET.get('appointment'),
+        doctor_id,
+        clinic_id,
+        date,
+    )
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    group_name = QueueService.get_group_name(doctor_id, clinic_id, date)
+
+    async def stream():
+        channel_name = await channel_layer.new_channel()
+        await channel_layer.group_add(group_name, channel_name)
+        try:
+            yield f'retry: {SSE_RETRY_MS}\n\n'
+
+            snapshot = await sync_to_async(QueueService.build_snapshot)(doctor_id, clinic_id, date)
+            version = snapshot['version']
+            last_view = QueueService.build_view(snapshot, my_time)
+            if not version or last_event_id != str(version):
+                yield _format_event(last_view)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + SSE_MAX_DURATION_SECONDS
+            while loop.time() < deadline:
+                try:
+                    message = await asyncio.wait_for(
+                        channel_layer.receive(channel_name),
+                        timeout=SSE_HEARTBEAT_SECONDS,
+                    )
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+
+                if message.get('type') != 'queue.update':
+                    continue
+                snapshot = message['snapshot']
+                # رویدادهای تکراری یا قدیمی‌تر از نسخه فعلی نادیده گرفته می‌شوند
+                if snapshot.get('version') and snapshot['version'] <= version:
+                    continue
+                version = snapshot.get('version', version)
+                view = QueueService.build_view(snapshot, my_time)
+                delta = QueueService.diff_view(last_view, view)
+                last_view = view
+                if delta:
+                    yield _format_event(delta)
+        finally:
+            await channel_layer.group_discard(group_name, channel_name)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # جلوگیری از بافر شدن پاسخ در Nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def api_queue_timeline(request, doctor_id, clinic_id, date):
+    """
+    API خط زمانی رویدادهای صف یک روز (برای بازبینی و تحلیل)
+
+    فقط پزشک همان صف، منشی و مدیرکل دسترسی دارند.
+    """
+    user = request.user
+    is_owner = Doctor.objects.filter(id=doctor_id, user=user).exists()
+    if not is_owner and user.role not in ['secretary', 'superadmin']:
+        return JsonResponse({'success': False, 'message': 'دسترسی غیرمجاز'}, status=403)
+
+    try:
+        date = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'تاریخ نامعتبر'}, status=400)
+
+    events = QueueLogService.get_timeline(doctor_id, clinic_id, date)
+    for event in events:
+        event['created_at'] = event['created_at'].isoformat()
+
+    return JsonResponse({'success': True, 'events': events})
+
+
+def _board_etag(request, clinic_id):
+    """ETag تابلوی مرکز (نسخه صف‌ها و اعلان‌های امروز)"""
+    return ClinicBoardService.get_etag(clinic_id, timezone.localdate())
+
+
+@require_GET
+@condition(etag_func=_board_etag)
+def clinic_board(request, clinic_id):
+    """
+    تابلوی عمومی اتاق انتظار مرکز (برای نمایش روی تلویزیون)
+    """
+    clinic = get_object_or_404(Clinic, id=clinic_id, is_active=True)
+    context = {
+        'clinic': clinic,
+        'board': ClinicBoardService.get_board(clinic.id, timezone.localdate()),
+    }
+    response = render(request, 'queue/board.html', context)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_GET
+@condition(etag_func=_board_etag)
+def api_clinic_board(request, clinic_id):
+    """
+    API عمومی تابلوی مرکز؛ کلاینت با If-None-Match در اغلب موارد 304 می‌گیرد
+    """
+    clinic = get_object_or_404(Clinic, id=clinic_id, is_active=True)
+    board = ClinicBoardService.get_board(clinic.id, timezone.localdate())
+    response = JsonResponse({'success': True, 'clinic': clinic.name, **board})
+    patch_cache_control(response, no_cache=True)
+    return response
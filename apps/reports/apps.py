@@ -9,3 +9,6 @@ class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reports'
     verbose_name = 'گزارش‌ها و آمار'
+
+    def ready(self):
+        from . import signals  # noqa: F401
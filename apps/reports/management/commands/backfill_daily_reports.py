@@ -0,0 +1,48 @@
+"""
+دستور مدیریتی بازسازی گزارش‌های روزانه - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+سطرهای DailyReport پزشکان را در یک بازه از روی نوبت‌ها و تراکنش‌ها
+بازسازی می‌کند. پس از آن سطرها با هر تغییر نوبت یا تراکنش به‌روز
+می‌مانند؛ اجرای دوباره فقط پس از ویرایش مستقیم داده‌ها لازم است.
+
+استفاده:
+    python manage.py backfill_daily_reports
+    python manage.py backfill_daily_reports --days 30 --doctor 3
+    python manage.py backfill_daily_reports --start 2025-03-21 --end 2026-03-20
+"""
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.reports.services import DailyReportService
+
+
+class Command(BaseCommand):
+    help = 'بازسازی گزارش‌های روزانه (DailyReport) پزشکان از روی نوبت‌ها و تراکنش‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', type=int, help='شناسه پزشک')
+        parser.add_argument('--days', type=int, default=365, help='تعداد روزهای گذشته (پیش‌فرض ۳۶۵)')
+        parser.add_argument('--start', help='تاریخ شروع (YYYY-MM-DD)')
+        parser.add_argument('--end', help='تاریخ پایان (YYYY-MM-DD، پیش‌فرض امروز)')
+
+    def handle(self, *args, **options):
+        try:
+            end = (
+                datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end']
+                else timezone.now().date()
+            )
+            start = (
+                datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start']
+                else end - timedelta(days=max(options['days'], 1) - 1)
+            )
+        except ValueError:
+            raise CommandError('تاریخ نامعتبر است (YYYY-MM-DD)')
+
+        count = DailyReportService.rebuild(start, end, doctor_id=options['doctor'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} گزارش روزانه از {start} تا {end} ساخته شد.'
+        ))
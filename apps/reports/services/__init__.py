@@ -0,0 +1,8 @@
+"""
+سرویس‌های اپلیکیشن گزارش‌ها - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+"""
+
+from .rollup_service import DailyReportService
+
+__all__ = ['DailyReportService']
@@ -0,0 +1,205 @@
+"""
+سرویس گزارش‌های روزانه - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+سطرهای DailyReport هر (پزشک، مرکز، تاریخ نوبت) از روی نوبت‌ها و
+تراکنش‌ها ساخته می‌شوند:
+
+    - با تغییر نوبت، تراکنش یا بازپرداخت (سیگنال‌ها، پس از commit) فقط
+      ستون‌های مربوط همان سطر دوباره محاسبه و upsert می‌شوند
+    - دستور backfill_daily_reports کل یک بازه را با چند کوئری گروه‌بندی‌شده
+      بازسازی می‌کند
+
+درآمد و بازپرداخت به تاریخ نوبت تراکنش نسبت داده می‌شوند. بیمار جدید
+بیماری است که اولین ویزیتش نزد پزشک در همان روز بوده است.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from apps.appointments.models import Appointment
+from apps.payments.models import Refund, Transaction
+from ..models import DailyReport
+
+
+class DailyReportService:
+    """
+    سرویس ساخت و بروزرسانی گزارش‌های روزانه پزشکان
+    """
+
+    APPOINTMENT_FIELDS = (
+        'total_appointments', 'completed_appointments', 'cancelled_appointments',
+        'no_show_appointments', 'new_patients',
+    )
+    PAYMENT_FIELDS = ('total_revenue', 'online_revenue', 'cash_revenue', 'refunded_amount')
+
+    SUCCESS_STATUSES = ['paid', 'verified']
+    ONLINE_GATEWAYS = ['zarinpal', 'drik']
+    CASH_GATEWAYS = ['cash', 'card']
+
+    @staticmethod
+    def _prefixed(filters, prefix):
+        return {f'{prefix}{name}': value for name, value in filters.items()}
+
+    @staticmethod
+    def collect_appointments(filters):
+        """
+        ستون‌های نوبت گزارش‌ها با دو کوئری گروه‌بندی‌شده
+
+        Args:
+            filters (dict): فیلتر روی Appointment (doctor_id، clinic_id، date، date__gte و ...)
+
+        Returns:
+            dict: {(doctor_id, clinic_id, date): {field: value}}
+        """
+        rows = {}
+        for row in Appointment.objects.filter(**filters).values(
+            'doctor_id', 'clinic_id', 'date'
+        ).annotate(
+            total_appointments=Count('id'),
+            completed_appointments=Count('id', filter=Q(status='visited')),
+            cancelled_appointments=Count('id', filter=Q(status='cancelled')),
+            no_show_appointments=Count('id', filter=Q(status='no_show')),
+        ).order_by():
+            key = (row.pop('doctor_id'), row.pop('clinic_id'), row.pop('date'))
+            row['new_patients'] = 0
+            rows[key] = row
+
+        # ویزیت‌هایی که بیمار پیش از آن نزد همین پزشک ویزیت نشده بود
+        earlier_visits = Appointment.objects.filter(
+            doctor_id=OuterRef('doctor_id'),
+            patient_id=OuterRef('patient_id'),
+            date__lt=OuterRef('date'),
+            status='visited'
+        )
+        for row in Appointment.objects.filter(**filters, status='visited').exclude(
+            Exists(earlier_visits)
+        ).values('doctor_id', 'clinic_id', 'date').annotate(
+            count=Count('patient_id', distinct=True)
+        ).order_by():
+            rows[(row['doctor_id'], row['clinic_id'], row['date'])]['new_patients'] = row['count']
+        return rows
+
+    @staticmethod
+    def collect_payments(filters):
+        """
+        ستون‌های مالی گزارش‌ها با دو کوئری گروه‌بندی‌شده
+
+        Args:
+            filters (dict): فیلتر روی نوبت تراکنش (همان کلیدهای collect_appointments)
+
+        Returns:
+            dict: {(doctor_id, clinic_id, date): {field: value}}
+        """
+        rows = {}
+
+        def get_row(key):
+            return rows.setdefault(key, dict.fromkeys(DailyReportService.PAYMENT_FIELDS, 0))
+
+        for row in Transaction.objects.filter(
+            **DailyReportService._prefixed(filters, 'appointment__'),
+            status__in=DailyReportService.SUCCESS_STATUSES
+        ).exclude(
+            transaction_type='refund'
+        ).values(
+            'appointment__doctor_id', 'appointment__clinic_id', 'appointment__date'
+        ).annotate(
+            total=Sum('amount'),
+            online=Sum('amount', filter=Q(gateway__in=DailyReportService.ONLINE_GATEWAYS)),
+            cash=Sum('amount', filter=Q(gateway__in=DailyReportService.CASH_GATEWAYS)),
+        ).order_by():
+            values = get_row((
+                row['appointment__doctor_id'], row['appointment__clinic_id'], row['appointment__date']
+            ))
+            values['total_revenue'] = row['total'] or 0
+            values['online_revenue'] = row['online'] or 0
+            values['cash_revenue'] = row['cash'] or 0
+
+        for row in Refund.objects.filter(
+            **DailyReportService._prefixed(filters, 'transaction__appointment__'),
+            status='completed'
+        ).values(
+            'transaction__appointment__doctor_id',
+            'transaction__appointment__clinic_id',
+            'transaction__appointment__date',
+        ).annotate(
+            total=Sum('amount'),
+        ).order_by():
+            get_row((
+                row['transaction__appointment__doctor_id'],
+                row['transaction__appointment__clinic_id'],
+                row['transaction__appointment__date'],
+            ))['refunded_amount'] = row['total'] or 0
+        return rows
+
+    @staticmethod
+    def refresh(doctor_id, clinic_id, date, appointments=True, payments=True):
+        """
+        محاسبه دوباره و upsert یک سطر گزارش روزانه
+
+        Args:
+            appointments (bool): محاسبه ستون‌های نوبت
+            payments (bool): محاسبه ستون‌های مالی
+        """
+        key = (doctor_id, clinic_id, date)
+        filters = {'doctor_id': doctor_id, 'clinic_id': clinic_id, 'date': date}
+        values = {}
+        if appointments:
+            values.update(DailyReportService.collect_appointments(filters).get(
+                key, dict.fromkeys(DailyReportService.APPOINTMENT_FIELDS, 0)
+            ))
+        if payments:
+            values.update(DailyReportService.collect_payments(filters).get(
+                key, dict.fromkeys(DailyReportService.PAYMENT_FIELDS, 0)
+            ))
+
+        if DailyReport.objects.filter(**filters).update(**values, updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                DailyReport.objects.create(**filters, **values)
+        except IntegrityError:
+            # سطر هم‌زمان توسط درخواست دیگری ساخته شد
+            DailyReport.objects.filter(**filters).update(**values, updated_at=timezone.now())
+
+    @staticmethod
+    def refresh_appointment(appointment_id, appointments=True, payments=True):
+        """بروزرسانی سطر گزارش روز یک نوبت"""
+        key = Appointment.objects.filter(pk=appointment_id).values_list(
+            'doctor_id', 'clinic_id', 'date'
+        ).first()
+        if key is not None:
+            DailyReportService.refresh(*key, appointments=appointments, payments=payments)
+
+    @staticmethod
+    def rebuild(start, end, doctor_id=None):
+        """
+        بازسازی کامل گزارش‌های روزانه پزشکان در بازه [start, end]
+
+        Returns:
+            int: تعداد سطرهای ساخته‌شده
+        """
+        filters = {'date__gte': start, 'date__lte': end}
+        if doctor_id:
+            filters['doctor_id'] = doctor_id
+
+        appointment_rows = DailyReportService.collect_appointments(filters)
+        payment_rows = DailyReportService.collect_payments(filters)
+        empty_appointments = dict.fromkeys(DailyReportService.APPOINTMENT_FIELDS, 0)
+        empty_payments = dict.fromkeys(DailyReportService.PAYMENT_FIELDS, 0)
+
+        reports = [
+            DailyReport(
+                doctor_id=key[0],
+                clinic_id=key[1],
+                date=key[2],
+                **appointment_rows.get(key, empty_appointments),
+                **payment_rows.get(key, empty_payments),
+            )
+            for key in set(appointment_rows) | set(payment_rows)
+        ]
+        with transaction.atomic():
+            DailyReport.objects.filter(**filters, doctor__isnull=False).delete()
+            DailyReport.objects.bulk_create(reports, batch_size=500)
+        return len(reports)
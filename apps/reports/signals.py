@@ -0,0 +1,46 @@
+"""
+سیگنال‌های اپلیکیشن گزارش‌ها - نوبان
+توسعه‌دهنده: شرکت توسعه هوشمند فرش ایرانیان
+
+با تغییر نوبت، تراکنش یا بازپرداخت، سطر گزارش روزانه همان (پزشک، مرکز،
+تاریخ نوبت) پس از commit دوباره محاسبه می‌شود.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.appointments.models import Appointment
+from apps.payments.models import Refund, Transaction
+from .services import DailyReportService
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def refresh_report_on_appointment_change(sender, instance, **kwargs):
+    """بروزرسانی آمار نوبت‌های روز (با حذف نوبت، تراکنش‌هایش هم حذف شده‌اند)"""
+    key = (instance.doctor_id, instance.clinic_id, instance.date)
+    payments = kwargs['signal'] is post_delete
+    transaction.on_commit(lambda: DailyReportService.refresh(*key, payments=payments))
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def refresh_report_on_transaction_change(sender, instance, **kwargs):
+    """بروزرسانی درآمد روز نوبت تراکنش"""
+    appointment_id = instance.appointment_id
+    transaction.on_commit(
+        lambda: DailyReportService.refresh_appointment(appointment_id, appointments=False)
+    )
+
+
+@receiver([post_save, post_delete], sender=Refund)
+def refresh_report_on_refund_change(sender, instance, **kwargs):
+    """بروزرسانی مبلغ بازپرداخت روز نوبت تراکنش"""
+    transaction_id = instance.transaction_id
+
+    def refresh():
+        appointment_id = Transaction.objects.filter(pk=transaction_id).values_list(
+            'appointment_id', flat=True
+        ).first()
+        DailyReportService.refresh_appointment(appointment_id, appointments=False)
+
+    transaction.on_commit(refresh)
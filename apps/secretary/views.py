@@ -21,9 +21,11 @@ from django.db.models import Q, Count, Sum
 from datetime import timedelta, datetime
 
 from apps.appointments.models import Appointment
+from apps.appointments.services import AppointmentStatsService, BookingService
 from apps.doctors.models import Doctor, DoctorClinic, WorkSchedule
 from apps.clinics.models import Clinic
 from apps.accounts.models import User
+from apps.queue.services import QueueService
 
 
 # ============================================================
@@ -81,27 +83,30 @@ def secretary_dashboard(request):
     today_appointments = today_qs.order_by('time')
 
     # آمار
-    total_today = today_appointments.count()
-    pending_count = today_appointments.filter(status='pending').count()
-    confirmed_count = today_appointments.filter(status='confirmed').count()
-    arrived_count = today_appointments.filter(status='arrived').count()
-    in_progress_count = today_appointments.filter(status='in_progress').count()
-    visited_count = today_appointments.filter(status='visited').count()
-    cancelled_count = today_appointments.filter(status='cancelled').count()
+    clinic_id = clinic.id if clinic else None
+    stats = AppointmentStatsService.get(doctor.id, today, clinic_id=clinic_id)
+    total_today = stats['total']
+    pending_count = stats['pending']
+    confirmed_count = stats['confirmed']
+    arrived_count = stats['arrived']
+    in_progress_count = stats['in_progress']
+    visited_count = stats['visited']
+    cancelled_count = stats['cancelled']
     waiting_count = pending_count + confirmed_count + arrived_count
 
     # بیمار در حال ویزیت
     current_patient = today_appointments.filter(status='in_progress').first()
     # نفر بعدی
-    next_patient = today_appointments.filter(
-        status__in=['arrived', 'confirmed']
-    ).order_by('queue_number', 'time').first()
+    if clinic:
+        next_patient = QueueService.get_next_appointment(doctor.id, clinic.id, today)
+    else:
+        next_patient = today_appointments.filter(
+            status__in=['arrived', 'confirmed']
+        ).order_by('queue_number', 'time').first()
 
     # آمار هفتگی
     week_start = today - timedelta(days=6)
-    week_qs = Appointment.objects.filter(doctor=doctor, date__gte=week_start, date__lte=today)
-    if clinic:
-        week_qs = week_qs.filter(clinic=clinic)
+    week_stats = AppointmentStatsService.get(doctor.id, week_start, today, clinic_id=clinic_id)
 
     context = {
         'doctor': doctor,
@@ -117,8 +122,8 @@ def secretary_dashboard(request):
         'waiting_count': waiting_count,
         'current_patient': current_patient,
         'next_patient': next_patient,
-        'week_total': week_qs.count(),
-        'week_visited': week_qs.filter(status='visited').count(),
+        'week_total': week_stats['total'],
+        'week_visited': week_stats['visited'],
     }
     return render(request, 'secretary/dashboard.html', context)
 
@@ -172,16 +177,30 @@ def secretary_live_queue(request):
     if clinic:
         qs = qs.filter(clinic=clinic)
 
+    # یک بار خواندن نوبت‌های روز و دسته‌بندی در حافظه
+    appointments = list(qs.exclude(status='cancelled').order_by('queue_number', 'time'))
+    waiting = [a for a in appointments if a.status in ['confirmed', 'arrived']]
+    visited = sorted(
+        (a for a in appointments if a.status == 'visited'),
+        key=lambda a: a.visited_at or timezone.now(),
+        reverse=True
+    )
+    pending = sorted((a for a in appointments if a.status == 'pending'), key=lambda a: a.time)
+
+    # شمارنده‌های صف از سطر QueueStatus
+    queue_status = QueueService.get_status(doctor.id, clinic.id, today) if clinic else None
+
     context = {
         'doctor': doctor,
         'clinic': clinic,
-        'waiting': qs.filter(status__in=['confirmed', 'arrived']).order_by('queue_number', 'time'),
-        'in_progress': qs.filter(status='in_progress').first(),
-        'visited': qs.filter(status='visited').order_by('-visited_at'),
-        'pending': qs.filter(status='pending').order_by('time'),
-        'waiting_count': qs.filter(status__in=['confirmed', 'arrived']).count(),
-        'visited_count': qs.filter(status='visited').count(),
-        'total_today': qs.exclude(status='cancelled').count(),
+        'queue_status': queue_status,
+        'waiting': waiting,
+        'in_progress': next((a for a in appointments if a.status == 'in_progress'), None),
+        'visited': visited,
+        'pending': pending,
+        'waiting_count': len(waiting),
+        'visited_count': queue_status.completed_appointments if queue_status else len(visited),
+        'total_today': len(appointments),
     }
     return render(request, 'secretary/live_queue.html', context)
 
@@ -281,30 +300,22 @@ def secretary_add_appointment(request):
             messages.error(request, 'فرمت تاریخ یا ساعت نامعتبر است.')
             return redirect('secretary_add_appointment')
 
-        # بررسی تکراری
-        if Appointment.objects.filter(
-            doctor=doctor, date=appt_date, time=appt_time,
-        ).exclude(status='cancelled').exists():
-            messages.error(request, 'این ساعت قبلاً رزرو شده است.')
-            return redirect('secretary_add_appointment')
-
-        # شماره صف
-        last_queue = Appointment.objects.filter(
-            doctor=doctor, date=appt_date,
-        ).exclude(status='cancelled').count()
-
         target_clinic = clinic or Clinic.objects.first()
-        appointment = Appointment.objects.create(
-            patient=patient,
-            doctor=doctor,
-            clinic=target_clinic,
-            date=appt_date,
-            time=appt_time,
+        result = BookingService.book(
+            doctor,
+            target_clinic.id if target_clinic else None,
+            appt_date,
+            appt_time,
+            patient,
+            rules=BookingService.STAFF_RULES,
             status='confirmed',
-            queue_number=last_queue + 1,
             booking_source='secretary',
             secretary_notes=notes,
         )
+        appointment = result['appointment']
+        if appointment is None:
+            messages.error(request, result['message'])
+            return redirect('secretary_add_appointment')
 
         messages.success(request, f'نوبت برای {patient.get_full_name()} ثبت شد. شماره صف: {appointment.queue_number}')
         return redirect('secretary_today')
@@ -416,16 +427,18 @@ def api_appointment_action(request, appointment_id):
             'message': f'وضعیت فعلی ({appointment.get_status_display()}) اجازه این عملیات را نمی‌دهد.'
         })
 
-    appointment.status = rule['to']
+    fields = {}
     if action == 'arrive':
-        appointment.arrived_at = timezone.now()
-    elif action in ['start_visit', 'end_visit']:
-        appointment.visited_at = timezone.now()
+        fields['arrived_at'] = timezone.now()
+    elif action == 'start_visit':
+        fields['visit_started_at'] = timezone.now()
+    elif action == 'end_visit':
+        fields['visited_at'] = timezone.now()
     elif action == 'cancel':
-        appointment.cancelled_at = timezone.now()
-        appointment.cancel_reason = request.POST.get('reason', 'لغو توسط منشی')
+        fields['cancelled_at'] = timezone.now()
+        fields['cancel_reason'] = request.POST.get('reason', 'لغو توسط منشی')
 
-    appointment.save()
+    QueueService.transition(appointment, rule['to'], user=request.user, **fields)
 
     return JsonResponse({
         'success': True,
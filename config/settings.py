@@ -248,19 +248,39 @@ if DEBUG:
 # CHANNELS CONFIGURATION (WebSocket)
 # ==============================================================================
 
+REDIS_HOST = config('REDIS_HOST', default='localhost')
+REDIS_PORT = config('REDIS_PORT', default=6379, cast=int)
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [(
-                config('REDIS_HOST', default='localhost'),
-                config('REDIS_PORT', default=6379, cast=int)
-            )],
+            "hosts": [(REDIS_HOST, REDIS_PORT)],
         },
     },
 }
 
 
+# ==============================================================================
+# CACHE CONFIGURATION
+# ==============================================================================
+
+# Shared cache (queue board announcements, booking availability); per-process memory in development
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f"redis://{REDIS_HOST}:{REDIS_PORT}/{config('CACHE_REDIS_DB', default=2, cast=int)}",
+        },
+    }
+
+
 # ==============================================================================
 # PAYMENT GATEWAY SETTINGS
 # ==============================================================================
@@ -283,6 +303,9 @@ DRIK_CALLBACK_URL = config('SITE_URL', default='http://localhost:8000') + '/paym
 SMS_API_KEY = config('SMS_API_KEY', default='')
 SMS_LINE_NUMBER = config('SMS_LINE_NUMBER', default='')
 
+# "You're almost up" SMS when this many patients (or fewer) are ahead
+QUEUE_ALERT_AHEAD_THRESHOLD = config('QUEUE_ALERT_AHEAD_THRESHOLD', default=3, cast=int)
+
 
 # ==============================================================================
 # APPLICATION SETTINGS
@@ -291,6 +314,36 @@ SMS_LINE_NUMBER = config('SMS_LINE_NUMBER', default='')
 SITE_URL = config('SITE_URL', default='http://localhost:8000')
 SITE_NAME = config('SITE_NAME', default='نوبان - سیستم نوبت‌دهی پزشکان')
 
+# Queue: online visit-duration estimator (EWMA per doctor and hour of day)
+QUEUE_DURATION_EWMA_ALPHA = config('QUEUE_DURATION_EWMA_ALPHA', default=0.2, cast=float)
+QUEUE_DURATION_MIN_SAMPLES = config('QUEUE_DURATION_MIN_SAMPLES', default=3, cast=int)
+
+# Queue: optional Redis sorted-set projection for O(log n) position lookups
+QUEUE_PROJECTION_ENABLED = config('QUEUE_PROJECTION_ENABLED', default=False, cast=bool)
+QUEUE_PROJECTION_REDIS_DB = config('QUEUE_PROJECTION_REDIS_DB', default=1, cast=int)
+
+# Queue: coalescing window for live-queue broadcasts (0 = publish immediately)
+QUEUE_BROADCAST_WINDOW_MS = config('QUEUE_BROADCAST_WINDOW_MS', default=300, cast=int)
+
+# Queue: write-behind QueueLog buffer (flush on size, age or process exit)
+QUEUE_LOG_BUFFER_SIZE = config('QUEUE_LOG_BUFFER_SIZE', default=50, cast=int)
+QUEUE_LOG_FLUSH_SECONDS = config('QUEUE_LOG_FLUSH_SECONDS', default=5, cast=int)
+
+# Booking: cached slot lists and date calendars (invalidated by signals)
+BOOKING_CACHE_TIMEOUT = config('BOOKING_CACHE_TIMEOUT', default=600, cast=int)
+BOOKING_CACHE_LOCK_SECONDS = config('BOOKING_CACHE_LOCK_SECONDS', default=10, cast=int)
+
+# Dashboards: per-status appointment counts (invalidated on every appointment change)
+APPOINTMENT_STATS_CACHE_TIMEOUT = config('APPOINTMENT_STATS_CACHE_TIMEOUT', default=60, cast=int)
+
+# Booking: how long a selected slot stays reserved for the patient during checkout
+BOOKING_HOLD_SECONDS = config('BOOKING_HOLD_SECONDS', default=300, cast=int)
+# Max unexpired holds per patient across all doctors (one per doctor)
+BOOKING_MAX_ACTIVE_HOLDS = config('BOOKING_MAX_ACTIVE_HOLDS', default=3, cast=int)
+
+# Waitlist: how long a freed slot stays reserved for the waitlisted patient it was offered to
+WAITLIST_OFFER_SECONDS = config('WAITLIST_OFFER_SECONDS', default=900, cast=int)
+
 
 # ==============================================================================
 # EMAIL CONFIGURATION (Optional)
@@ -41,6 +41,9 @@ urlpatterns = [
     # بخش نوبت‌دهی
     path('appointments/', include('apps.appointments.urls')),
     
+    # صف زنده (SSE)
+    path('queue/', include('apps.queue.urls')),
+    
     # API Endpoints
     path('api/', include(doctor_api_patterns)),
 ]
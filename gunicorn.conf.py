@@ -8,6 +8,9 @@ bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker Processes
+# Long-lived live-queue connections (/ws/, /queue/events/) are served by
+# Daphne on config.asgi:application, not by these gthread workers.
+# See DEPLOYMENT.md.
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "gthread"
 threads = 2